@@ -9,4 +9,8 @@ except NameError:
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from retype import app  # noqa: E402
-app.run()
+
+# Guarded so that the library pool, when configured to use processes, does not
+#  relaunch retype in each worker
+if __name__ == '__main__':
+    app.run()
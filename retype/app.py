@@ -1,16 +1,20 @@
 import sys
 import logging
 import argparse
+import multiprocessing
 from qt import QApplication
 
 from retype.controllers import MainController
 from retype.constants import RETYPE_VERSION_STR as version
 from retype.constants import RETYPE_BUILDDATE_DESC, ismacos
 from retype.extras.log import level_names, default_level, configLog
+from retype.services.latency import tracer
 
 
 def run():
     # type: () -> None
+    # Needed for process pools in frozen builds
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
 
     # MacOS Qt5 bug workaround https://forum.qt.io/post/613499
@@ -24,9 +28,14 @@ def run():
 
     logging.info(ver_str)
 
+    if args.latency is not None:
+        tracer.enable(args.latency or None)
+
     controller = MainController()
     controller.show()
-    sys.exit(app.exec())
+    ret = app.exec()
+    tracer.disable()  # Writes out any raw samples still buffered
+    sys.exit(ret)
 
 
 def _parseArgs(desc):
@@ -38,6 +47,10 @@ def _parseArgs(desc):
         default=default_loglevel, choices=level_names,
         help=f'Set logging output level to one of:\
  {", ".join(level_names)}')
+    parser.add_argument(
+        '--latency', type=str, nargs='?', const='', metavar='FILE',
+        help='Trace keystroke-to-paint latency (see the latency console\
+ command), appending the raw samples to FILE if given')
     return parser.parse_args()
 
 
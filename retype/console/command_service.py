@@ -2,6 +2,8 @@ import logging
 
 from typing import TYPE_CHECKING
 
+from retype.services.latency import tracer
+
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +66,23 @@ commands_info = {
         'args': None,
         # 'func': self.customise
     },
+    'latency':
+    {
+        'desc': 'Log p50/p95/p99 keystroke-to-paint latency of each stage.\
+ If followed by \'on\', \'off\' or \'reset\', start tracing, stop tracing\
+ or clear the samples instead',
+        'aliases': ['latency'],
+        'args': '[on / off / reset ?]',
+        # 'func': self.latency
+    },
+    'stats':
+    {
+        'desc': 'Show typing statistics from the keys recorded. If followed\
+ by \'log\', log a summary of them instead',
+        'aliases': ['stats', 'statistics'],
+        'args': '[log ?]',
+        # 'func': self.stats
+    },
     'help_':
     {
         'desc': 'Show dialog with available console commands',
@@ -82,7 +101,8 @@ class CommandService(object):
                  loadBook,  # type: pyqtBoundSignal
                  prompt,  # type: str
                  customise,  # type: pyqtBoundSignal
-                 about  # type: pyqtBoundSignal
+                 about,  # type: pyqtBoundSignal
+                 stats  # type: pyqtBoundSignal
                  ):
         # type: (...) -> None
         self._console = console
@@ -93,6 +113,7 @@ class CommandService(object):
         self._console.submitted.connect(self._handleCommands)
         self.customise_signal = customise
         self.about_signal = about
+        self.stats_signal = stats
         self._initCommands()
         self._initCommandHistory()
 
@@ -222,6 +243,28 @@ class CommandService(object):
             m = True if move == 'move' else False
             self.book_view.gotoCursorPosition(m)
 
+    def latency(self, action=None):
+        # type: (CommandService, str | None) -> None
+        if action == 'on':
+            tracer.enable(tracer.samples_path)
+        elif action == 'off':
+            tracer.disable()
+        elif action == 'reset':
+            tracer.reset()
+        elif action is not None:
+            return logger.error(f"Unrecognised latency action '{action}'")
+        else:
+            state = 'on' if tracer.enabled else 'off'
+            logger.info(f'Latency tracing is {state} (ms from key event)\n'
+                        + tracer.summary())
+
+    def stats(self, action=None):
+        # type: (CommandService, str | None) -> None
+        if action not in (None, 'log'):
+            return logger.error("Unrecognised stats action '{}'"
+                                .format(action))
+        self.stats_signal.emit(action or '')
+
     def help_(self):
         # type: (CommandService) -> None
         self.about_signal.emit('Console commands')
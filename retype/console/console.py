@@ -5,6 +5,7 @@ from typing import TYPE_CHECKING
 
 from retype.ui import LineEdit
 from retype.services.theme import theme, C, Theme
+from retype.services.latency import tracer
 from retype.console import CommandService, HighlightingService
 
 
@@ -79,12 +80,13 @@ class Console(LineEdit):
                      loadBook,  # type: pyqtBoundSignal
                      customise,  # type: pyqtBoundSignal
                      about,  # type: pyqtBoundSignal
+                     stats,  # type: pyqtBoundSignal
                      auto_newline  # type: bool
                      ):
         # type: (...) -> None
         self.command_service = CommandService(
             self, book_view, switchView, loadBook, self._prompt, customise,
-            about)
+            about, stats)
         self.highlighting_service = HighlightingService(
             self, book_view, auto_newline)
 
@@ -103,6 +105,7 @@ class Console(LineEdit):
 
     def keyPressEvent(self, e):
         # type: (Console, QKeyEvent) -> None
+        tracer.start()
         if self.command_service is not None:
             if e.key() == Qt.Key.Key_Up:
                 self.command_service.commandHistoryUp()
@@ -114,6 +117,8 @@ class Console(LineEdit):
         for subscriber in self._ev_subscribers.get(self.Ev.keypress, []):
             subscriber(e)
 
+        tracer.mark('key')
+
     def keyReleaseEvent(self, e):
         # type: (Console, QKeyEvent) -> None
         super().keyReleaseEvent(e)
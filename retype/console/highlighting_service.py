@@ -2,7 +2,8 @@ import logging
 
 from typing import TYPE_CHECKING
 
-from retype.extras.space import nrspacerstrip, endsinn
+from retype.services.latency import tracer
+from retype.services.keystroke_log import CORRECT, DELETE
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,51 @@ def compareStrings(str1, str2):
     return length_of_shorter_str
 
 
+class IncrementalComparator(object):
+    """Tracks how far the text typed in the console matches the line to be
+ typed, so that on each edit only the part of the text that changed is
+ compared against the line. Appending to or deleting from the end of the text
+ costs the same however long the line is, which matters when the line is a
+ `ManifoldStr' (where getting each character is comparatively slow)."""
+    def __init__(self):
+        # type: (IncrementalComparator) -> None
+        self.reset()
+
+    def reset(self, line=None):
+        # type: (IncrementalComparator, str | UserString | None) -> None
+        self.line = line
+        self.text = ''
+        self.index = 0
+
+    def compare(self, text, line):
+        # type: (IncrementalComparator, str, str | UserString) -> int
+        """Return index at which `text' stops matching `line'"""
+        if line is not self.line:
+            self.reset(line)
+        previous, index = self.text, self.index
+
+        # Length of the start of the text left unchanged by the edit
+        if text.startswith(previous):
+            unchanged = len(previous)
+        elif previous.startswith(text):
+            unchanged = len(text)
+        else:
+            unchanged = compareStrings(text, previous)
+
+        if unchanged > index or index == len(line) <= unchanged:
+            # The character that did not match (or the end of the line) is
+            #  still there, so the match ends at the same place
+            pass
+        else:
+            index = min(unchanged, index)
+            end = min(len(text), len(line))
+            while index < end and text[index] == line[index]:
+                index += 1
+
+        self.text, self.index = text, index
+        return index
+
+
 class HighlightingService(object):
     def __init__(self, console, book_view, auto_newline=True):
         # type: (HighlightingService, Console, BookView, bool) -> None
@@ -32,6 +78,9 @@ class HighlightingService(object):
         self.wrong_start = None  # type: int | None
         self.wrong_end = None  # type: int | None
         self.wrong_text = ""
+        self.comparator = IncrementalComparator()
+        # Records each key typed, if set
+        self.keystroke_log = None  # type: KeystrokeLog | None
 
     def valid(self, v):
         # type: (HighlightingService, BookView) -> bool
@@ -46,6 +95,7 @@ class HighlightingService(object):
 
     def _handleHighlighting(self, text):
         # type: (HighlightingService, str) -> None
+        tracer.mark('textChanged')
         v = self.book_view
 
         if not self.valid(v):
@@ -53,21 +103,57 @@ class HighlightingService(object):
         if v.persistent_pos is None:
             return
 
+        # Text in the console before this change
+        previous = self.comparator.text \
+            if self.comparator.line is v.current_line else ''
+
         # Cursor position in the line
-        end_correctness_index = compareStrings(text, v.current_line)
+        end_correctness_index = self.comparator.compare(text, v.current_line)
         v.cursor_pos = v.persistent_pos + end_correctness_index
 
+        if self.keystroke_log is not None:
+            self._recordKeys(v, previous, text, end_correctness_index)
+
         self._handleMistakes(v, text, end_correctness_index)
+        tracer.mark('mistakes')
 
         self.updateHighlighting()
+        tracer.mark('highlighting')
 
         self._maybeAdvance(v, text, not self.auto_newline)
 
+    def _recordKeys(self, v, previous, text, end_correctness_index):
+        # type: (HighlightingService, BookView, str, str, int) -> None
+        """Record the characters typed (or deleted) to change the text in
+ the console from `previous' to `text'"""
+        log = self.keystroke_log
+        if log is None or v.book is None or v.chapter_pos is None or \
+           v.persistent_pos is None:
+            return
+        if text.startswith(previous):
+            unchanged = len(previous)
+        else:
+            unchanged = compareStrings(text, previous)
+        line = v.current_line
+        checksum = v.book.checksum
+        if unchanged < len(previous):
+            log.record(checksum, v.chapter_pos, v.persistent_pos + unchanged,
+                       0, len(previous) - unchanged, DELETE)
+        for i in range(unchanged, len(text)):
+            log.record(checksum, v.chapter_pos, v.persistent_pos + i,
+                       # The character in the book, rather than those
+                       #  accepted for it
+                       ord(str.__getitem__(line, i)) if i < len(line) else 0,
+                       ord(text[i]),
+                       CORRECT if i < end_correctness_index else 0)
+
     def _maybeAdvance(self, v, text, require_enter=False):
         # type: (HighlightingService, BookView, str, bool) -> None
         # Next line / chapter, skipping trailing spaces if present
-        if text == v.current_line or text == nrspacerstrip(v.current_line):
-            if require_enter and endsinn(v.current_line):
+        _, typeable_len, ends_in_newline = v.line_info[v.line_pos]
+        if text == v.current_line or len(text) == typeable_len and \
+           text == v.current_line[:typeable_len]:
+            if require_enter and ends_in_newline:
                 return
             self.advanceLine()
 
@@ -77,6 +163,9 @@ class HighlightingService(object):
             logger.error('_handleMistakes: Unexpected None. cursor_pos: '
                          f'{v.cursor_pos}, persistent_pos: {v.persistent_pos}')
             return
+        if v.overlay_mistakes:
+            return self._overlayMistakes(v, text, end_correctness_index)
+
         # The way this works is if there’s any previous wrong_text it gets
         #  entirely removed, then readded as necessary.
         if self.wrong_start is not None and self.wrong_end is not None:
@@ -92,14 +181,30 @@ class HighlightingService(object):
             self.wrong = False
             self.wrong_start = None
             self.wrong_end = None
-            v.mistake_cursor.setPosition(v.cursor_pos)
+            v.mistake_cursor.setPosition(v.documentPosition(v.cursor_pos))
             return
 
         self.wrong = True
-        v.mistake_cursor.setPosition(self.wrong_start)
+        v.mistake_cursor.setPosition(v.documentPosition(self.wrong_start))
         self._insertWrongText(v, v.mistake_cursor.position(), self.wrong_text)
         self.wrong_end = self.wrong_start + len(self.wrong_text)
 
+    def _overlayMistakes(self, v, text, end_correctness_index):
+        # type: (HighlightingService, BookView, str, int) -> None
+        """Keep track of the wrong text like `_handleMistakes', but have the
+ display draw it rather than insert it into the document"""
+        if v.persistent_pos is None:
+            return
+        self.wrong_text = text[end_correctness_index:]
+        if not self.wrong_text:
+            self.wrong = False
+            self.wrong_start = self.wrong_end = None
+        else:
+            self.wrong = True
+            self.wrong_start = v.persistent_pos + end_correctness_index
+            self.wrong_end = self.wrong_start + len(self.wrong_text)
+        v.showMistake(self.wrong_start or 0, self.wrong_text)
+
     def _insertWrongText(self, v, pre_pos, text):
         # type: (HighlightingService, BookView, int, str) -> None
         v.mistake_cursor.setPosition(pre_pos, v.mistake_cursor.MoveAnchor)
@@ -107,8 +212,10 @@ class HighlightingService(object):
 
     def _removeWrongText(self, v, start, end):
         # type: (HighlightingService, BookView, int, int) -> None
-        v.mistake_cursor.setPosition(start, v.mistake_cursor.MoveAnchor)
-        v.mistake_cursor.setPosition(end, v.mistake_cursor.KeepAnchor)
+        v.mistake_cursor.setPosition(v.documentPosition(start),
+                                     v.mistake_cursor.MoveAnchor)
+        v.mistake_cursor.setPosition(v.documentPosition(end),
+                                     v.mistake_cursor.KeepAnchor)
         v.mistake_cursor.removeSelectedText()
 
     def advanceLine(self):
@@ -205,4 +312,5 @@ error: {}'.format(v.line_pos, len(v.tobetyped_list), e))
 if TYPE_CHECKING:
     from retype.console import Console  # noqa: F401
     from retype.ui import BookView  # noqa: F401
+    from retype.services.keystroke_log import KeystrokeLog  # noqa: F401
     from collections import UserString  # noqa: F401
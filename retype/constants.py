@@ -66,7 +66,24 @@ default_config = {
     "bookview": {
         "save_font_size_on_quit": True,
         "font_size": default_font_size,
-        "font": default_font_family
+        "font": default_font_family,
+        # Maximum estimated memory used by the documents of recently viewed
+        #  chapters, kept so that they do not need to be laid out again, in
+        #  MB; 0 to disable
+        "document_cache_size": 64,
+        # Chapters over twice this many characters long are displayed this
+        #  many characters at a time; 0 to always display whole chapters
+        "window_size": 50000,
+        # Draw wrong text over the chapter instead of inserting it, so that
+        #  the chapter does not have to be laid out again as mistakes are
+        #  typed
+        "overlay_mistakes": False,
+        # Seconds over which typing speed is measured as it is typed; the
+        #  first is the current speed shown and graphed
+        "wpm_windows": [5, 30],
+        # Record every key typed in a book, with the time and what was to be
+        #  typed, to a file per day in the keystrokes directory of user_dir
+        "keystroke_log": True
     },
     "window": {
         "x": None,
@@ -79,6 +96,21 @@ default_config = {
     "auto_newline": True,
     "steno": {
         "kdict": default_steno_kdict
+    },
+    "library": {
+        # Number of workers used for indexing and reading books; 0 for one per
+        #  CPU
+        "workers": 0,
+        # 'thread' or 'process'
+        "pool": "thread",
+        # Maximum size of the parsed chapter cache in MB; 0 to disable
+        "chapter_cache_size": 100,
+        # Where the library index and progress are kept: 'json' for
+        #  library_index.json and save.json, or 'sqlite' for a database in
+        #  user_dir (library.sqlite3), which also keeps the metadata of books
+        #  so it need not be read from them on startup. The JSON files are
+        #  imported into the database the first time it is used.
+        "store": "json"
     }
 }  # type: Config
 
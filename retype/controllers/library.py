@@ -1,28 +1,62 @@
 import os
 import json
+import zipfile
+import posixpath
 import logging
+import threading
 import traceback
+from collections.abc import Sequence
 from lxml.html import fromstring, builder, tostring, xhtml_to_html
 from lxml.etree import _Element
 from ebooklib import epub
-from qt import QTextBrowser, QMessageBox
+from qt import QMessageBox
 
 from typing import TYPE_CHECKING
 
 from retype.extras.space import isspaceorempty
 from retype.extras.hashing import generate_file_md5
+from retype.extras.pool import poolMap
+from retype.extras.epub_metadata import readEpubMetadata, EpubMetadataError
+from retype.extras.plain_text import toPlainText
+from retype.services.library_index import LibraryIndex
+from retype.services.library_store import LibraryStore
+from retype.services.chapter_cache import ChapterCache
+from retype.services.book_loader import BookLoader
+from retype.services.save_journal import SaveJournal
 
 logger = logging.getLogger(__name__)
 
+# Fraction of the html of a chapter assumed to be text when estimating the
+#  length of chapters not yet parsed. It counts as if ESTIMATE_WEIGHT bytes of
+#  html had been parsed with that ratio, so that the first few (often short and
+#  markup heavy) chapters parsed do not throw the estimates off.
+ESTIMATED_TEXT_RATIO = 0.8
+ESTIMATE_WEIGHT = 8192
+
 
 class LibraryController(object):
-    def __init__(self, user_dir, library_paths):
-        # type: (LibraryController, str, list[str]) -> None
+    def __init__(self,  # type: LibraryController
+                 user_dir,  # type: str
+                 library_paths,  # type: list[str]
+                 settings=None,  # type: LibrarySettings | None
+                 progress=None,  # type: pyqtBoundSignal | None
+                 writer=None  # type: SaveWriter | None
+                 ):
+        # type: (...) -> None
+        self.settings = settings or {}
+        # Progress is saved through `writer' if given, otherwise right away
+        self.writer = writer
         self.user_dir = user_dir
         self.library_paths = library_paths
+        self.progress = progress
         self._library_items = self.indexLibrary(library_paths)
         self.books = None  # type: dict[int, BookWrapper] | None
         self.save_file_contents = None  # type: Save | None
+        self.book_loader = BookLoader()
+        self.book_loader.loaded.connect(self._bookLoaded)
+        self.book_loader.failed.connect(self._bookFailed)
+        # Book being opened, with the view and signal it was opened with
+        self._opening = None  # type: Opening | None
 
     @property
     def user_dir(self):
@@ -34,6 +68,49 @@ class LibraryController(object):
         # type: (LibraryController, str) -> None
         self._user_dir = value
         self.save_abs_path = os.path.join(value, 'save.json')
+        self.save_journal = SaveJournal(self.save_abs_path)
+        self.index = LibraryIndex(value)
+        self.store = None  # type: LibraryStore | None
+        if self.settings.get('store', 'json') == 'sqlite':
+            self.store = self._openStore(value)
+            # The store keeps both the index and the progress
+            self.index = self.save_journal = self.store
+        self.chapter_cache = ChapterCache(
+            value, self.settings.get('chapter_cache_size', 100) * 2**20)
+
+    def reset(self, user_dir, library_paths):
+        # type: (LibraryController, str, list[str]) -> None
+        """Index the library again from `user_dir' and `library_paths'. The
+ book loader is kept, but whatever it is loading is cancelled, and a book
+ still being opened is given up on"""
+        self.book_loader.cancel()
+        if self._opening is not None:
+            _, book_view, switchView = self._opening
+            self._opening = None
+            book_view.clearLoading()
+            switchView.emit(1)
+        if self.store is not None:
+            # Progress queued for the old store is written before it closes
+            if self.writer is not None:
+                self.writer.flush()
+            self.store.close()
+        self.user_dir = user_dir
+        self.library_paths = library_paths
+        self._library_items = self.indexLibrary(library_paths)
+        self.books = None
+        self.save_file_contents = None
+
+    def _openStore(self, user_dir):
+        # type: (LibraryController, str) -> LibraryStore
+        """Open the library store, importing the library index and save file
+ into it the first time"""
+        store = LibraryStore(user_dir)
+        if not store.imported:
+            save = self._readSaveFile()
+            if save is not None:
+                save = self.migrateV1Save(self.save_journal.replay(save))
+                store.importLibrary(self.index.entries, save)
+        return store
 
     def checksum(self, path):
         # type: (LibraryController, str) -> str | None
@@ -41,39 +118,109 @@ class LibraryController(object):
         try:
             checksum = generate_file_md5(path)
         except OSError as e:
-            s = (f'Unable to read epub {self.idn}:\n{self.path}.\n\n'
-                 'This is not fatal, but the book will not be loaded.')
-            logger.error(f"{s}\n{e}", exc_info=True)
-            msg = QMessageBox(QMessageBox.Icon.Warning, 'retype', s)
-            msg.setDetailedText(f'Path: {path}\n\n'
-                                f'{traceback.format_exc()}')
-            msg.exec()
+            warnUnreadable(path, e)
         return checksum
 
+    def _poolMap(self,  # type: LibraryController
+                 func,  # type: Callable[[T], R]
+                 items,  # type: Sequence[T]
+                 stage  # type: str
+                 ):
+        # type: (...) -> list[R | Exception]
+        def progress(done, total):
+            # type: (int, int) -> None
+            if self.progress is not None:
+                self.progress.emit(stage, done, total)
+
+        return poolMap(func, items, self.settings.get('workers', 0),
+                       self.settings.get('pool', 'thread'), progress)
+
     def indexLibrary(self, library_paths):
         # type: (LibraryController, list[str]) -> dict[int, LibraryItem]
-        book_checksum_list = []
-        library_items = {}
-        idn = 0
+        paths = []
         for library_path in library_paths:
             for root, dirs, files in os.walk(library_path):
                 for f in files:
                     if f.lower().endswith(".epub"):
-                        path = os.path.join(root, f)
-                        checksum = self.checksum(path)
-                        if not checksum or checksum in book_checksum_list:
-                            continue
-                        book_checksum_list.append(checksum)
-                        library_items[idn] = LibraryItem(idn, path, checksum)
-                        idn += 1
+                        paths.append(os.path.join(root, f))
+
+        # Only files that are new or have changed since they were last indexed
+        #  need to be hashed
+        checksums = []  # type: list[str | None]
+        stats = {}  # type: dict[int, os.stat_result]
+        for i, path in enumerate(paths):
+            checksum = None
+            try:
+                stats[i] = os.stat(path)
+                checksum = self.index.lookup(path, stats[i])
+            except OSError:
+                pass
+            checksums.append(checksum)
+        to_hash = [i for i, checksum in enumerate(checksums) if not checksum]
+        hashed = self._poolMap(generate_file_md5,
+                               [paths[i] for i in to_hash], 'Indexing')
+        for i, result in zip(to_hash, hashed):
+            if isinstance(result, Exception):
+                warnUnreadable(paths[i], result)
+                continue
+            checksums[i] = result
+            if i in stats:
+                self.index.record(paths[i], stats[i], result)
+        self.index.prune(paths, [library_path for library_path
+                                 in library_paths
+                                 if not os.path.isdir(library_path)])
+        self.index.save()
+
+        # Assign ids in walk order, independently of the order in which the
+        #  checksums were computed
+        book_checksum_list = set()  # type: set[str]
+        library_items = {}
+        idn = 0
+        for path, checksum in zip(paths, checksums):
+            if not checksum or checksum in book_checksum_list:
+                continue
+            book_checksum_list.add(checksum)
+            library_items[idn] = LibraryItem(idn, path, checksum)
+            idn += 1
+        if self.store is not None:
+            self.store.setIdns(library_items.values())
         return library_items
 
     def instantiateBooks(self):
         # type: (LibraryController) -> None
         self.books = {}
-        for idn, item in self._library_items.items():
-            book = BookWrapper(item, self.load(item))
-            self.books[idn] = book
+        items = list(self._library_items.values())
+        if self.store is not None:
+            self._instantiateStoredBooks(items)
+            return
+        # Only the metadata needed for the shelf is read here; the rest of
+        #  the epub is loaded when the book is opened
+        metadata = self._poolMap(
+            readEpubMetadata, [item.path for item in items], 'Loading')
+        for item, meta in zip(items, metadata):
+            self.books[item.idn] = BookWrapper(
+                item, self.load(item), meta, self.chapter_cache)
+
+    def _instantiateStoredBooks(self, items):
+        # type: (LibraryController, list[LibraryItem]) -> None
+        """Instantiate books from the metadata in the store, only reading
+ that of books not in it yet"""
+        assert self.store is not None
+        shelf = self.store.shelf()
+        to_read = [item for item in items if item.idn not in shelf or
+                   shelf[item.idn][0] != item.checksum]
+        read = self._poolMap(
+            readBookInfo, [item.path for item in to_read], 'Loading')
+        for item, result in zip(to_read, read):
+            if isinstance(result, Exception):
+                shelf[item.idn] = (item.checksum, result, None)
+                continue
+            self.store.recordMetadata(item.checksum, *result)
+            shelf[item.idn] = (item.checksum, *result)
+        for item in items:
+            _, meta, sizes = shelf[item.idn]
+            self.books[item.idn] = BookWrapper(
+                item, self.load(item), meta, self.chapter_cache, sizes)
 
     def setBook(self, book_id, book_view, switchView):
         # type: (LibraryController, int, BookView, pyqtBoundSignal) -> None
@@ -90,37 +237,80 @@ class LibraryController(object):
 
         save_data = book.save_data
         logger.info("Save data: {}".format(save_data))
-        book_view.setBook(book, save_data)
+        # The book is read in a worker, starting with the chapter it was left
+        #  at, while the view shows that it is loading
+        self._opening = (book, book_view, switchView)
+        book_view.showLoading(book)
         switchView.emit(2)
+        self.book_loader.load(book, save_data['chapter_pos'] if save_data
+                              else 0)
+
+    def _bookLoaded(self, book):
+        # type: (LibraryController, BookWrapper) -> None
+        if self._opening is None or self._opening[0] is not book:
+            return
+        _, book_view, _ = self._opening
+        self._opening = None
+        book_view.setBook(book, book.save_data)
         book_view.display.centreAroundCursor()
 
+    def _bookFailed(self, book, e):
+        # type: (LibraryController, BookWrapper, Exception) -> None
+        if self._opening is None or self._opening[0] is not book:
+            return
+        _, book_view, switchView = self._opening
+        self._opening = None
+        book_view.clearLoading()
+        switchView.emit(1)
+        warnUnreadable(book.path, e, book.idn)
+
     def save(self, book, data):
         # type: (LibraryController, BookWrapper, SaveData) -> bool
         book.save_data = data
 
         self.addFriendlyName(data, book.path)
         key = book.checksum
+        # Needed in full to compact the journal into
         save = self.save_file_contents
-        if (save):
-            save[key] = data
-        else:
-            save = self.save_file_contents = {key: data}
-
+        if save is None:
+            save = self.loadSaveFile()
+        save[key] = data
+
+        journal = self.save_journal
+        if self.writer is not None:
+            # Only the latest progress in each book is written
+            self.writer.write(('save', key), journal.path,
+                              lambda: self._writeSave(journal, key, data))
+            return True
         try:
-            with open(self.save_abs_path, 'w', encoding='utf-8') as f:
-                json.dump(save, f, indent=2)
+            self._writeSave(journal, key, data)
         except OSError as e:
-            s = 'Unable to save progress to disk.'
-            if e is FileNotFoundError:
-                s += f' Unable to find user_dir {self._user_dir}.'
-            logger.error(f"{s}\n{e}", exc_info=True)
-            msg = QMessageBox(QMessageBox.Icon.Warning, 'retype', s)
-            msg.setDetailedText(f'Path: {self.save_abs_path}\n\n'
-                                f'{traceback.format_exc()}')
-            msg.exec()
+            logger.error(f"Unable to save progress to disk.\n{e}",
+                         exc_info=True)
+            self.saveFailed(journal.path, traceback.format_exc())
             return False
         return True
 
+    def _writeSave(self,  # type: LibraryController
+                   journal,  # type: SaveJournal | LibraryStore
+                   key,  # type: str
+                   data  # type: SaveData
+                   ):
+        # type: (...) -> None
+        """Raises OSError"""
+        journal.append(key, data)
+        if journal.full and self.save_file_contents is not None:
+            journal.compact(self.save_file_contents.copy())
+
+    def saveFailed(self, path, details):
+        # type: (LibraryController, str, str) -> None
+        s = 'Unable to save progress to disk.'
+        if not os.path.isdir(self._user_dir):
+            s += f' Unable to find user_dir {self._user_dir}.'
+        msg = QMessageBox(QMessageBox.Icon.Warning, 'retype', s)
+        msg.setDetailedText(f'Path: {path}\n\n{details}')
+        msg.exec()
+
     def migrateV1Save(self, save):
         # type: (LibraryController, Save) -> Save
         book_checksum_list = []
@@ -159,13 +349,14 @@ class LibraryController(object):
         # type: (LibraryController, SaveData, str) -> None
         data['friendly_name'] = os.path.basename(path)
 
-    def loadSaveFile(self):
-        # type: (LibraryController) -> Save
+    def _readSaveFile(self):
+        # type: (LibraryController) -> Save | None
+        """Contents of the save file, or None if it could not be read"""
         if os.path.exists(self.save_abs_path):
             logger.info(f'Read save: {self.save_abs_path}')
             try:
                 with open(self.save_abs_path, 'r') as f:
-                    save = json.load(f)  # type: Save
+                    return json.load(f)  # type: ignore[no-any-return]
             except OSError as e:
                 s = 'Unable to read save file.'
                 logger.error(f"{s}\n{e}", exc_info=True)
@@ -173,13 +364,19 @@ class LibraryController(object):
                 msg.setDetailedText(f'Path: {self.save_abs_path}\n\n'
                                     f'{traceback.format_exc()}')
                 msg.exec()
-        else:
-            logger.debug(
-                f'Save path {self.save_abs_path} not found.\n'
-                'This is normal if the save file has not been created yet.')
-            save = {}
+                return None
+        logger.debug(
+            f'Save path {self.save_abs_path} not found.\n'
+            'This is normal if the save file has not been created yet.')
+        return {}
 
-        save = self.migrateV1Save(save)
+    def loadSaveFile(self):
+        # type: (LibraryController) -> Save
+        if self.store is not None:
+            save = self.store.replay({})
+        else:
+            save = self.migrateV1Save(
+                self.save_journal.replay(self._readSaveFile() or {}))
         self.save_file_contents = save
         return save
 
@@ -207,19 +404,75 @@ class LibraryItem:
         self.checksum = checksum
 
 
+def readEpub(path):
+    # type: (str) -> epub.EpubBook
+    return epub.read_epub(path, options={'ignore_ncx': True})
+
+
+def chapterSizes(path, opf_dir, spine):
+    # type: (str, str, list[str]) -> list[int]
+    """Size of the html of each chapter, from the directory of the archive
+ so that nothing needs to be decompressed"""
+    try:
+        with zipfile.ZipFile(path, 'r') as zf:
+            return [zf.getinfo(posixpath.normpath(
+                posixpath.join(opf_dir, href))).file_size for href in spine]
+    except (KeyError, OSError, zipfile.BadZipFile) as e:
+        logger.warning(f'Unable to read chapter sizes of {path}\n{e}')
+    return [0] * len(spine)
+
+
+def readBookInfo(path):
+    # type: (str) -> tuple[EpubMetadata, list[int]]
+    """Metadata and chapter sizes of the book at `path', as kept in the
+ library store"""
+    metadata = readEpubMetadata(path)
+    return (metadata,
+            chapterSizes(path, metadata['opf_dir'], metadata['spine']))
+
+
+def warnUnreadable(path, e, idn=None):
+    # type: (str, BaseException, int | None) -> None
+    s = (f'Unable to read epub{f" {idn}" if idn is not None else ""}:\n'
+         f'{path}.\n\nThis is not fatal, but the book will not be loaded.')
+    logger.error(f"{s}\n{e}", exc_info=e)
+    msg = QMessageBox(QMessageBox.Icon.Warning, 'retype', s)
+    msg.setDetailedText(f'Path: {path}\n\n' + ''.join(
+        traceback.format_exception(type(e), e, e.__traceback__)))
+    msg.exec()
+
+
 class BookWrapper(object):
-    def __init__(self, library_item, save_data=None):
-        # type: (BookWrapper, LibraryItem, SaveData | None) -> None
+    def __init__(self,  # type: BookWrapper
+                 library_item,  # type: LibraryItem
+                 save_data=None,  # type: SaveData | None
+                 metadata=None,  # type: EpubMetadata | Exception | None
+                 chapter_cache=None,  # type: ChapterCache | None
+                 chapter_sizes=None  # type: list[int] | None
+                 ):
+        # type: (...) -> None
         self.valid = False
+        # Sizes of the chapters' html if already known, see `_chapterSizes'
+        self._chapter_sizes = chapter_sizes
+        # Books get loaded by a worker while in use on the GUI thread
+        self._lock = threading.RLock()
+        # Held only while `chapters' is first made, so that getting the
+        #  chapters does not wait on the worker parsing one under `_lock'
+        self._chapters_lock = threading.Lock()
+        self._chapter_cache = chapter_cache
         self._library_item = library_item
         self.path = library_item.path
         self.idn = library_item.idn
         self.checksum = library_item.checksum
-        self._book = self._readEpub()
-        self.title = self._book.title
-        self._chapters = []  # type: list[Chapter]
+        self._metadata = self._readMetadata(metadata)
+        # The full epub is only read once it is needed, see `_book'
+        self._epub = None  # type: epub.EpubBook | None
+        self.title = self._metadata['title'] if self._metadata else ''
+        self._chapters = None  # type: Chapters | None
+        # Whether chapters have been parsed since the cache was last stored
+        self._cache_dirty = False
         self._images = []  # type: list[epub.EpubImage]
-        self._author = ''
+        self._author = self._metadata['author'] if self._metadata else ''
         self._cover = None  # type: epub.EpubCover | epub.EpubImage | None
         self.documents = {}  # type: dict[str, epub.EpubHtml]
         self._unparsed_chapters = []  # type: list[epub.EpubHtml]
@@ -228,31 +481,60 @@ class BookWrapper(object):
         self.progress = save_data['progress'] if save_data else 0.0
         self.progress_subscribers = []  # type: list[Callable[[float], None]]
 
-    def _readEpub(self):
-        # type: (BookWrapper) -> epub.EpubBook
+    def _readMetadata(self,  # type: BookWrapper
+                      metadata=None  # type: EpubMetadata | Exception | None
+                      ):
+        # type: (...) -> EpubMetadata | None
+        """Read the metadata, unless it has already been read (or failed to
+ be) in `metadata'"""
+        try:
+            if isinstance(metadata, Exception):
+                raise metadata
+            ret = metadata or readEpubMetadata(self.path)
+            self.valid = True
+            return ret
+        except (LookupError, OSError, EpubMetadataError) as e:
+            warnUnreadable(self.path, e, self.idn)
+        return None
+
+    def _readEpub(self, warn=True):
+        # type: (BookWrapper, bool) -> epub.EpubBook
         ret = None
         try:
-            ret = epub.read_epub(self.path, options={'ignore_ncx': True})
+            ret = readEpub(self.path)
             self.valid = True
         except (LookupError, OSError) as e:
-            s = (f'Unable to read epub {self.idn}:\n{self.path}.\n\n'
-                 'This is not fatal, but the book will not be loaded.')
-            logger.error(f"{s}\n{e}", exc_info=True)
-            msg = QMessageBox(QMessageBox.Icon.Warning, 'retype', s)
-            msg.setDetailedText(f'Path: {self.path}\n\n'
-                                f'{traceback.format_exc()}')
-            msg.exec()
+            self.valid = False
+            if not warn:
+                raise
+            warnUnreadable(self.path, e, self.idn)
         return ret or epub.EpubBook()
 
-    def _parseChaptersContent(self, chapters):
-        # type: (BookWrapper, list[epub.EpubHtml]) -> list[Chapter]
-        parsed_chapters = []
-        self.chapter_lookup = {}  # type: dict[str, int]
-        for i, chapter in enumerate(chapters):
-            parsed_chapters.append(self.__parseChapterContent(chapter))
-            self.chapter_lookup[chapter.file_name.split('/')[-1]] = i
+    def load(self, warn=True):
+        # type: (BookWrapper, bool) -> bool
+        """Read the full epub if it has not been already. Returns whether the
+ book is valid. Errors are shown to the user, or raised if `warn' is False
+ (like when not on the GUI thread)."""
+        with self._lock:
+            if self._epub is None:
+                self._epub = self._readEpub(warn)
+        return self.valid
+
+    @property
+    def _book(self):
+        # type: (BookWrapper) -> epub.EpubBook
+        self.load()
+        return self._epub or epub.EpubBook()
 
-        return parsed_chapters
+    def _parseChapter(self, pos):
+        # type: (BookWrapper, int) -> Chapter
+        if not self._unparsed_chapters:
+            self._getItems(self._book)
+        if pos >= len(self._unparsed_chapters):
+            # The epub could not be read after all
+            return {'html': '', 'plain': '', 'len': 0, 'links': [],
+                    'images': []}
+        return self.__parseChapterContent(self._unparsed_chapters[pos])
 
     def __parseChapterContent(self, chapter):
         # type: (BookWrapper, epub.EpubHtml) -> Chapter
@@ -297,9 +579,14 @@ class BookWrapper(object):
                     figure.addprevious(figure.makeelement('div'))
 
         xhtml_to_html(tree)
-        html = tostring(tree, method='xml', encoding='unicode')
 
         # Get rid of invisible garbage characters
+        for element in tree.iter():
+            if element.text and '\ufeff' in element.text:
+                element.text = element.text.replace('\ufeff', '')
+            if element.tail and '\ufeff' in element.tail:
+                element.tail = element.tail.replace('\ufeff', '')
+        html = tostring(tree, method='xml', encoding='unicode')
         html = html.replace('\ufeff', '')
 
         links = tree.xpath('//a/@href')
@@ -317,37 +604,160 @@ class BookWrapper(object):
                                        'raw': image.content})
 
         # We to store the length of the plain text of all chapters for
-        #  progress-calculation purposes
-        dummy_display = QTextBrowser()
-        dummy_display.setHtml(html)
-        plain = dummy_display.toPlainText()
+        #  progress-calculation purposes. It has to be what the book display
+        #  will have once the html is set on it.
+        plain = toPlainText(tree)
 
         return {'html': html, 'plain': plain, 'len': len(plain),
                 'links': links, 'images': images}
 
     @property
     def chapters(self):
-        # type: (BookWrapper) -> list[Chapter]
-        if not self._unparsed_chapters:
+        # type: (BookWrapper) -> Chapters
+        """The chapters, each parsed (or read from the cache) only once it is
+ first accessed"""
+        chapters = self._chapters
+        if chapters is None:
+            with self._chapters_lock:
+                if self._chapters is None:
+                    self._chapters = self._makeChapters()
+                chapters = self._chapters
+        return chapters
+
+    def _makeChapters(self):
+        # type: (BookWrapper) -> Chapters
+        if self._metadata:
+            spine = self._metadata['spine']
+            sizes = self._chapterSizes(spine)
+        else:
             self._getItems(self._book)
-        if not self._chapters:
-            self._chapters = self._parseChaptersContent(
-                self._unparsed_chapters)
-        return self._chapters or []
+            spine = [item.file_name for item in self._unparsed_chapters]
+            sizes = [len(item.content) for item in self._unparsed_chapters]
+        parsed = self._loadCachedChapters()
+        if parsed is None or len(parsed) != len(spine):
+            parsed = [None] * len(spine)
+        self._chapter_lookup = {href.split('/')[-1]: i
+                                for i, href in enumerate(spine)}
+        return Chapters(parsed, sizes, self._parseChapter,
+                        self._chapterParsed, self._lock)
+
+    @property
+    def chapter_lookup(self):
+        # type: (BookWrapper) -> dict[str, int]
+        """Position of each chapter by file name"""
+        self.chapters
+        return self._chapter_lookup
+
+    @property
+    def chapter_lens(self):
+        # type: (BookWrapper) -> list[int]
+        return self.chapters.lens
+
+    def _chapterSizes(self, spine):
+        # type: (BookWrapper, list[str]) -> list[int]
+        assert self._metadata is not None
+        if self._chapter_sizes is not None and \
+           len(self._chapter_sizes) == len(spine):
+            return self._chapter_sizes
+        return chapterSizes(self.path, self._metadata['opf_dir'], spine)
+
+    def _loadCachedChapters(self):
+        # type: (BookWrapper) -> list[Chapter | None] | None
+        if self._chapter_cache is None:
+            return None
+        cached = self._chapter_cache.load(self.checksum)
+        if cached is None:
+            return None
+        images = self._readImages({
+            image['file_name'] for chapter in cached['chapters'] if chapter
+            for image in chapter['images']})
+        if images is None:
+            return None
+        return [{'html': chapter['html'], 'plain': chapter['plain'],
+                 'len': chapter['len'], 'links': chapter['links'],
+                 'images': [{'item': images[image['file_name']],
+                             'link': image['link'],
+                             'raw': images[image['file_name']].content}
+                            for image in chapter['images']]}
+                if chapter else None for chapter in cached['chapters']]
+
+    def _chapterParsed(self):
+        # type: (BookWrapper) -> None
+        self._cache_dirty = True
+
+    def storeCachedChapters(self):
+        # type: (BookWrapper) -> None
+        """Store the chapters parsed so far in the chapter cache, if any have
+ been parsed since they were last stored. Done once the book loader is done
+ with the book rather than as each chapter is parsed, which would write the
+ whole book again each time"""
+        if self._chapter_cache is None or self._chapters is None or \
+           not self.valid or not self._cache_dirty:
+            return
+        self._cache_dirty = False
+        self._chapter_cache.store(self.checksum, {
+            'chapters': [{'html': chapter['html'], 'plain': chapter['plain'],
+                          'len': chapter['len'],
+                          'links': [str(link) for link in chapter['links']],
+                          'images': [{'link': image['link'],
+                                      'file_name': image['item'].file_name}
+                                     for image in chapter['images']]}
+                         if chapter else None
+                         for chapter in list(self._chapters.parsed)]})
+
+    def _readImages(self, file_names):
+        # type: (BookWrapper, set[str]) -> dict[str, epub.EpubImage] | None
+        """Images with the given file names, taken from the epub if it is
+ loaded or otherwise read directly from the archive"""
+        if self._epub is not None:
+            found = {image.file_name: image for image in self.images
+                     if image.file_name in file_names}
+            return found if len(found) == len(file_names) else None
+        if not self._metadata:
+            return None
+        opf_dir = self._metadata['opf_dir']
+        images = {}
+        try:
+            with zipfile.ZipFile(self.path, 'r') as zf:
+                for file_name in file_names:
+                    images[file_name] = epub.EpubImage(
+                        file_name=file_name, content=zf.read(
+                            posixpath.normpath(
+                                posixpath.join(opf_dir, file_name))))
+        except (KeyError, OSError, zipfile.BadZipFile) as e:
+            logger.warning(f'Unable to read images of {self.path} from '
+                           f'archive\n{e}')
+            return None
+        return images
 
     @property
     def images(self):
         # type: (BookWrapper) -> list[epub.EpubImage]
-        if not self._images:
-            self._getItems(self._book)
-        return self._images
+        with self._lock:
+            if not self._images:
+                self._getItems(self._book)
+            return self._images
 
     @property
     def cover(self):
         # type: (BookWrapper) -> epub.EpubCover | epub.EpubImage | None
-        if not self._cover:
-            self._getItems(self._book)
-        return self._cover
+        with self._lock:
+            if not self._cover:
+                if self._epub is None:
+                    # No need to load the whole book just for the cover
+                    self._cover = self._metadataCover()
+                else:
+                    self._getItems(self._epub)
+            return self._cover
+
+    def _metadataCover(self):
+        # type: (BookWrapper) -> epub.EpubImage | None
+        if not self._metadata or self._metadata['cover_content'] is None:
+            return None
+        return epub.EpubImage(
+            uid='cover', file_name=self._metadata['cover'],
+            media_type=self._metadata['cover_media_type'],
+            content=self._metadata['cover_content'])
 
     def _getItems(self, book):
         # type: (BookWrapper, epub.EpubBook) -> None
@@ -385,13 +795,6 @@ class BookWrapper(object):
     @property
     def author(self):
         # type: (BookWrapper) -> str
-        book = self._book
-        if not self._author:
-            for namespace in book.metadata.keys():
-                data = book.metadata[namespace]
-                for key, value in data.items():
-                    if key == 'creator':
-                        self._author = value[0][0]
         return self._author
 
     def updateProgress(self, progress):
@@ -402,9 +805,66 @@ class BookWrapper(object):
             subscriber(progress)
 
 
+class Chapters(Sequence):
+    """Chapters of a book, each parsed with `parse' the first time it is
+ accessed, after which `on_parsed' is called. Chapters not yet parsed have
+ their length estimated from the size of their html, using the ratio of text to
+ html of those that have been (see ESTIMATED_TEXT_RATIO)."""
+    def __init__(self,  # type: Chapters
+                 parsed,  # type: list[Chapter | None]
+                 sizes,  # type: list[int]
+                 parse,  # type: Callable[[int], Chapter]
+                 on_parsed=None,  # type: Callable[[], None] | None
+                 lock=None  # type: threading.RLock | None
+                 ):
+        # type: (...) -> None
+        self.parsed = parsed
+        self.sizes = sizes
+        self._parse = parse
+        self._on_parsed = on_parsed
+        self._lock = lock or threading.RLock()
+
+    def __len__(self):
+        # type: (Chapters) -> int
+        return len(self.parsed)
+
+    def __getitem__(self, pos):  # type: ignore[override]
+        # type: (Chapters, int) -> Chapter
+        chapter = self.parsed[pos]
+        if chapter is None:
+            with self._lock:
+                chapter = self.parsed[pos]
+                if chapter is None:
+                    chapter = self.parsed[pos] = self._parse(pos % len(self))
+                    if self._on_parsed:
+                        self._on_parsed()
+        return chapter
+
+    def isParsed(self, pos):
+        # type: (Chapters, int) -> bool
+        return self.parsed[pos] is not None
+
+    @property
+    def lens(self):
+        # type: (Chapters) -> list[int]
+        text = ESTIMATED_TEXT_RATIO * ESTIMATE_WEIGHT
+        html = ESTIMATE_WEIGHT
+        for chapter, size in zip(self.parsed, self.sizes):
+            if chapter is not None:
+                text += chapter['len']
+                html += size
+        ratio = text / html
+        return [chapter['len'] if chapter is not None else round(size * ratio)
+                for chapter, size in zip(self.parsed, self.sizes)]
+
+
 if TYPE_CHECKING:
-    from typing import Callable  # noqa: F401
+    from typing import Callable, Tuple, TypeVar  # noqa: F401
     from qt import pyqtBoundSignal  # noqa: F401
     from retype.ui import BookView, Cover  # noqa: F401
+    from retype.services.save_writer import SaveWriter  # noqa: F401
     from retype.extras.metatypes import (  # noqa: F401
-        SaveData, Save, ImageData, Chapter)
+        SaveData, Save, ImageData, Chapter, LibrarySettings, EpubMetadata)
+    T = TypeVar('T')
+    R = TypeVar('R')
+    Opening = Tuple['BookWrapper', 'BookView', 'pyqtBoundSignal']
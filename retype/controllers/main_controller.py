@@ -9,10 +9,13 @@ from retype.ui import (MainWin, ShelfView, BookView, CustomisationDialog,
                        AboutDialog)
 from retype.games.typespeed import TypespeedView
 from retype.games.steno import StenoView
+from retype.stats import StatsView
 from retype.controllers import SafeConfig, MenuController, LibraryController
 from retype.console import Console
 from retype.constants import iswindows
 from retype.services.icon_set import Icons
+from retype.services.save_writer import SaveWriter
+from retype.services.keystroke_log import KeystrokeLog
 from retype.resource_handler import getIconsPath
 
 logger = logging.getLogger(__name__)
@@ -23,6 +26,7 @@ class View(Enum):
     book_view = 2
     typespeed_view = 3
     steno_view = 4
+    stats_view = 5
 
 
 class MainController(QObject):
@@ -33,11 +37,17 @@ class MainController(QObject):
     saveConfigRequested = pyqtSignal(dict)
     customisationDialogRequested = pyqtSignal()
     aboutDialogRequested = pyqtSignal(str)
+    statsRequested = pyqtSignal(str)
+    libraryProgress = pyqtSignal(str, int, int)
 
     def __init__(self):
         # type: (MainController) -> None
         super().__init__()
+        # Writes progress and config without holding up the GUI
+        self.writer = SaveWriter()
+        self.writer.failed.connect(self.writeFailed)
         self.config = SafeConfig()
+        self.config.writer = self.writer
 
         Icons.populateSets(
             getIconsPath(), getIconsPath(self.config['user_dir']))
@@ -60,12 +70,17 @@ class MainController(QObject):
         self.saveConfigRequested.connect(self.saveConfig)
         self.customisationDialogRequested.connect(self.showCustomisationDialog)
         self.aboutDialogRequested.connect(self.showAboutDialog)
+        self.statsRequested.connect(self.showStats)
+        self.libraryProgress.connect(self.showLibraryProgress)
 
         self._initLibrary()
         self._initMenuBar()
         self._instantiateViews()
+        # After the views, which save things as the window is closing
+        self._window.closing.connect(self.writer.flush)
         self.setViewByEnum(View.shelf_view)
         self._connectConsole()
+        self._initKeystrokeLog()
         self._populateLibrary()
         self._verifyUserDir()
 
@@ -135,6 +150,8 @@ class MainController(QObject):
             self.showTypespeed()
         elif view == 4:
             self.showSteno()
+        elif view == 5:
+            self.showStats()
         self.setViewByEnum(view)
 
     def showCustomisationDialog(self):
@@ -162,7 +179,13 @@ class MainController(QObject):
     def _initLibrary(self):
         # type: (MainController) -> None
         self.library = LibraryController(self.config['user_dir'],
-                                         self.config['library_paths'])
+                                         self.config['library_paths'],
+                                         self.config['library'],
+                                         self.libraryProgress,
+                                         self.writer)
+        # Stop parsing books in the background once the window is closed
+        self._window.closing.connect(
+            lambda: self.library.book_loader.shutdown())
 
     def _populateLibrary(self):
         # type: (MainController) -> None
@@ -173,11 +196,37 @@ class MainController(QObject):
 
     def _repopulateLibrary(self, user_dir, library_paths):
         # type: (MainController, str, list[str]) -> None
-        self.library.__init__(user_dir, library_paths)  # type: ignore[misc]
+        self.library.reset(user_dir, library_paths)
         shelf_view = self.views[View.shelf_view]
         self.library.instantiateBooks()
         shelf_view.repopulate()
 
+    def showLibraryProgress(self, stage, done, total):
+        # type: (MainController, str, int, int) -> None
+        """Indicate progress of library indexing in the console. Indexing runs
+ while the library controller is being (re)built, so the console is repainted
+ directly rather than events processed, which would run timers and queued
+ signals against a half-built controller"""
+        if done < total:
+            self.console.setPlaceholderText(
+                f'{stage} library... {done}/{total}')
+        else:
+            self.console.setPlaceholderText('')
+        self.console.repaint()
+
+    def writeFailed(self, target, path, details):
+        # type: (MainController, Hashable, str, str) -> None
+        if target[0] == 'save':  # type: ignore[index]
+            # The progress that failed to be written may be in a book other
+            #  than the one open
+            book_view = self.views[View.book_view]
+            book = book_view.book
+            if book is not None and book.checksum == target[1]:
+                book_view.saveFailed()
+            self.library.saveFailed(path, details)
+        else:
+            self.config.saveFailed(path, details)
+
     def loadBook(self, book_id=0):
         # type: (MainController, int) -> None
         book_view = self.views[View.book_view]
@@ -191,8 +240,25 @@ class MainController(QObject):
                                   self.loadBookRequested,
                                   self.customisationDialogRequested,
                                   self.aboutDialogRequested,
+                                  self.statsRequested,
                                   self.config['auto_newline'])
 
+    def _initKeystrokeLog(self):
+        # type: (MainController) -> None
+        self.keystroke_log = None  # type: KeystrokeLog | None
+        if not self.config['bookview']['keystroke_log']:
+            return
+        self.keystroke_log = KeystrokeLog(
+            self.keystrokesPath(self.config['user_dir']))
+        hs = self.console.highlighting_service
+        if hs:
+            hs.keystroke_log = self.keystroke_log
+        self._window.closing.connect(self.keystroke_log.close)
+
+    def keystrokesPath(self, user_dir):
+        # type: (MainController, str) -> str
+        return os.path.join(user_dir, 'keystrokes')
+
     def _verifyUserDir(self):
         # type: (MainController) -> None
         user_dir = self.config['user_dir']
@@ -241,6 +307,12 @@ class MainController(QObject):
 
         # Update library’s user_dir
         self.library.user_dir = config['user_dir']
+        if self.keystroke_log is not None:
+            self.keystroke_log.setDirectory(
+                self.keystrokesPath(config['user_dir']))
+        if View.stats_view in self.views:
+            self.views[View.stats_view].directory = \
+                self.keystrokesPath(config['user_dir'])
 
         # Update book display font
         if not config['bookview']['save_font_size_on_quit']:
@@ -292,6 +364,20 @@ class MainController(QObject):
                 self.config['steno']['kdict'])
         self.setView(self._viewFromEnumOrInt(i))
 
+    def showStats(self, action=''):
+        # type: (MainController, str) -> None
+        """Show the typing statistics, or if `action' is 'log', log a summary
+ of them"""
+        i = View.stats_view
+        if i not in self.views:
+            self.views[i] = StatsView(
+                self._window, self, self.keystrokesPath(
+                    self.config['user_dir']))
+        if action == 'log':
+            logger.info(self.views[i].summary())
+            return
+        self.setView(self._viewFromEnumOrInt(i))
+
     if iswindows:
         def hideConsoleWindow(self, show=False):
             # type: (MainController, bool) -> None
@@ -325,5 +411,6 @@ class MainController(QObject):
 
 if TYPE_CHECKING:
     from qt import QWidget  # noqa: F401
+    from typing import Hashable  # noqa: F401
     from retype.extras.metatypes import (  # noqa: F401
         NestedDict, Config, Geometry, SConfig, ViewsDict)
@@ -13,6 +13,7 @@ from retype.services.keymap import keymap, K, Keymap, genActions, keymapUpdate
 @keymap('Menu.toggleConsoleWindow', K())
 @keymap('Menu.showTypespeed', K())
 @keymap('Menu.showSteno', K())
+@keymap('Menu.showStats', K())
 @keymap('Menu.about', K())
 @keymap('Menu.documentation', K())
 @keymap('Menu.reportIssue', K())
@@ -53,6 +54,10 @@ class MenuController(QObject):
                 'func': lambda: self.controller.setViewByEnum(2),
                 'icon': 'open_book',
             },
+            'Menu.showStats': {
+                'widget': viewMenu, 'name': 'Typing S&tatistics',
+                'func': lambda: self.controller.showStats(),
+            },
             'Menu.toggleConsoleWindow': {
                 'widget': viewMenu, 'name': 'Toggle System &Console',
                 'func': lambda: self.controller.toggleConsoleWindow(),
@@ -9,6 +9,7 @@ from typing import TYPE_CHECKING
 
 from retype.extras.dict import SafeDict
 from retype.constants import default_config
+from retype.services.save_writer import writeFile
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,8 @@ class _SafeConfig:
         self.safe_dict = SafeDict(
             self.config, default_config,
             ['rdict', 'sdict', 'kdict'])
+        # Config is saved through `writer' if set, otherwise right away
+        self.writer = None  # type: SaveWriter | None
 
     def isPathDefaultUserDir(self, path):
         # type: (_SafeConfig, str) -> bool
@@ -85,24 +88,32 @@ Attempting to load config from: {}".format(user_dir, custom_path))
             dconfig = self.loadDconfig()
             if dconfig is not None:
                 dconfig['user_dir'] = user_dir
-                self._save(path, dconfig)
+                self._save(self.base_config_abs_path, dconfig)
 
     def _save(self, path, data):
         # type: (_SafeConfig, str, Config) -> bool
+        logger.debug(f'Saving config: {path}')
+        # Serialised here, as `data' may be changed before it is written
+        text = json.dumps(data, indent=2)
+        if self.writer is not None:
+            self.writer.write(('config', path), path,
+                              lambda: writeFile(path, text))
+            return True
         try:
-            with open(path, 'w') as f:
-                logger.debug(f'Saving config: {path}')
-                json.dump(data, f, indent=2)
+            writeFile(path, text)
         except OSError as e:
-            s = 'Unable to save config file.'
-            logger.error(f"{s}\n{e}", exc_info=True)
-            msg = QMessageBox(QMessageBox.Icon.Warning, 'retype', s)
-            msg.setDetailedText(f'Path: {path}\n\n'
-                                f'{traceback.format_exc()}')
-            msg.exec()
+            logger.error(f"Unable to save config file.\n{e}", exc_info=True)
+            self.saveFailed(path, traceback.format_exc())
             return False
         return True
 
+    def saveFailed(self, path, details):
+        # type: (_SafeConfig, str, str) -> None
+        msg = QMessageBox(QMessageBox.Icon.Warning, 'retype',
+                          'Unable to save config file.')
+        msg.setDetailedText(f'Path: {path}\n\n{details}')
+        msg.exec()
+
     def loadDconfig(self):
         # type: (_SafeConfig) -> Config | None
         dconfig = None
@@ -129,6 +140,7 @@ Attempting to load config from: {}".format(user_dir, custom_path))
 
 
 if TYPE_CHECKING:
+    from retype.services.save_writer import SaveWriter  # noqa: F401
     from retype.extras.metatypes import (  # noqa: F401
         Config, NestedDict, SConfig)
     SafeConfig = SConfig
@@ -1,5 +1,8 @@
 from .split import splittext
+from .split import Splitter
 from .space import isspaceorempty
 from .str_subclasses import AnyStr
 from .str_subclasses import ManifoldStr
-__all__ = ('splittext', 'isspaceorempty', 'AnyStr', 'ManifoldStr',)
+from .str_subclasses import Equivalences
+__all__ = ('splittext', 'Splitter', 'isspaceorempty', 'AnyStr', 'ManifoldStr',
+           'Equivalences',)
@@ -0,0 +1,157 @@
+import zipfile
+import posixpath
+from urllib.parse import unquote
+from lxml import etree
+from lxml.html import fromstring
+
+from typing import TYPE_CHECKING
+
+from retype.extras.space import isspaceorempty
+
+NAMESPACES = {
+    'CONTAINERNS': 'urn:oasis:names:tc:opendocument:xmlns:container',
+    'OPF': 'http://www.idpf.org/2007/opf',
+    'DC': 'http://purl.org/dc/elements/1.1/',
+}
+
+# Same as ebooklib’s, so that we recognise the same items as images
+IMAGE_MEDIA_TYPES = ['image/jpeg', 'image/jpg', 'image/png', 'image/svg+xml']
+HTML_MEDIA_TYPE = 'application/xhtml+xml'
+
+
+class EpubMetadataError(Exception):
+    pass
+
+
+def _parseXml(raw):
+    # type: (bytes) -> etree._ElementTree
+    parser = etree.XMLParser(recover=True, resolve_entities=False)
+    tree = etree.ElementTree(etree.fromstring(raw, parser=parser))
+    if tree.getroot() is None:
+        raise EpubMetadataError('Unparseable xml')
+    return tree
+
+
+def _read(zf, name):
+    # type: (zipfile.ZipFile, str) -> bytes
+    try:
+        return zf.read(posixpath.normpath(name))
+    except KeyError:
+        raise EpubMetadataError(f'{name} not found in archive')
+
+
+def _text(element):
+    # type: (etree._Element | None) -> str
+    if element is None or element.text is None:
+        return ''
+    return str(element.text)
+
+
+def readEpubMetadata(path):
+    # type: (str) -> EpubMetadata
+    """Read just what is needed to put a book on the shelf: the title, author,
+ spine and cover image. Unlike ebooklib’s read_epub, only container.xml, the
+ opf, the cover image and (in some cases) the first spine document are
+ decompressed.
+The cover is chosen the same way BookWrapper does with a fully loaded book."""
+    try:
+        with zipfile.ZipFile(path, 'r') as zf:
+            return _readEpubMetadata(zf)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, etree.LxmlError) as e:
+        raise EpubMetadataError(f'Unable to read {path}: {e}')
+
+
+def _readEpubMetadata(zf):
+    # type: (zipfile.ZipFile) -> EpubMetadata
+    container = _parseXml(_read(zf, 'META-INF/container.xml'))
+    opf_file = None
+    for root_file in container.iterfind(
+            './/{%s}rootfile[@media-type]' % NAMESPACES['CONTAINERNS']):
+        if root_file.get('media-type') == 'application/oebps-package+xml':
+            opf_file = root_file.get('full-path')
+    if not opf_file:
+        raise EpubMetadataError('No opf file in container.xml')
+    opf_dir = posixpath.dirname(opf_file)
+    opf = _parseXml(_read(zf, opf_file))
+
+    opf_ns = '{%s}' % NAMESPACES['OPF']
+    dc_ns = '{%s}' % NAMESPACES['DC']
+    metadata = opf.find(opf_ns + 'metadata')
+    title = author = ''
+    if metadata is not None:
+        title = _text(metadata.find(dc_ns + 'title'))
+        author = _text(metadata.find(dc_ns + 'creator'))
+
+    documents = {}  # type: dict[str, str]
+    images = []  # type: list[tuple[str, str, str]]
+    cover = None  # type: tuple[str, str] | None
+    manifest = opf.find(opf_ns + 'manifest')
+    for item in manifest if manifest is not None else []:
+        if item.tag != opf_ns + 'item':
+            continue
+        uid = item.get('id') or ''
+        href = unquote(item.get('href') or '')
+        media_type = item.get('media-type')
+        properties = (item.get('properties') or '').split()
+        if media_type == 'image/jpg':
+            media_type = 'image/jpeg'
+        if media_type == HTML_MEDIA_TYPE:
+            # ebooklib gives cover pages a fixed id
+            documents['cover' if 'cover' in properties else uid] = href
+        elif media_type in IMAGE_MEDIA_TYPES:
+            if 'cover-image' in properties:
+                cover = (href, media_type)
+            else:
+                images.append((uid, href, media_type))
+
+    spine = []  # type: list[str]
+    spine_element = opf.find(opf_ns + 'spine')
+    for itemref in spine_element if spine_element is not None else []:
+        uid = itemref.get('idref')
+        if uid in documents:
+            spine.append(documents[uid])
+
+    if cover is None:
+        for uid, href, media_type in images:
+            if 'cover' in uid:
+                cover = (href, media_type)
+                break
+
+    # Some books do not mark the cover, but have it alone on the first page
+    if cover is None and spine:
+        cover = _firstPageCover(
+            _read(zf, posixpath.join(opf_dir, spine[0])), images)
+
+    cover_content = None
+    if cover is not None:
+        cover_content = _read(zf, posixpath.join(opf_dir, cover[0]))
+
+    return {'title': title, 'author': author, 'opf_dir': opf_dir,
+            'spine': spine,
+            'cover': cover[0] if cover else None,
+            'cover_media_type': cover[1] if cover else None,
+            'cover_content': cover_content}
+
+
+def _firstPageCover(raw, images):
+    # type: (bytes, list[tuple[str, str, str]]) -> tuple[str, str] | None
+    declaration = b'<?xml version="1.0" encoding="utf-8"?>'
+    try:
+        tree = fromstring(declaration + raw)
+    except (etree.LxmlError, ValueError):
+        return None
+    links = [element.get('src') if element.tag == 'img'
+             else element.get('xlink:href')
+             for element in tree.iter('img', 'image')]
+    found = []
+    for link in links:
+        for uid, href, media_type in images:
+            if isinstance(link, str) and link.lstrip('./') in href:
+                found.append((href, media_type))
+    if len(found) == 1 and isspaceorempty(tree.text_content(), True):
+        return found[0]
+    return None
+
+
+if TYPE_CHECKING:
+    from retype.extras.metatypes import EpubMetadata  # noqa: F401
@@ -0,0 +1,47 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+from typing import TYPE_CHECKING
+
+
+class LineTable:
+    """Offsets at which each of a sequence of lines (or chapters, or anything
+ else with a length) starts, were they joined together, for finding which line
+ an offset is in without going through the lines before it."""
+    def __init__(self, lengths):
+        # type: (LineTable, Iterable[int]) -> None
+        # starts[n] is the offset of line n; the last item is the total length
+        self.starts = [0] + list(accumulate(lengths))
+
+    def __len__(self):
+        # type: (LineTable) -> int
+        return len(self.starts) - 1
+
+    @property
+    def total(self):
+        # type: (LineTable) -> int
+        return self.starts[-1]
+
+    def start(self, line):
+        # type: (LineTable, int) -> int
+        """Offset line number `line' starts at; the total length for the line
+ after the last"""
+        return self.starts[line]
+
+    def line(self, offset):
+        # type: (LineTable, int) -> int
+        """Number of the line `offset' is in, or the number of lines if it is
+ past the end"""
+        if offset >= self.total:
+            return len(self)
+        return max(bisect_right(self.starts, offset) - 1, 0)
+
+    def locate(self, offset):
+        # type: (LineTable, int) -> tuple[int, int]
+        """Line and column of `offset'"""
+        line = self.line(offset)
+        return (line, offset - self.starts[line])
+
+
+if TYPE_CHECKING:
+    from typing import Iterable  # noqa: F401
@@ -1,6 +1,6 @@
 # This module is only used for typechecking. Do not import it in runtime.
 from typing import (TypedDict, Callable, Dict, Mapping, Union, overload,
-                    Literal, Protocol)
+                    Literal, Protocol, Sequence)
 from ebooklib import epub
 from retype.controllers.safe_config import _SafeConfig
 from retype.ui import ShelfView, BookView
@@ -38,18 +38,39 @@ SaveData = TypedDict(
      'friendly_name': str},
     total=False)
 Save = dict[str, SaveData]
+IndexEntry = TypedDict(
+    'IndexEntry',
+    {'size': int, 'mtime_ns': int, 'checksum': str})
 ImageData = TypedDict(
     'ImageData',
     {'item': epub.EpubImage, 'link': str, 'raw': bytes})
+EpubMetadata = TypedDict(
+    'EpubMetadata',
+    {'title': str, 'author': str, 'opf_dir': str, 'spine': list[str],
+     'cover': str | None, 'cover_media_type': str | None,
+     'cover_content': bytes | None})
 Chapter = TypedDict(
     'Chapter',
     {'html': str, 'plain': str, 'len': int, 'links': list[str],
      'images': list[ImageData]},
     total=False)
+CachedImage = TypedDict(
+    'CachedImage',
+    {'link': str, 'file_name': str})
+CachedChapter = TypedDict(
+    'CachedChapter',
+    {'html': str, 'plain': str, 'len': int, 'links': list[str],
+     'images': list[CachedImage]})
+CachedBook = TypedDict(
+    'CachedBook',
+    {'chapters': list[CachedChapter | None]})
 
 BookViewSettings = TypedDict(
     'BookViewSettings',
-    {'save_font_size_on_quit': bool, 'font_size': int, 'font': str},
+    {'save_font_size_on_quit': bool, 'font_size': int, 'font': str,
+     'document_cache_size': int, 'window_size': int,
+     'overlay_mistakes': bool, 'wpm_windows': list[float],
+     'keystroke_log': bool},
     total=False)
 Geometry = TypedDict(
     'Geometry',
@@ -71,13 +92,18 @@ StenoSettings = TypedDict(
     'StenoSettings',
     {'kdict': KDict},
     total=False)
+LibrarySettings = TypedDict(
+    'LibrarySettings',
+    {'workers': int, 'pool': str, 'chapter_cache_size': int, 'store': str},
+    total=False)
 
 Config = TypedDict(
     'Config',
     {'user_dir': str, 'library_paths': list[str], 'icon_set': str,
      'prompt': str, 'console_font': str, 'sdict': SDict, 'rdict': RDict,
      'bookview': BookViewSettings, 'window': Geometry, 'auto_newline': bool,
-     'steno': StenoSettings, 'hide_sysconsole': bool},
+     'steno': StenoSettings, 'hide_sysconsole': bool,
+     'library': LibrarySettings},
     total=False)
 
 
@@ -90,6 +116,7 @@ class ConfigKeyTypes:
     BVS = Literal['bookview']
     Geometry = Literal['window']
     StenoSet = Literal['steno']
+    LibSet = Literal['library']
 
 
 # Madness. But I can't find another way to have a TypedDict-like
@@ -111,6 +138,8 @@ class SConfig(_SafeConfig):
     def __getitem__(self, key: ConfigKeyTypes.Geometry) -> Geometry: ...
     @overload
     def __getitem__(self, key: ConfigKeyTypes.StenoSet) -> StenoSettings: ...
+    @overload
+    def __getitem__(self, key: ConfigKeyTypes.LibSet) -> LibrarySettings: ...
 
 
 class SafeGeometry(_NestedSafeDictGroup):
@@ -138,6 +167,16 @@ class SafeBookViewSettings(_NestedSafeDictGroup):
     @overload
     def __getitem__(self, key: Literal['font']) -> str: ...
     @overload
+    def __getitem__(self, key: Literal['document_cache_size']) -> int: ...
+    @overload
+    def __getitem__(self, key: Literal['window_size']) -> int: ...
+    @overload
+    def __getitem__(self, key: Literal['overlay_mistakes']) -> bool: ...
+    @overload
+    def __getitem__(self, key: Literal['wpm_windows']) -> list[float]: ...
+    @overload
+    def __getitem__(self, key: Literal['keystroke_log']) -> bool: ...
+    @overload
     def __getitem__(self, key: str) -> object: ...
 
 
@@ -148,6 +187,19 @@ class SafeStenoSettings(_NestedSafeDictGroup):
     def __getitem__(self, key: str) -> object: ...
 
 
+class SafeLibrarySettings(_NestedSafeDictGroup):
+    @overload  # type: ignore[override,no-overload-impl]
+    def __getitem__(self, key: Literal['workers']) -> int: ...
+    @overload
+    def __getitem__(self, key: Literal['pool']) -> str: ...
+    @overload
+    def __getitem__(self, key: Literal['chapter_cache_size']) -> int: ...
+    @overload
+    def __getitem__(self, key: Literal['store']) -> str: ...
+    @overload
+    def __getitem__(self, key: str) -> object: ...
+
+
 class ViewsDict(dict[object, object]):
     @overload  # type: ignore[override,no-overload-impl]
     def __getitem__(self, key: Literal[View.shelf_view]) -> ShelfView: ...
@@ -169,7 +221,10 @@ class Book(Protocol):
     dirty: bool
 
     @property
-    def chapters(self) -> list[Chapter]: ...
+    def chapters(self) -> Sequence[Chapter]: ...
+
+    @property
+    def chapter_lens(self) -> list[int]: ...
 
     def updateProgress(self, progress: float) -> None: ...
 
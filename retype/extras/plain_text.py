@@ -0,0 +1,582 @@
+import re
+
+from typing import TYPE_CHECKING
+
+# Element display modes, as QTextHtmlParser assigns them. Tags Qt does not
+#  know are displayed inline.
+INLINE = 0
+BLOCK = 1
+TABLE = 2
+NONE = 3
+
+DISPLAY = {
+    'a': INLINE, 'address': INLINE, 'b': INLINE, 'big': INLINE,
+    'br': INLINE, 'cite': INLINE, 'code': INLINE, 'dfn': INLINE,
+    'em': INLINE, 'font': INLINE, 'html': INLINE, 'i': INLINE,
+    'img': INLINE, 'kbd': INLINE, 'nobr': INLINE, 's': INLINE,
+    'samp': INLINE, 'small': INLINE, 'span': INLINE, 'strong': INLINE,
+    'sub': INLINE, 'sup': INLINE, 'tt': INLINE, 'u': INLINE, 'var': INLINE,
+    'blockquote': BLOCK, 'body': BLOCK, 'caption': BLOCK, 'center': BLOCK,
+    'dd': BLOCK, 'div': BLOCK, 'dl': BLOCK, 'dt': BLOCK, 'h1': BLOCK,
+    'h2': BLOCK, 'h3': BLOCK, 'h4': BLOCK, 'h5': BLOCK, 'h6': BLOCK,
+    'hr': BLOCK, 'li': BLOCK, 'ol': BLOCK, 'p': BLOCK, 'pre': BLOCK,
+    'qt': BLOCK, 'td': BLOCK, 'th': BLOCK, 'ul': BLOCK,
+    'table': TABLE, 'tbody': TABLE, 'tfoot': TABLE, 'thead': TABLE,
+    'tr': TABLE,
+    'head': NONE, 'link': NONE, 'meta': NONE, 'script': NONE,
+    'style': NONE, 'title': NONE,
+}  # type: dict[str, int]
+
+# Values of the white-space css property
+NORMAL = 'normal'
+PRE = 'pre'
+NOWRAP = 'nowrap'
+PRE_WRAP = 'pre-wrap'
+PRE_LINE = 'pre-line'
+PRESERVING = (PRE, PRE_WRAP, PRE_LINE)
+
+# States of whitespace compression between text nodes
+PRESERVE = 0
+REMOVE = 1
+COLLAPSE = 2
+
+# Characters QChar::isSpace accepts. All of them but the no-break space and
+#  the paragraph separator are collapsed in normal text.
+SPACES = '\t\n\x0b\x0c\r \x85\xa0\u1680\u2000-\u200a\u2028\u2029' \
+    '\u202f\u205f\u3000'
+COLLAPSIBLE = '\t\n\x0b\x0c\r \x85\u1680\u2000-\u200a\u2028\u202f' \
+    '\u205f\u3000'
+only_spaces = re.compile(f'[{SPACES}]*')
+collapsible_runs = re.compile(f'[{COLLAPSIBLE}]+')
+white_space_declaration = re.compile(
+    r'(?:^|;)\s*white-space\s*:\s*([a-z-]+)', re.IGNORECASE)
+line_separator = '\u2028'
+paragraph_separator = '\u2029'
+object_replacement = '\ufffc'
+
+
+class Node:
+    """Stand-in for a QTextHtmlParserNode. Element nodes hold the text
+ directly following their opening tag, like lxml’s `text'; the text following
+ a closing tag lives in an anonymous node (tag None), like lxml’s `tail'."""
+    __slots__ = ('tag', 'text', 'parent', 'display', 'wsm', 'children',
+                 'element')
+
+    def __init__(self, parent, display=INLINE, wsm=NORMAL):
+        # type: (Node, int, int, str) -> None
+        self.tag = None  # type: str | None
+        self.text = ''
+        self.parent = parent
+        self.display = display
+        self.wsm = wsm
+        # Only element nodes are counted as children
+        self.children = 0
+        self.element = None  # type: _Element | None
+
+    @property
+    def isBlock(self):
+        # type: (Node) -> bool
+        return self.display == BLOCK
+
+
+def toPlainText(root):
+    # type: (_Element) -> str
+    """Plain text of the document that is `root' serialised, character for
+ character what QTextDocument::toPlainText gives after setHtml, but without
+ needing a QApplication (so it can be used from worker threads and processes)
+ and without the cost of laying out the document.
+This follows the way Qt’s html importer lays out text: whitespace collapsing
+ (including which whitespace-only text Qt drops between blocks), when tags
+ start a new block, `<br>' as a line break, images as U+FFFC, and tables
+ (list markers are not part of the plain text). It covers the html chapters
+ are turned into; the `white-space' css property is honoured in style
+ attributes and simple (single compound selector) style sheet rules, other
+ css is ignored. Of Qt’s repair of broken html only what can happen to
+ well-formed trees is reproduced (misnested paragraphs and list items)."""
+    return Importer(Parser(root).nodes).plainText()
+
+
+class Parser:
+    """Flattens an lxml tree into nodes the way QTextHtmlParser does with its
+ serialisation"""
+    def __init__(self, root):
+        # type: (Parser, _Element) -> None
+        self.nodes = [Node(0, BLOCK)]
+        # Style sheet rules setting white-space, in order of precedence
+        self.rules = []  # type: list[Rule]
+        self.parseElement(root)
+
+    def newNode(self, parent):
+        # type: (Parser, int) -> Node
+        last = self.nodes[-1]
+        reuse = False
+        if len(self.nodes) > 1 and last.tag is None:
+            if not last.text:
+                reuse = True
+            elif len(last.text) == 1 and only_spaces.fullmatch(last.text):
+                # A lone whitespace character after a block is dropped
+                sibling = len(self.nodes) - 2
+                while sibling and \
+                        self.nodes[sibling].parent != last.parent and \
+                        self.nodes[sibling].display == INLINE:
+                    sibling = self.nodes[sibling].parent
+                reuse = self.nodes[sibling].display != INLINE
+        if reuse:
+            self.nodes.pop()
+        node = Node(parent)
+        self.nodes.append(node)
+        return node
+
+    def inherit(self, node):
+        # type: (Parser, Node) -> None
+        parent = self.nodes[node.parent]
+        if parent.display == NONE:
+            node.display = NONE
+        node.wsm = parent.wsm
+
+    def currentParent(self):
+        # type: (Parser) -> int
+        """The node a new tag goes in: the last node, or the one its text is
+ in"""
+        parent = len(self.nodes) - 1
+        while parent and self.nodes[parent].tag is None:
+            parent = self.nodes[parent].parent
+        return parent
+
+    def resolveParent(self, node, parent):
+        # type: (Parser, Node, int) -> int
+        """Where Qt moves tags that cannot nest: a paragraph inside another
+ one (through inline tags) and a list item directly inside another one end
+ up next to it instead"""
+        if node.tag == 'p':
+            outer = parent
+            while outer and self.nodes[outer].display == INLINE:
+                outer = self.nodes[outer].parent
+            if self.nodes[outer].tag == 'p':
+                return self.nodes[outer].parent
+        elif node.tag == 'li' and self.nodes[parent].tag == 'li':
+            return self.nodes[parent].parent
+        return parent
+
+    def parseElement(self, element):
+        # type: (Parser, _Element) -> None
+        """Feed the opening tag, text, children and closing tag of `element'
+ to the parser, then the text following it"""
+        if not isinstance(element.tag, str):
+            # Comments and processing instructions leave no node behind, but
+            #  eat the whitespace that follows them
+            last = self.nodes[-1]
+            tail = element.tail or ''
+            if last.wsm not in (PRE, PRE_WRAP):
+                tail = tail.lstrip(SPACES)
+            last.text += tail
+            return
+
+        node = self.newNode(self.currentParent())
+        node.tag = element.tag.lower()
+        node.element = element
+        node.display = DISPLAY.get(node.tag, INLINE)
+        node.parent = self.resolveParent(node, node.parent)
+        self.nodes[node.parent].children += 1
+        self.inherit(node)
+        if node.tag == 'pre':
+            node.wsm = PRE
+        elif node.tag == 'nobr':
+            node.wsm = NOWRAP
+        node.wsm = self.whiteSpace(node)
+        preserving_block = node.wsm in PRESERVING and node.isBlock
+
+        tail = element.tail or ''
+        if node.tag == 'br':
+            node.text = line_separator
+        if not len(element) and element.text is None:
+            # Serialised without a closing tag; the newline after it would be
+            #  redundant with the block
+            if preserving_block and tail.startswith('\n'):
+                tail = tail[1:]
+            self.inherit(self.newNode(node.parent))
+            self.nodes[-1].text += tail
+            return
+
+        node.text = element.text or ''
+        # So would be an initial newline
+        if preserving_block and node.text.startswith('\n'):
+            node.text = node.text[1:]
+        if node.tag == 'style':
+            self.addRules(node.text)
+
+        for child in element:
+            self.parseElement(child)
+
+        # Closing tags that do not match an open tag are ignored
+        closed = len(self.nodes) - 1
+        while closed and self.nodes[closed].tag != node.tag:
+            closed = self.nodes[closed].parent
+        if closed:
+            # And so is a trailing newline
+            if self.nodes[closed].wsm in PRESERVING and \
+               self.nodes[closed].isBlock and \
+               self.nodes[-1].text.endswith('\n'):
+                self.nodes[-1].text = self.nodes[-1].text[:-1]
+            self.inherit(self.newNode(self.nodes[closed].parent))
+        self.nodes[-1].text += tail
+
+    def whiteSpace(self, node):
+        # type: (Parser, Node) -> str
+        element = node.element
+        assert element is not None
+        wsm = node.wsm
+        for _, _, selector, value in self.rules:
+            if selector.matches(element):
+                wsm = value
+        if node.tag in ('td', 'th') and element.get('nowrap') is not None:
+            wsm = NOWRAP
+        for match in white_space_declaration.finditer(
+                element.get('style') or ''):
+            wsm = match.group(1).lower()
+        if wsm not in (NORMAL, NOWRAP) + PRESERVING:
+            wsm = node.wsm
+        return wsm
+
+    def addRules(self, css):
+        # type: (Parser, str) -> None
+        css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+        for rule in re.finditer(r'([^{}]+)\{([^{}]*)\}', css):
+            declarations = list(white_space_declaration.finditer(
+                rule.group(2).strip()))
+            if not declarations:
+                continue
+            value = declarations[-1].group(1).lower()
+            for text in rule.group(1).split(','):
+                selector = Selector.parse(text)
+                if selector is not None:
+                    self.rules.append((selector.specificity, len(self.rules),
+                                       selector, value))
+        self.rules.sort(key=lambda rule: rule[:2])
+
+
+class Selector:
+    """A compound css selector made of a type, ids and classes"""
+    pattern = re.compile(r'(\*|[\w-]+)?((?:[.#][\w-]+)*)')
+
+    def __init__(self, tag, ids, classes):
+        # type: (Selector, str | None, list[str], list[str]) -> None
+        self.tag = tag
+        self.ids = ids
+        self.classes = classes
+
+    @classmethod
+    def parse(cls, text):
+        # type: (type[Selector], str) -> Selector | None
+        match = cls.pattern.fullmatch(text.strip())
+        if not match or not any(match.groups()):
+            return None
+        tag = match.group(1)
+        parts = re.findall(r'[.#][\w-]+', match.group(2))
+        return cls(tag.lower() if tag and tag != '*' else None,
+                   [part[1:] for part in parts if part[0] == '#'],
+                   [part[1:] for part in parts if part[0] == '.'])
+
+    @property
+    def specificity(self):
+        # type: (Selector) -> tuple[int, int, int]
+        return (len(self.ids), len(self.classes), int(self.tag is not None))
+
+    def matches(self, element):
+        # type: (Selector, _Element) -> bool
+        if self.tag is not None and element.tag.lower() != self.tag:
+            return False
+        if any(element.get('id') != uid for uid in self.ids):
+            return False
+        classes = (element.get('class') or '').split()
+        return all(cls in classes for cls in self.classes)
+
+
+class Table:
+    def __init__(self, node, cells, count):
+        # type: (Table, int, dict[int, int], int) -> None
+        self.node = node
+        # Grid position of each cell node, by node index
+        self.cells = cells
+        # Number of cells in the grid (those covered by spans excluded)
+        self.count = count
+        self.current = -1
+
+
+class Importer:
+    """Lays out nodes into blocks of text the way QTextHtmlImporter does"""
+    def __init__(self, nodes):
+        # type: (Importer, list[Node]) -> None
+        self.nodes = nodes
+        self.blocks = [[]]  # type: list[list[str]]
+        self.has_block = True
+        self.compress = REMOVE
+        self.block_tag_closed = False
+        self.tables = []  # type: list[Table]
+        self.depths = [0] * len(nodes)
+        for i in range(1, len(nodes)):
+            self.depths[i] = self.depths[nodes[i].parent] + 1
+
+    def plainText(self):
+        # type: (Importer) -> str
+        for i, node in enumerate(self.nodes):
+            self.importNode(i, node)
+        return '\n'.join(''.join(block) for block in self.blocks) \
+            .replace('\xa0', ' ').replace(line_separator, '\n')
+
+    def appendBlock(self):
+        # type: (Importer) -> None
+        self.blocks.append([])
+        self.compress = REMOVE
+
+    def importNode(self, i, node):
+        # type: (Importer, int, Node) -> None
+        if i > 0 and node.parent != i - 1:
+            self.block_tag_closed = self.closeTag(i)
+            if self.block_tag_closed and not node.isBlock and \
+               node.tag in DISPLAY:
+                self.has_block = False
+
+        if node.display == NONE:
+            return
+
+        if node.tag == 'img':
+            self.blocks[-1].append(object_replacement)
+            self.compress = COLLAPSE
+            self.has_block = False
+            return
+        if node.tag == 'hr':
+            if not self.has_block:
+                self.appendBlock()
+            self.has_block = False
+            self.compress = REMOVE
+            return
+        if node.tag in ('ul', 'ol'):
+            self.compress = REMOVE
+            if only_spaces.fullmatch(node.text):
+                return
+        if node.tag == 'table':
+            if not self.startTable(i):
+                self.has_block = False
+                self.compress = REMOVE
+            return
+        if node.display == TABLE:
+            return
+
+        # Text following a block gets a block of its own
+        if self.block_tag_closed and not self.has_block and \
+           not node.isBlock and node.display == INLINE and \
+           (node.tag == 'br' or not only_spaces.fullmatch(node.text)):
+            self.appendBlock()
+            self.has_block = True
+
+        if node.isBlock:
+            if node.tag in ('td', 'th') and self.tables and \
+               i in self.tables[-1].cells:
+                self.startCell(self.tables[-1], self.tables[-1].cells[i])
+            elif not self.has_block:
+                self.appendBlock()
+            self.has_block = True
+            self.block_tag_closed = False
+
+        if self.appendText(node):
+            self.has_block = False
+
+    def closeTag(self, i):
+        # type: (Importer, int) -> bool
+        """Close the nodes the previous node was in, up to the parent of node
+ `i'. Returns whether a block was closed."""
+        closed = i - 1
+        depth = self.depths[closed]
+        end_depth = self.depths[i] - 1
+        block_tag_closed = False
+        while depth > end_depth:
+            node = self.nodes[closed]
+            if node.tag == 'table' and self.tables and \
+               self.tables[-1].node == closed:
+                self.endTable(self.tables.pop())
+                block_tag_closed = False
+                self.compress = REMOVE
+            elif node.tag in ('td', 'th', 'ul', 'ol'):
+                block_tag_closed = True
+            elif node.tag == 'br':
+                self.compress = REMOVE
+            elif node.tag == 'div':
+                block_tag_closed = block_tag_closed or \
+                    node.children > 0 and self.lastCharacter() not in (
+                        None, line_separator)
+            elif node.isBlock:
+                block_tag_closed = True
+            closed = node.parent
+            depth -= 1
+        return block_tag_closed
+
+    def lastCharacter(self):
+        # type: (Importer) -> str | None
+        """The character before the cursor; None at the start of the
+ document, a paragraph separator at the start of a block"""
+        block = self.blocks[-1]
+        if block:
+            return block[-1][-1]
+        return paragraph_separator if len(self.blocks) > 1 else None
+
+    def appendText(self, node):
+        # type: (Importer, Node) -> bool
+        text = node.text
+        if node.wsm in (PRE, PRE_WRAP):
+            self.compress = PRESERVE
+        if not text:
+            return False
+        block = self.blocks[-1]
+        if node.tag == 'br':
+            block.append(line_separator)
+            self.compress = PRESERVE
+            return True
+        if node.wsm in (NORMAL, NOWRAP) and paragraph_separator not in text:
+            text = collapsible_runs.sub(' ', text)
+            if self.compress == REMOVE and text[0] == ' ':
+                text = text[1:]
+            if not text:
+                return False
+            block.append(text)
+            self.compress = REMOVE if text[-1] == ' ' else PRESERVE
+            return True
+        return self.appendPreservedText(node.wsm, text)
+
+    def appendPreservedText(self, wsm, text):
+        # type: (Importer, str, str) -> bool
+        """Character by character version of appendText, for text where
+ whitespace is (at least partly) preserved"""
+        appended = False
+        chars = []  # type: list[str]
+        for ch in text:
+            if ch != '\xa0' and ch != paragraph_separator and \
+               only_spaces.fullmatch(ch):
+                if wsm == PRE_LINE and ch in '\n\r':
+                    self.compress = PRESERVE
+                if self.compress == COLLAPSE:
+                    self.compress = REMOVE
+                elif self.compress == REMOVE:
+                    continue
+                if wsm == PRE:
+                    if ch == '\r':
+                        continue
+                elif wsm != PRE_WRAP:
+                    self.compress = REMOVE
+                    if not (wsm == PRE_LINE and ch in '\n\r'):
+                        ch = ' '
+            else:
+                self.compress = PRESERVE
+
+            if ch == '\n' or ch == paragraph_separator:
+                if chars and wsm == PRE_LINE and chars[-1] == ' ':
+                    chars.pop()
+                self.blocks[-1].extend(chars)
+                chars = []
+                self.blocks.append([])
+                appended = True
+            else:
+                chars.append(ch)
+        if chars:
+            self.blocks[-1].extend(chars)
+            appended = True
+        return appended
+
+    def startTable(self, i):
+        # type: (Importer, int) -> bool
+        """Lay out the grid of the table at node `i' the way Qt does, and put
+ its first cell in a new block. Tables without cells are not created, for
+ which False is returned."""
+        rows = []  # type: list[list[int]]
+        depth = self.depths[i]
+        for j in range(i + 1, len(self.nodes)):
+            if self.depths[j] <= depth:
+                break
+            node = self.nodes[j]
+            if node.tag == 'tr' and self.tableOf(j) == i:
+                rows.append([])
+            elif node.tag in ('td', 'th') and rows and \
+                    self.tableOf(j) == i:
+                rows[-1].append(j)
+        if not any(rows):
+            return False
+
+        # Grid position of each cell, skipping those covered by the spans of
+        #  cells in rows above
+        positions = {}  # type: dict[int, tuple[int, int]]
+        spans = []  # type: list[int]
+        columns = 0
+        for row, row_cells in enumerate(rows):
+            column = 0
+            for j in row_cells:
+                while column < len(spans) and spans[column] > 0:
+                    column += 1
+                colspan, rowspan = self.spans(j)
+                if len(spans) < column + colspan:
+                    spans.extend([0] * (column + colspan - len(spans)))
+                for k in range(column, column + colspan):
+                    spans[k] = rowspan
+                positions[j] = (row, column)
+                column += colspan
+            columns = max(columns, column)
+            spans = [max(0, n - 1) for n in spans]
+
+        # Every grid position gets a block, but those a cell spans over
+        covered = set()  # type: set[tuple[int, int]]
+        for j, (row, column) in positions.items():
+            colspan, rowspan = self.spans(j)
+            covered.update((r, c) for r in range(row, row + rowspan)
+                           for c in range(column, column + colspan))
+            covered.discard((row, column))
+        numbers = {}  # type: dict[tuple[int, int], int]
+        for row in range(len(rows)):
+            for column in range(columns):
+                if (row, column) not in covered:
+                    numbers[(row, column)] = len(numbers)
+        table = Table(i, {j: numbers[position]
+                          for j, position in positions.items()}, len(numbers))
+        self.tables.append(table)
+        self.compress = REMOVE
+        self.startCell(table, 0)
+        return True
+
+    def spans(self, i):
+        # type: (Importer, int) -> tuple[int, int]
+        element = self.nodes[i].element
+        assert element is not None
+        return (max(1, intAttribute(element, 'colspan')),
+                max(1, intAttribute(element, 'rowspan')))
+
+    def tableOf(self, i):
+        # type: (Importer, int) -> int
+        parent = self.nodes[i].parent
+        while parent and self.nodes[parent].tag != 'table':
+            parent = self.nodes[parent].parent
+        return parent
+
+    def startCell(self, table, cell):
+        # type: (Importer, Table, int) -> None
+        while table.current < cell:
+            self.appendBlock()
+            table.current += 1
+
+    def endTable(self, table):
+        # type: (Importer, Table) -> None
+        self.startCell(table, table.count - 1)
+        # The block after the table (the last cell decides whether it is
+        #  reused by a block that follows)
+        self.appendBlock()
+
+
+def intAttribute(element, attribute):
+    # type: (_Element, str) -> int
+    try:
+        return int(element.get(attribute) or 1)
+    except ValueError:
+        return 1
+
+
+if TYPE_CHECKING:
+    from lxml.etree import _Element  # noqa: F401
+    from typing import Tuple
+    Rule = Tuple[Tuple[int, int, int], int, 'Selector', str]
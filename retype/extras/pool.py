@@ -0,0 +1,74 @@
+import os
+import logging
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor,
+                                as_completed)
+
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+pool_kinds = ['thread', 'process']
+
+
+def poolWorkers(workers=0):
+    # type: (int) -> int
+    """Number of workers to use; `workers' if positive, otherwise one per
+ CPU"""
+    if workers > 0:
+        return workers
+    return os.cpu_count() or 1
+
+
+def poolMap(func,  # type: Callable[[T], R]
+            items,  # type: Sequence[T]
+            workers=0,  # type: int
+            kind='thread',  # type: str
+            progress=None  # type: Callable[[int, int], None] | None
+            ):
+    # type: (...) -> list[R | Exception]
+    """Apply `func' to each of `items' in a pool of `workers' threads or
+ processes (depending on `kind'). Results are returned in the order of
+ `items' regardless of the order in which they complete, so the outcome is
+ the same as for a plain loop. If a call raises, the exception takes the place
+ of its result.
+`progress' is called with the number of items done so far and the total, from
+ the calling thread, every time an item completes."""
+    total = len(items)
+    results = [None] * total  # type: list[R | Exception | None]
+    n = min(poolWorkers(workers), total)
+
+    if n <= 1:
+        for i, item in enumerate(items):
+            try:
+                results[i] = func(item)
+            except Exception as e:
+                results[i] = e
+            if progress:
+                progress(i + 1, total)
+        return results  # type: ignore[return-value]
+
+    if kind not in pool_kinds:
+        logger.warning(f"Unknown pool kind '{kind}', using threads")
+        kind = 'thread'
+    executor_type = ProcessPoolExecutor if kind == 'process' \
+        else ThreadPoolExecutor  # type: type[Executor]
+
+    with executor_type(max_workers=n) as executor:
+        futures = {executor.submit(func, item): i
+                   for i, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                results[i] = e
+            if progress:
+                progress(done, total)
+    return results  # type: ignore[return-value]
+
+
+if TYPE_CHECKING:
+    from typing import Callable, Sequence, TypeVar  # noqa: F401
+    from concurrent.futures import Executor  # noqa: F401
+    T = TypeVar('T')
+    R = TypeVar('R')
@@ -3,6 +3,7 @@ from typing import TYPE_CHECKING
 
 # Characters that are effectively space but not detected by isspace
 effectively_space = ['\ufeff', '\u180e', '\u200b', '\u000a']
+effectively_space_chars = ''.join(effectively_space)
 
 
 # Characters I hate and want to ignore even though they are not really space
@@ -36,7 +37,7 @@ def spacerstrip(s):
     # type: (str | UserString) -> str | UserString
     def _spacerstrip(s):
         # type: (str | UserString) -> str | UserString
-        return s.rstrip().rstrip(''.join(effectively_space))
+        return s.rstrip().rstrip(effectively_space_chars)
     ns = _spacerstrip(s)
     while ns != _spacerstrip(ns):
         ns = _spacerstrip(ns)
@@ -55,7 +56,7 @@ def nrspacerstrip(s):
     # type: (str | UserString) -> str | UserString
     ns = nspacerstrip(s)
     while len(ns) and ns[-1] == '\r':
-        ns = s[0:-1]
+        ns = ns[0:-1]
     return ns
 
 
@@ -66,5 +67,17 @@ def endsinn(s):
     return False
 
 
+def lineinfo(line):
+    # type: (str) -> LineInfo
+    """Whether `line' is skipped when typing (see `isspaceorempty'), the length
+ it can be typed to (see `nrspacerstrip'), and whether it ends in a newline
+ (see `endsinn'), worked out once per line rather than on each keystroke.
+ `line' should be the line as typed with the rdict (see `Equivalences.line'),
+ so that what is typed as space counts as space"""
+    return (isspaceorempty(line), len(nrspacerstrip(line)), endsinn(line))
+
+
 if TYPE_CHECKING:
+    from typing import Tuple  # noqa: F401
     from collections import UserString  # noqa: F401
+    LineInfo = Tuple[bool, int, bool]
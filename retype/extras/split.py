@@ -1,4 +1,4 @@
-from copy import deepcopy
+from heapq import merge
 
 from typing import TYPE_CHECKING
 
@@ -13,6 +13,76 @@ def isnewline(s):
     return s in newlines
 
 
+class Splitter:
+    """An sdict compiled for splitting text (see `splittext' for the sdict
+ structure). The text is split where the nearest splitter is; for a splitter
+ that is kept this is its end, otherwise its start, and when splitters are
+ equally near the one that comes first in the sdict is used. The occurrences of
+ each splitter are found with `str.find', lazily, and the streams of
+ occurrences are merged in the order the text would be split at them, so the
+ text is searched once per splitter rather than once per item split off."""
+    def __init__(self, sdict):
+        # type: (Splitter, SDict) -> None
+        self.sdict = sdict
+        # Empty splitters are skipped; they would never move on from where
+        #  they split
+        self.splitters = [(s, bool(entry['keep'])) for s, entry
+                          in sdict.items() if s]
+
+    def _occurrences(self, text, n):
+        # type: (Splitter, str, int) -> Iterator[tuple[int, int, int]]
+        """(position split at, `n', start) for each occurrence of the `n'th
+ splitter in `text', overlapping occurrences included"""
+        s, keep = self.splitters[n]
+        offset = len(s) if keep else 0
+        start = text.find(s)
+        while start != -1:
+            yield (start + offset, n, start)
+            start = text.find(s, start + 1)
+
+    def offsets(self, text):
+        # type: (Splitter, str) -> list[tuple[int, int, int]]
+        """The items `text' splits into, as (start, end, n) where `n' is the
+ index in `splitters' of the splitter that ended the item, or -1 for the final
+ item. Splitters that are not kept are not part of their item."""
+        res = []
+        i = 0
+        for pos, n, start in merge(*[self._occurrences(text, n)
+                                     for n in range(len(self.splitters))]):
+            # An occurrence overlapping the previous split is not found when
+            #  searching from where the previous item ended
+            if start < i:
+                continue
+            s, keep = self.splitters[n]
+            res.append((i, pos, n))
+            i = pos if keep else pos + len(s)
+        res.append((i, len(text), -1))
+        return res
+
+    def split(self,
+              text,  # type: str
+              indicatenewlines=False,  # type: bool
+              finalnewline=False,  # type: bool
+              fill=None  # type: str | None
+              ):
+        # type: (...) -> list[str]
+        """Split `text'; see `splittext' for the arguments"""
+        res = []
+        for start, end, n in self.offsets(text):
+            item = text[start:end]
+            if n == -1:
+                if finalnewline:
+                    item += '\n'
+            else:
+                s, keep = self.splitters[n]
+                if indicatenewlines and isnewline(s):
+                    item += '\n'
+                elif fill and not keep:
+                    item += fill * len(s)
+            res.append(item)
+        return res
+
+
 def splittext(text,  # type: str
               sdict,  # type: SDict
               indicatenewlines=False,  # type: bool
@@ -30,38 +100,11 @@ If 'finalnewline' is True, the final item in the resulting list will have \\n\
  appended to the end of it.
 'fill' is an optional character to add to the end of each item when 'keep' is\
  False to compensate for the length of the splitter in order to keep the\
- length of the overall text the same (except for the final item)."""
-    res = []
-    _sdict = deepcopy(sdict)  # type: PosedSDict  # type: ignore[arg-type]
-    remaining = list(_sdict)
-    i = n = 0
-    while len(remaining):
-        s = remaining[n]
-        pos = text.find(s, i)
-        if pos < 0:
-            del remaining[n]
-        else:
-            _sdict[s]['pos'] = pos+len(s) if _sdict[s]['keep'] else pos
-            n += 1
-        if len(remaining) and n >= len(remaining):
-            nearest_s = min(remaining, key=lambda s:  # type: ignore[misc]
-                            _sdict[s]['pos'])
-            pos = _sdict[nearest_s]['pos']
-            keep = _sdict[nearest_s]['keep']
-            item = text[i:pos]
-            if indicatenewlines and isnewline(nearest_s):
-                item += '\n'
-            elif fill and not keep:
-                item += fill * len(nearest_s)
-            res.append(item)
-            i = pos if keep else pos+len(nearest_s)
-            n = 0
-    item = text[i:len(text)]
-    if finalnewline:
-        item += '\n'
-    res.append(item)
-    return res
+ length of the overall text the same (except for the final item).
+To split several texts with the same sdict, compile it once with `Splitter'."""
+    return Splitter(sdict).split(text, indicatenewlines, finalnewline, fill)
 
 
 if TYPE_CHECKING:
-    from retype.extras.metatypes import SDict, PosedSDict  # noqa: F401
+    from typing import Iterator  # noqa: F401
+    from retype.extras.metatypes import SDict  # noqa: F401
@@ -1,3 +1,4 @@
+import re
 import logging
 from copy import deepcopy
 from collections import UserString
@@ -458,7 +459,182 @@ not {}".format(i))
         return ManifoldStr(data, rdict)
 
 
+class Equivalences:
+    """`rdict' compiled once for making lines where the replacements can be
+ typed in place of what they replace. `line' finds the replacements in a line
+ in one pass and returns an `EquivalentStr', which behaves like a `ManifoldStr'
+ of the line but where what is accepted at each position is looked up in a
+ table made when compiling, rather than worked out from the manifold on each
+ access."""
+    def __init__(self, rdict):
+        # type: (Equivalences, dict[str, list[str]]) -> None
+        self.rdict = rdict
+        # The AnyStr of each replacement, and one for each of its characters
+        self.anystrs = {}  # type: dict[str, AnyStr]
+        self.chars = {}  # type: dict[str, list[AnyStr]]
+        for key, replacements in rdict.items():
+            if not key:
+                continue
+            anystr = AnyStr(key, *replacements)
+            self.anystrs[key] = anystr
+            self.chars[key] = [
+                AnyStr(*[possibility[i:i + 1] for possibility
+                         in anystr.possibilities]) for i in range(len(key))]
+        keys = list(self.anystrs)
+        # Where no two keys can overlap, finding them all at once finds the
+        #  same as finding them key by key
+        self._pattern = re.compile('|'.join(map(re.escape, keys))) if \
+            keys and not self._overlapping(keys) else None
+
+    @staticmethod
+    def _overlapping(keys):
+        # type: (list[str]) -> bool
+        for a in keys:
+            for b in keys:
+                if a != b and (a in b or any(
+                        a.endswith(b[:i]) for i in range(1, len(b)))):
+                    return True
+        return False
+
+    def _find(self, data):
+        # type: (Equivalences, str) -> list[tuple[int, str]]
+        if self._pattern is not None:
+            return [(m.start(), m.group()) for m
+                    in self._pattern.finditer(data)]
+        # Keys in order, earlier keys taking the places they are found at
+        taken = bytearray(len(data))
+        found = []
+        for key in self.anystrs:
+            index = data.find(key)
+            while index != -1:
+                end = index + len(key)
+                if any(taken[index:end]):
+                    index = data.find(key, index + 1)
+                    continue
+                taken[index:end] = b'\x01' * len(key)
+                found.append((index, key))
+                index = data.find(key, end)
+        return sorted(found)
+
+    def line(self, data):
+        # type: (Equivalences, str) -> str | EquivalentStr
+        """`data' with the replacements found in it, or `data' itself if there
+ are none"""
+        if not self.anystrs:
+            return data
+        found = self._find(data)
+        if not found:
+            return data
+        return EquivalentStr(data, found, self)
+
+
+class EquivalentStr(str):
+    """A str in which the replacements of an `Equivalences' have been found,
+ and that is equal to the strs with any of them in place of what they
+ replace. Indexing gives the AnyStr of what is accepted at the position where
+ there is a replacement, and the character otherwise. Made by
+ `Equivalences.line'."""
+    def __new__(cls,  # type: type[EquivalentStr]
+                data,  # type: str
+                found,  # type: list[tuple[int, str]]
+                equivalences  # type: Equivalences
+                ):
+        # type: (...) -> EquivalentStr
+        new = super().__new__(cls, data)
+        new.found = found
+        new.equivalences = equivalences
+        new.accepted = {}
+        for start, key in found:
+            for i, anystr in enumerate(equivalences.chars[key]):
+                new.accepted[start + i] = anystr
+        return new
+
+    def __getitem__(self, i):  # type: ignore[override]
+        # type: (EquivalentStr, IndexOrSlice) -> AnyStr | str
+        if isinstance(i, int):
+            if i < 0:
+                i += len(self)
+            accepted = self.accepted.get(i)
+            if accepted is not None:
+                return accepted
+            return str.__getitem__(self, i)
+        data = str.__getitem__(self, i)
+        if not isinstance(i, slice):
+            return data
+        start, stop, step = i.indices(len(self))
+        if step != 1:
+            return data
+        # Replacements broken up by the slice revert to str
+        found = [(k - start, key) for k, key in self.found
+                 if start <= k and k + len(key) <= stop]
+        if not found:
+            return data
+        return EquivalentStr(data, found, self.equivalences)
+
+    def __iter__(self):  # type: ignore[override]
+        # type: (EquivalentStr) -> Iterator[AnyStr | str]
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, s):
+        # type: (EquivalentStr, object) -> bool
+        if str.__eq__(self, s) is True:
+            return True
+        if not isinstance(s, str) or len(s) != len(self):
+            return False
+        end = 0
+        for start, key in self.found:
+            if s[end:start] != str.__getitem__(self, slice(end, start)):
+                return False
+            end = start + len(key)
+            if s[start:end] != self.equivalences.anystrs[key]:
+                return False
+        return s[end:] == str.__getitem__(self, slice(end, None))
+
+    def __ne__(self, s):
+        # type: (EquivalentStr, object) -> bool
+        return not self.__eq__(s)
+
+    __hash__ = str.__hash__
+
+    def __repr__(self):
+        # type: (EquivalentStr) -> str
+        return (f'{self.__class__.__name__}'
+                f'({str.__repr__(self)}, {self.found})')
+
+    def _strippable(self, i, chars):
+        # type: (EquivalentStr, int, str | None) -> bool
+        c = self[i]
+        possibilities = c.possibilities if isinstance(c, AnyStr) else [c]
+        return any(not p.strip(chars) for p in possibilities)
+
+    def strip(self, chars=None, directions=[1, -1]):  # type: ignore[override]
+        # type: (EquivalentStr, str | None, list[int]) -> EquivalentStr | str
+        """As str.strip, also stripping places where a replacement would be
+ stripped"""
+        start, end = 0, len(self)
+        if 1 in directions:
+            while start < end and self._strippable(start, chars):
+                start += 1
+        if -1 in directions:
+            while end > start and self._strippable(end - 1, chars):
+                end -= 1
+        return self[start:end]
+
+    def lstrip(self, chars=None):  # type: ignore[override]
+        # type: (EquivalentStr, str | None) -> EquivalentStr | str
+        return self.strip(chars, directions=[1])
+
+    def rstrip(self, chars=None):  # type: ignore[override]
+        # type: (EquivalentStr, str | None) -> EquivalentStr | str
+        return self.strip(chars, directions=[-1])
+
+    def isspace(self):
+        # type: (EquivalentStr) -> bool
+        return bool(self) and not self.strip()
+
+
 if TYPE_CHECKING:
     from typing import (  # noqa: F401
-        Iterable, SupportsIndex, Mapping)
+        Iterable, Iterator, SupportsIndex, Mapping)
     IndexOrSlice = SupportsIndex | slice
@@ -283,6 +283,7 @@ class StenoBook:
             s = html
         self.chapters = [{'len': len(s), 'html': h, 'plain': s, 'images': []}
                          ]  # type: list[Chapter]
+        self.chapter_lens = [len(s)]
         self.chapter_lookup = {}  # type: dict[str, int]
         self.dirty = False
 
@@ -468,6 +469,18 @@ class StenoView(BookView):
         if v.cursor_pos is None:
             return
 
+        if self.overlay_mistakes:
+            self.wrong_text = text[end_correctness_index:].translate(
+                self.trans)
+            self.wrong = bool(self.wrong_text)
+            self.wrong_start = v.cursor_pos + end_correctness_index
+            self.wrong_end = self.wrong_start + len(self.wrong_text)
+            if not self.wrong:
+                self.wrong_start = self.wrong_end = None
+            self.showMistake(v.cursor_pos + end_correctness_index,
+                             self.wrong_text)
+            return
+
         # The way this works is if there’s any previous wrong_text it gets
         #  entirely removed, then readded as necessary.
         if self.wrong_start is not None and self.wrong_end is not None:
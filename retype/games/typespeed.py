@@ -54,6 +54,7 @@ class TypespeedBook:
         s = html
         self.chapters = [{'len': len(s), 'html': s, 'plain': s, 'images': []}
                          ]  # type: list[Chapter]
+        self.chapter_lens = [len(s)]
         self.chapter_lookup = {}  # type: dict[str, int]
         self.dirty = False
 
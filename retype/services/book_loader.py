@@ -0,0 +1,96 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from qt import QObject, pyqtSignal
+
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+
+class BookLoader(QObject):
+    """Opens books in a worker thread. The chapter at the position the book is
+ opened at is parsed first, after which `loaded' is emitted (in the thread the
+ loader lives in) and the rest of the chapters are parsed in the background.
+ If reading the book fails, `failed' is emitted with the exception instead.
+ Once done with a book, the chapters parsed are stored in the chapter cache.
+Loading a book cancels the loading of the previous one; nothing is emitted for
+ a cancelled book."""
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(object, object)
+
+    def __init__(self):
+        # type: (BookLoader) -> None
+        super().__init__()
+        # A single worker, so that books are processed one at a time
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._cancelled = threading.Event()
+
+    def load(self, book, pos=0):
+        # type: (BookLoader, BookWrapper, int) -> None
+        self.cancel()
+        self._cancelled = cancelled = threading.Event()
+        self._executor.submit(self._load, book, pos, cancelled)
+
+    def cancel(self):
+        # type: (BookLoader) -> None
+        self._cancelled.set()
+
+    def shutdown(self):
+        # type: (BookLoader) -> None
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _load(self, book, pos, cancelled):
+        # type: (BookLoader, BookWrapper, int, threading.Event) -> None
+        try:
+            self._loadChapters(book, pos, cancelled)
+        finally:
+            book.storeCachedChapters()
+
+    def _loadChapters(self, book, pos, cancelled):
+        # type: (BookLoader, BookWrapper, int, threading.Event) -> None
+        try:
+            # A book whose metadata could not be read is not known to be
+            #  readable until the epub is
+            if not book.valid and not book.load(warn=False):
+                raise OSError(f'Unable to read {book.path}')
+            chapters = book.chapters
+            if chapters:
+                pos = min(max(pos, 0), len(chapters) - 1)
+                self._parse(book, pos)
+        except Exception as e:
+            if not cancelled.is_set():
+                self.failed.emit(book, e)
+            return
+        if cancelled.is_set():
+            return
+        self.loaded.emit(book)
+
+        # The rest of the book, starting with the chapters that follow, so
+        #  that moving between chapters does not have to wait on parsing
+        for i in list(range(pos + 1, len(chapters))) + list(range(pos)):
+            if cancelled.is_set():
+                logger.debug(f"Cancelled loading '{book.title}'")
+                return
+            try:
+                self._parse(book, i)
+            except Exception as e:
+                logger.warning(f"Unable to parse chapter {i} of "
+                               f"'{book.title}'\n{e}")
+                return
+        logger.debug(f"Finished loading '{book.title}'")
+
+    @staticmethod
+    def _parse(book, pos):
+        # type: (BookWrapper, int) -> None
+        if not book.chapters.isParsed(pos):
+            # Read the epub here rather than as part of parsing, so that
+            #  errors are reported through `failed' instead of a message box
+            #  from the worker thread
+            book.load(warn=False)
+        book.chapters[pos]
+
+
+if TYPE_CHECKING:
+    from retype.controllers.library import BookWrapper  # noqa: F401
@@ -0,0 +1,107 @@
+import os
+import json
+import logging
+
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the structure of cached chapters, or the way chapters are
+#  parsed, changes; entries written with a different version are ignored.
+CACHE_VERSION = 3
+
+
+class ChapterCache:
+    """Parsed chapters of books, stored on disk per book checksum so that a
+ book does not need to be reparsed every time it is opened. The total size of
+ the cache is capped at `max_size' bytes; when it grows past that, the least
+ recently used entries are evicted. A `max_size' of 0 disables the cache."""
+    def __init__(self, user_dir, max_size=100 * 2**20):
+        # type: (ChapterCache, str, int) -> None
+        self.dir = os.path.join(user_dir, 'cache', 'chapters')
+        self.max_size = max_size
+
+    @property
+    def enabled(self):
+        # type: (ChapterCache) -> bool
+        return self.max_size > 0
+
+    def _path(self, checksum):
+        # type: (ChapterCache, str) -> str
+        return os.path.join(self.dir, f'{checksum}.json')
+
+    def load(self, checksum):
+        # type: (ChapterCache, str) -> CachedBook | None
+        path = self._path(checksum)
+        if not self.enabled or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f'Unable to read chapter cache {path}\n{e}')
+            self.remove(checksum)
+            return None
+        if not isinstance(data, dict) or \
+           data.get('version') != CACHE_VERSION or \
+           data.get('checksum') != checksum:
+            logger.debug(f'Discarding stale chapter cache {path}')
+            self.remove(checksum)
+            return None
+        try:
+            # Mark as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        logger.debug(f'Read chapter cache {path}')
+        return data['book']  # type: ignore[no-any-return]
+
+    def store(self, checksum, book):
+        # type: (ChapterCache, str, CachedBook) -> bool
+        if not self.enabled:
+            return False
+        path = self._path(checksum)
+        tmp_path = path + '.tmp'
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'checksum': checksum,
+                           'book': book}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f'Unable to write chapter cache {path}\n{e}')
+            return False
+        self.evict()
+        return True
+
+    def remove(self, checksum):
+        # type: (ChapterCache, str) -> None
+        try:
+            os.remove(self._path(checksum))
+        except OSError:
+            pass
+
+    def evict(self):
+        # type: (ChapterCache) -> None
+        """Remove least recently used entries until the cache fits in
+ `max_size'"""
+        try:
+            entries = [e for e in os.scandir(self.dir)
+                       if e.is_file() and e.name.endswith('.json')]
+            stats = [(e.path, e.stat()) for e in entries]
+        except OSError:
+            return
+        total = sum(st.st_size for _, st in stats)
+        for path, st in sorted(stats, key=lambda s: s[1].st_mtime):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                total -= st.st_size
+                logger.debug(f'Evicted chapter cache {path}')
+            except OSError as e:
+                logger.warning(f'Unable to evict chapter cache {path}\n{e}')
+
+
+if TYPE_CHECKING:
+    from retype.extras.metatypes import CachedBook  # noqa: F401
@@ -0,0 +1,59 @@
+import logging
+from collections import OrderedDict
+
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentCache:
+    """Chapter documents that have been built (html laid out, images decoded)
+ so that going back to a chapter does not build it again. Documents are kept
+ by key, usually the book, chapter and font they were built for, and evicted
+ least recently used first once their estimated size goes over `max_size'
+ bytes. A `max_size' of 0 disables the cache."""
+    def __init__(self, max_size=64 * 2**20):
+        # type: (DocumentCache, int) -> None
+        self.max_size = max_size
+        self.size = 0
+        self._documents = OrderedDict(
+        )  # type: OrderedDict[Hashable, tuple[QTextDocument, int]]
+
+    def __len__(self):
+        # type: (DocumentCache) -> int
+        return len(self._documents)
+
+    def __contains__(self, key):
+        # type: (DocumentCache, Hashable) -> bool
+        return key in self._documents
+
+    def get(self, key):
+        # type: (DocumentCache, Hashable) -> QTextDocument | None
+        entry = self._documents.get(key)
+        if entry is None:
+            return None
+        self._documents.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, document, size):
+        # type: (DocumentCache, Hashable, QTextDocument, int) -> None
+        if key in self._documents:
+            self.size -= self._documents.pop(key)[1]
+        if size > self.max_size:
+            return
+        self._documents[key] = (document, size)
+        self.size += size
+        while self.size > self.max_size:
+            evicted, (_, evicted_size) = self._documents.popitem(last=False)
+            self.size -= evicted_size
+            logger.debug(f'Evicted document {evicted}')
+
+    def clear(self):
+        # type: (DocumentCache) -> None
+        self._documents.clear()
+        self.size = 0
+
+
+if TYPE_CHECKING:
+    from typing import Hashable  # noqa: F401
+    from qt import QTextDocument  # noqa: F401
@@ -0,0 +1,176 @@
+import os
+import mmap
+import struct
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from time import monotonic_ns, time
+
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+# Each record is 32 bytes, little-endian:
+#  delta     uint32  microseconds since the previous record (at most about 71
+#                    minutes); in a record flagged START, milliseconds since
+#                    the start of the day instead
+#  chapter   uint16  position of the chapter in the book
+#  flags     uint8   see below
+#  (padding) 1 byte
+#  book      8 bytes first 8 bytes of the book's checksum
+#  offset    uint32  position in the chapter of the character typed (or of
+#                    the first deleted)
+#  expected  uint32  code point of the character that was to be typed there,
+#                    0 past the end of the line
+#  typed     uint32  code point of the character typed; for DELETE, the number
+#                    of characters deleted
+#  (padding) 4 bytes
+RECORD = struct.Struct('<IHBx8sIII4x')
+FIELDS = ('delta', 'chapter', 'flags', 'book', 'offset', 'expected', 'typed')
+
+CORRECT = 1
+DELETE = 2
+# First record of a session in the file
+START = 4
+
+MAX_DELTA = 2**32 - 1
+
+
+def bookId(checksum):
+    # type: (str) -> bytes
+    """The 8 bytes a book with `checksum' is recorded as"""
+    try:
+        return bytes.fromhex(checksum[:16]).ljust(8, b'\0')
+    except ValueError:
+        # Not an md5 (v1 save data for a book that could not be found)
+        return hashlib.md5(checksum.encode('utf-8')).digest()[:8]
+
+
+def logPath(directory, day):
+    # type: (str, date) -> str
+    return os.path.join(directory, f'{day.isoformat()}.keys')
+
+
+def readRecords(path):
+    # type: (str) -> list[tuple[int, int, int, bytes, int, int, int]]
+    """The records in the log at `path', read through a memory map"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        size -= size % RECORD.size
+        if not size:
+            return []
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as m:
+            return list(RECORD.iter_unpack(m))
+
+
+class KeystrokeLog:
+    """Records every key typed in a book to a file per day in `directory',
+ named after the day (YYYY-MM-DD.keys). Files are only ever appended to, and
+ are a sequence of fixed-width records (see RECORD) with no header, so they
+ can be memory-mapped as an array of records. Recording a key packs a record
+ into the file's buffer, which is written out as it fills up and on `close'.
+A record cut short when retype stopped is dropped when the file is next
+ opened."""
+    def __init__(self,  # type: KeystrokeLog
+                 directory,  # type: str
+                 clock=monotonic_ns,  # type: Callable[[], int]
+                 wall_clock=time  # type: Callable[[], float]
+                 ):
+        # type: (...) -> None
+        self.directory = directory
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._file = None  # type: BinaryIO | None
+        # Wall clock time at which the day of the open file ends
+        self._day_end = 0.0
+        # Clock time of the last record, in microseconds
+        self._last = 0
+        self._book = b''
+        self._checksum = None  # type: str | None
+        self.failed = False
+
+    def _open(self, now):
+        # type: (KeystrokeLog, float) -> BinaryIO | None
+        self.close()
+        day = datetime.fromtimestamp(now)
+        start = datetime.combine(day.date(), datetime.min.time())
+        self._day_end = (start + timedelta(days=1)).timestamp()
+        path = logPath(self.directory, day.date())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            f = open(path, 'ab')
+            # Drop a record cut short
+            size = f.tell()
+            if size % RECORD.size:
+                logger.warning(f'Dropping unfinished record in {path}')
+                f.truncate(size - size % RECORD.size)
+            # Time the session (in this file) started
+            f.write(RECORD.pack(int((now - start.timestamp()) * 1000), 0,
+                                START, b'', 0, 0, 0))
+        except OSError as e:
+            logger.error(f'Unable to open keystroke log {path}\n{e}',
+                         exc_info=True)
+            self.failed = True
+            return None
+        self._file = f
+        self._last = self._clock() // 1000
+        return f
+
+    def record(self,  # type: KeystrokeLog
+               checksum,  # type: str
+               chapter,  # type: int
+               offset,  # type: int
+               expected,  # type: int
+               typed,  # type: int
+               flags  # type: int
+               ):
+        # type: (...) -> None
+        """Record the character with code point `typed' typed at `offset' in
+ `chapter' where `expected' was to be typed (or with DELETE in `flags', that
+ `typed' characters were deleted from `offset')"""
+        if self.failed:
+            return
+        f = self._file
+        if f is None or self._wall_clock() >= self._day_end:
+            f = self._open(self._wall_clock())
+            if f is None:
+                return
+        if checksum != self._checksum:
+            self._checksum = checksum
+            self._book = bookId(checksum)
+        now = self._clock() // 1000
+        delta = min(now - self._last, MAX_DELTA)
+        self._last = now
+        try:
+            f.write(RECORD.pack(delta, chapter, flags, self._book, offset,
+                                expected, typed))
+        except OSError as e:
+            logger.error(f'Unable to write keystroke log\n{e}', exc_info=True)
+            self.failed = True
+
+    def setDirectory(self, directory):
+        # type: (KeystrokeLog, str) -> None
+        self.close()
+        self.directory = directory
+        self.failed = False
+
+    def flush(self):
+        # type: (KeystrokeLog) -> None
+        if self._file is not None:
+            try:
+                self._file.flush()
+            except OSError as e:
+                logger.error(f'Unable to write keystroke log\n{e}',
+                             exc_info=True)
+
+    def close(self):
+        # type: (KeystrokeLog) -> None
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+if TYPE_CHECKING:
+    from datetime import date  # noqa: F401
+    from typing import BinaryIO, Callable  # noqa: F401
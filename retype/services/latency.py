@@ -0,0 +1,147 @@
+import math
+import time
+import logging
+
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+
+# Each is timed from the key event reaching the console; `key' is when the
+#  console has finished handling it (textChanged is emitted during that)
+stages = ('key', 'textChanged', 'mistakes', 'highlighting', 'modeline',
+          'paint')
+
+
+class Histogram:
+    """Counts of samples (in microseconds) in `size' logarithmic buckets, each
+ `ratio' times as wide as the one before it, so that any number of samples
+ takes the same memory and percentiles are within `ratio' of the true value.
+ Samples past the last bucket are counted in it."""
+    def __init__(self, size=320, ratio=1.05):
+        # type: (Histogram, int, float) -> None
+        self.ratio = ratio
+        self._log_ratio = math.log(ratio)
+        self.counts = [0] * size
+        self.total = 0
+
+    def add(self, us):
+        # type: (Histogram, float) -> None
+        i = int(math.log(us) / self._log_ratio) if us > 1 else 0
+        self.counts[min(i, len(self.counts) - 1)] += 1
+        self.total += 1
+
+    def percentile(self, p):
+        # type: (Histogram, float) -> float | None
+        """Upper bound of the bucket the `p'th percentile sample is in, or None
+ if there are no samples"""
+        if not self.total:
+            return None
+        rank = max(math.ceil(self.total * p / 100), 1)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        return self.ratio ** (i + 1)
+
+    def clear(self):
+        # type: (Histogram) -> None
+        self.counts = [0] * len(self.counts)
+        self.total = 0
+
+
+class LatencyTracer:
+    """Times the stages from a key event reaching the console to the book being
+ repainted for it. `start' begins a trace, `mark' records how long after it a
+ stage was reached (only the first time in a trace), and the paint stage ends
+ it. While disabled these do nothing past checking a flag.
+If `samples_path' is set, each trace is also appended to it as a line of
+ comma-separated microseconds, one column per stage (empty if the stage was
+ not reached)."""
+    def __init__(self):
+        # type: (LatencyTracer) -> None
+        self.enabled = False
+        self.histograms = {stage: Histogram() for stage in stages}
+        self.samples_path = None  # type: str | None
+        self._samples_file = None  # type: TextIO | None
+        self._start = None  # type: int | None
+        self._trace = {}  # type: dict[str, float]
+
+    def enable(self, samples_path=None):
+        # type: (LatencyTracer, str | None) -> None
+        self.disable()
+        self.enabled = True
+        self.samples_path = samples_path
+        if samples_path is not None:
+            try:
+                self._samples_file = open(samples_path, 'a', encoding='utf-8')
+                if not self._samples_file.tell():
+                    self._samples_file.write(','.join(stages) + '\n')
+            except OSError as e:
+                logger.error(f'Could not open latency samples file: {e}')
+
+    def disable(self):
+        # type: (LatencyTracer) -> None
+        self._finish()
+        self.enabled = False
+        if self._samples_file is not None:
+            self._samples_file.close()
+            self._samples_file = None
+
+    def reset(self):
+        # type: (LatencyTracer) -> None
+        for histogram in self.histograms.values():
+            histogram.clear()
+
+    def start(self):
+        # type: (LatencyTracer) -> None
+        if not self.enabled:
+            return
+        # A trace whose key event caused no repaint ends at the next one
+        self._finish()
+        self._start = time.perf_counter_ns()
+
+    def mark(self, stage):
+        # type: (LatencyTracer, str) -> None
+        if self._start is None or stage in self._trace:
+            return
+        us = (time.perf_counter_ns() - self._start) / 1000
+        self._trace[stage] = us
+        self.histograms[stage].add(us)
+        if stage == 'paint':
+            self._finish()
+
+    def _finish(self):
+        # type: (LatencyTracer) -> None
+        if self._start is None:
+            return
+        if self._samples_file is not None:
+            self._samples_file.write(','.join(
+                f'{self._trace[stage]:.0f}' if stage in self._trace else ''
+                for stage in stages) + '\n')
+        self._start = None
+        self._trace = {}
+
+    def percentiles(self, ps=(50, 95, 99)):
+        # type: (LatencyTracer, Iterable[float]) -> dict[str, list[float|None]]
+        return {stage: [histogram.percentile(p) for p in ps]
+                for stage, histogram in self.histograms.items()}
+
+    def summary(self):
+        # type: (LatencyTracer) -> str
+        """Table of p50/p95/p99 milliseconds for each stage"""
+        lines = [f'{"stage":<13}{"n":>7}{"p50":>9}{"p95":>9}{"p99":>9}']
+        for stage, ps in self.percentiles().items():
+            cells = ''.join(f'{p / 1000:>9.2f}' if p is not None
+                            else f'{"-":>9}' for p in ps)
+            lines.append(
+                f'{stage:<13}{self.histograms[stage].total:>7}{cells}')
+        return '\n'.join(lines)
+
+
+tracer = LatencyTracer()
+
+
+if TYPE_CHECKING:
+    from typing import Iterable, TextIO  # noqa: F401
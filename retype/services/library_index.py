@@ -0,0 +1,134 @@
+import os
+import json
+import logging
+
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the structure of the index file changes; an index with a
+#  different version is considered stale and gets rebuilt.
+INDEX_VERSION = 1
+
+
+class LibraryIndex:
+    """On-disk record of the path, size, mtime and checksum of every epub seen
+ in the library, so that files which have not changed since the last run do
+ not need to be hashed again."""
+    def __init__(self, user_dir):
+        # type: (LibraryIndex, str) -> None
+        self.path = os.path.join(user_dir, 'library_index.json')
+        self._entries = None  # type: dict[str, IndexEntry] | None
+        self.dirty = False
+
+    @staticmethod
+    def key(path):
+        # type: (str) -> str
+        return os.path.normcase(os.path.abspath(path))
+
+    @property
+    def entries(self):
+        # type: (LibraryIndex) -> dict[str, IndexEntry]
+        if self._entries is None:
+            self._entries = self.load()
+        return self._entries
+
+    def load(self):
+        # type: (LibraryIndex) -> dict[str, IndexEntry]
+        if not os.path.exists(self.path):
+            logger.debug(f'Library index {self.path} not found. This is '
+                         'normal if the library has not been indexed yet.')
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f'Unable to read library index {self.path}, it '
+                           f'will be rebuilt.\n{e}')
+            self.dirty = True
+            return {}
+        entries = self.validate(data)
+        if entries is None:
+            logger.info(f'Library index {self.path} is stale or corrupt, it '
+                        'will be rebuilt.')
+            self.dirty = True
+            return {}
+        return entries
+
+    @staticmethod
+    def validate(data):
+        # type: (object) -> dict[str, IndexEntry] | None
+        """Return the entries in `data' if it looks like an index we wrote,
+ None otherwise"""
+        if not isinstance(data, dict) or \
+           data.get('version') != INDEX_VERSION:
+            return None
+        entries = data.get('entries')
+        if not isinstance(entries, dict):
+            return None
+        for entry in entries.values():
+            if not isinstance(entry, dict) or \
+               not isinstance(entry.get('size'), int) or \
+               not isinstance(entry.get('mtime_ns'), int) or \
+               not isinstance(entry.get('checksum'), str):
+                return None
+        return entries
+
+    def lookup(self, path, st):
+        # type: (LibraryIndex, str, os.stat_result) -> str | None
+        """Checksum of the file at `path' if it has not been modified since it
+ was indexed, None otherwise"""
+        entry = self.entries.get(self.key(path))
+        if entry and entry['size'] == st.st_size and \
+           entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['checksum']
+        return None
+
+    def record(self, path, st, checksum):
+        # type: (LibraryIndex, str, os.stat_result, str) -> None
+        self.entries[self.key(path)] = {'size': st.st_size,
+                                        'mtime_ns': st.st_mtime_ns,
+                                        'checksum': checksum}
+        self.dirty = True
+
+    def prune(self, paths, unavailable_roots=()):
+        # type: (LibraryIndex, Iterable[str], Iterable[str]) -> None
+        """Forget about all indexed files not in `paths', except for those
+ under `unavailable_roots' (e.g. a network share that is currently offline),
+ whose entries will be useful again once it comes back"""
+        if self._entries is None:
+            return
+        keep = {self.key(path) for path in paths}
+        roots = tuple(os.path.join(self.key(root), '')
+                      for root in unavailable_roots)
+        for key in [key for key in self._entries if key not in keep]:
+            if roots and key.startswith(roots):
+                continue
+            del self._entries[key]
+            self.dirty = True
+
+    def save(self):
+        # type: (LibraryIndex) -> bool
+        if not self.dirty or self._entries is None:
+            return True
+        if not os.path.isdir(os.path.dirname(self.path) or '.'):
+            logger.debug(f'Not saving library index {self.path}; user_dir '
+                         'cannot be found')
+            return False
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION,
+                           'entries': self._entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f'Unable to save library index {self.path}\n{e}',
+                         exc_info=True)
+            return False
+        self.dirty = False
+        return True
+
+
+if TYPE_CHECKING:
+    from typing import Iterable  # noqa: F401
+    from retype.extras.metatypes import IndexEntry  # noqa: F401
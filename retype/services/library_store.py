@@ -0,0 +1,272 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the schema changes; a store with a different version is
+#  discarded and imported again.
+STORE_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS books (
+    path TEXT PRIMARY KEY,
+    checksum TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    idn INTEGER,
+    title TEXT,
+    author TEXT,
+    -- File name in the epub of the cover image (see covers)
+    cover TEXT,
+    -- The rest of the epub metadata, as JSON
+    metadata TEXT,
+    -- Size of the html of each chapter, which the lengths of chapters not yet
+    --  parsed are estimated from, as JSON
+    chapter_sizes TEXT
+);
+CREATE INDEX IF NOT EXISTS books_checksum ON books (checksum);
+CREATE INDEX IF NOT EXISTS books_idn ON books (idn);
+CREATE TABLE IF NOT EXISTS covers (
+    checksum TEXT PRIMARY KEY,
+    media_type TEXT,
+    content BLOB
+);
+CREATE TABLE IF NOT EXISTS progress (
+    checksum TEXT PRIMARY KEY,
+    persistent_pos INTEGER,
+    chapter_pos INTEGER,
+    progress REAL,
+    friendly_name TEXT
+);
+'''
+
+
+class LibraryStore:
+    """SQLite database in `user_dir' holding what is known about the books in
+ the library (path, size, mtime, checksum and the metadata and chapter sizes
+ needed to put them on the shelf) and the progress in each, used instead of
+ the library index, save file and save journal when the `store' library
+ setting is 'sqlite'.
+It stands in for both `LibraryIndex' (lookup, record, prune, save) and
+ `SaveJournal' (replay, append, full, compact). Progress is saved a book at a
+ time, each in its own transaction, so the database stays consistent if
+ retype stops while saving. The first time it is opened, the library index,
+ save file and save journal are imported into it."""
+    def __init__(self, user_dir):
+        # type: (LibraryStore, str) -> None
+        self.user_dir = user_dir
+        self.path = os.path.join(user_dir, 'library.sqlite3')
+        # Progress is saved from the save writer's thread
+        self._lock = threading.Lock()
+        self._db = None  # type: sqlite3.Connection | None
+        self._rows = None  # type: dict[str, sqlite3.Row] | None
+        self.full = False
+
+    @property
+    def db(self):
+        # type: (LibraryStore) -> sqlite3.Connection
+        if self._db is None:
+            self._db = self._connect()
+        return self._db
+
+    def _connect(self):
+        # type: (LibraryStore) -> sqlite3.Connection
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        version = db.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, STORE_VERSION):
+            logger.info(f'Library store {self.path} is from another version '
+                        'of retype, it will be imported again.')
+            db.close()
+            os.remove(self.path)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+        with db:
+            db.executescript(SCHEMA)
+            db.execute(f'PRAGMA user_version = {STORE_VERSION}')
+        return db
+
+    @staticmethod
+    def key(path):
+        # type: (str) -> str
+        return os.path.normcase(os.path.abspath(path))
+
+    @property
+    def rows(self):
+        # type: (LibraryStore) -> dict[str, sqlite3.Row]
+        """Books by path, read in one query the first time they are needed"""
+        if self._rows is None:
+            with self._lock:
+                self._rows = {row['path']: row for row in self.db.execute(
+                    'SELECT * FROM books')}
+        return self._rows
+
+    @property
+    def imported(self):
+        # type: (LibraryStore) -> bool
+        with self._lock:
+            return self.db.execute(
+                "SELECT 1 FROM meta WHERE key = 'imported'").fetchone() \
+                is not None
+
+    def importLibrary(self, index_entries, save):
+        # type: (LibraryStore, dict[str, IndexEntry], Save) -> None
+        """Import the entries of the library index and the save data of the
+ save file"""
+        with self._lock, self.db as db:
+            db.executemany(
+                'INSERT OR IGNORE INTO books (path, checksum, size, mtime_ns)'
+                ' VALUES (?, ?, ?, ?)',
+                [(path, entry['checksum'], entry['size'], entry['mtime_ns'])
+                 for path, entry in index_entries.items()])
+            # Progress saved to the store since an import that was
+            #  interrupted is newer than that in the save file
+            db.executemany(
+                'INSERT OR IGNORE INTO progress VALUES (?, ?, ?, ?, ?)',
+                [self._progressRow(key, data) for key, data in save.items()])
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('imported', '1')")
+        self._rows = None
+        logger.info(f'Imported {len(index_entries)} books and progress in '
+                    f'{len(save)} into library store {self.path}')
+
+    # LibraryIndex
+
+    def lookup(self, path, st):
+        # type: (LibraryStore, str, os.stat_result) -> str | None
+        row = self.rows.get(self.key(path))
+        if row and row['size'] == st.st_size and \
+           row['mtime_ns'] == st.st_mtime_ns:
+            return row['checksum']  # type: ignore[no-any-return]
+        return None
+
+    def record(self, path, st, checksum):
+        # type: (LibraryStore, str, os.stat_result, str) -> None
+        key = self.key(path)
+        with self._lock, self.db as db:
+            # Metadata read for another file is not kept
+            db.execute('INSERT OR REPLACE INTO books (path, checksum, size, '
+                       'mtime_ns) VALUES (?, ?, ?, ?)',
+                       (key, checksum, st.st_size, st.st_mtime_ns))
+            self._rows = None
+
+    def prune(self, paths, unavailable_roots=()):
+        # type: (LibraryStore, Iterable[str], Iterable[str]) -> None
+        keep = {self.key(path) for path in paths}
+        roots = tuple(os.path.join(self.key(root), '')
+                      for root in unavailable_roots)
+        gone = [(key,) for key in self.rows if key not in keep and
+                not (roots and key.startswith(roots))]
+        if not gone:
+            return
+        with self._lock, self.db as db:
+            db.executemany('DELETE FROM books WHERE path = ?', gone)
+            self._rows = None
+
+    def save(self):
+        # type: (LibraryStore) -> bool
+        # Changes are committed as they are made
+        return True
+
+    def setIdns(self, items):
+        # type: (LibraryStore, Iterable[LibraryItem]) -> None
+        with self._lock, self.db as db:
+            db.execute('UPDATE books SET idn = NULL')
+            db.executemany('UPDATE books SET idn = ? WHERE path = ?',
+                           [(item.idn, self.key(item.path))
+                            for item in items])
+
+    # Metadata
+
+    def shelf(self):
+        # type: (LibraryStore) -> dict[int, ShelfEntry]
+        """Checksum, metadata and chapter sizes of each book in the library
+ whose metadata has been recorded, by id, in one query"""
+        with self._lock:
+            rows = self.db.execute(
+                'SELECT books.*, covers.media_type, covers.content FROM books'
+                ' LEFT JOIN covers USING (checksum) WHERE idn IS NOT NULL AND'
+                ' metadata IS NOT NULL ORDER BY idn').fetchall()
+        shelf = {}
+        for row in rows:
+            metadata = json.loads(row['metadata'])
+            metadata.update({'title': row['title'], 'author': row['author'],
+                             'cover': row['cover'],
+                             'cover_media_type': row['media_type'],
+                             'cover_content': row['content']})
+            shelf[row['idn']] = (row['checksum'], metadata,
+                                 json.loads(row['chapter_sizes']))
+        return shelf
+
+    def recordMetadata(self, checksum, metadata, chapter_sizes):
+        # type: (LibraryStore, str, EpubMetadata, list[int]) -> None
+        rest = {'opf_dir': metadata['opf_dir'], 'spine': metadata['spine']}
+        with self._lock, self.db as db:
+            db.execute('UPDATE books SET title = ?, author = ?, cover = ?, '
+                       'metadata = ?, chapter_sizes = ? WHERE checksum = ?',
+                       (metadata['title'], metadata['author'],
+                        metadata['cover'], json.dumps(rest),
+                        json.dumps(chapter_sizes), checksum))
+            db.execute('INSERT OR REPLACE INTO covers VALUES (?, ?, ?)',
+                       (checksum, metadata['cover_media_type'],
+                        metadata['cover_content']))
+
+    # SaveJournal
+
+    def replay(self, save):
+        # type: (LibraryStore, Save) -> Save
+        """Add the progress in each book to `save'"""
+        with self._lock:
+            for row in self.db.execute('SELECT * FROM progress'):
+                data = {'persistent_pos': row['persistent_pos'],
+                        'chapter_pos': row['chapter_pos'],
+                        'progress': row['progress']}  # type: SaveData
+                if row['friendly_name'] is not None:
+                    data['friendly_name'] = row['friendly_name']
+                save[row['checksum']] = data
+        return save
+
+    def append(self, key, data):
+        # type: (LibraryStore, str, SaveData) -> None
+        """Save `data' as the progress in the book with checksum `key'.
+ Raises OSError"""
+        try:
+            with self._lock, self.db as db:
+                db.execute(
+                    'INSERT OR REPLACE INTO progress VALUES (?, ?, ?, ?, ?)',
+                    self._progressRow(key, data))
+        except sqlite3.Error as e:
+            raise OSError(f'Unable to save progress to {self.path}: {e}')
+
+    def compact(self, save):
+        # type: (LibraryStore, Save) -> None
+        pass
+
+    @staticmethod
+    def _progressRow(key, data):
+        # type: (str, SaveData) -> tuple[str, int, int, float, str | None]
+        return (key, data.get('persistent_pos'), data.get('chapter_pos'),
+                data.get('progress'), data.get('friendly_name'))
+
+    def close(self):
+        # type: (LibraryStore) -> None
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+if TYPE_CHECKING:
+    from typing import Iterable, Tuple  # noqa: F401
+    from retype.controllers.library import LibraryItem  # noqa: F401
+    from retype.extras.metatypes import (  # noqa: F401
+        IndexEntry, Save, SaveData, EpubMetadata)
+    ShelfEntry = Tuple[str, EpubMetadata, list[int]]
@@ -0,0 +1,89 @@
+import os
+import json
+import logging
+
+from typing import TYPE_CHECKING
+
+from retype.services.save_writer import writeFile
+
+logger = logging.getLogger(__name__)
+
+
+class SaveJournal:
+    """Progress saved since the save file was last written, kept as records of
+ one book's save data each appended to a journal next to it, so that saving
+ costs the same however many books have been saved. Once the journal has
+ `max_records' records they are compacted into the save file.
+Both stay consistent if writing is interrupted: records are whole lines, and
+ a line that was not finished is ignored; the save file is written in full
+ before replacing the old one, and records in the journal that are already in
+ it when compaction is interrupted are applied again harmlessly."""
+    def __init__(self, save_path, max_records=100):
+        # type: (SaveJournal, str, int) -> None
+        self.save_path = save_path
+        self.path = os.path.splitext(save_path)[0] + '.journal'
+        self.max_records = max_records
+        # Records in the journal, and whether it ends in an unfinished one
+        self.records = 0
+        self._unfinished = False
+
+    def replay(self, save):
+        # type: (SaveJournal, Save) -> Save
+        """Apply the records in the journal to `save' (the contents of the
+ save file)"""
+        self.records = 0
+        self._unfinished = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        logger.warning('Ignoring unfinished record at the end '
+                                       f'of save journal {self.path}')
+                        self._unfinished = True
+                        break
+                    try:
+                        key, data = json.loads(line)
+                    except ValueError as e:
+                        logger.warning('Ignoring unreadable record in save '
+                                       f'journal {self.path}\n{e}')
+                        continue
+                    save[key] = data
+                    self.records += 1
+        except FileNotFoundError:
+            pass
+        if self.records:
+            logger.info(f'Read {self.records} records from save journal '
+                        f'{self.path}')
+        return save
+
+    def append(self, key, data):
+        # type: (SaveJournal, str, SaveData) -> None
+        """Record `data' as the save data of `key'. Raises OSError"""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            if self._unfinished:
+                f.write('\n')
+                self._unfinished = False
+            f.write(json.dumps([key, data]) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.records += 1
+
+    @property
+    def full(self):
+        # type: (SaveJournal) -> bool
+        return self.records >= self.max_records
+
+    def compact(self, save):
+        # type: (SaveJournal, Save) -> None
+        """Write `save' (including everything in the journal) to the save
+ file and empty the journal. Raises OSError"""
+        writeFile(self.save_path, json.dumps(save, indent=2))
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+        self.records = 0
+        self._unfinished = False
+        logger.debug(f'Compacted save journal into {self.save_path}')
+
+
+if TYPE_CHECKING:
+    from retype.extras.metatypes import Save, SaveData  # noqa: F401
@@ -0,0 +1,72 @@
+import os
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from qt import QObject, pyqtSignal
+
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+
+def writeFile(path, text):
+    # type: (str, str) -> None
+    """Write `text' to `path' through a temporary file that replaces it once
+ written in full, so that it is never left half written. Raises OSError"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SaveWriter(QObject):
+    """Writes files (progress, config) in a worker thread so that a slow disk
+ does not hold up typing. Each write is for a target, and a write for a target
+ that has not been written yet replaces the one waiting, so that only the
+ latest is written. If writing raises, `failed' is emitted (in the thread the
+ writer lives in) with the target, path and error."""
+    failed = pyqtSignal(object, str, str)
+
+    def __init__(self):
+        # type: (SaveWriter) -> None
+        super().__init__()
+        # A single worker, so that writes are done in the order requested
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        # Write waiting for each target, with the path it writes to
+        self._pending = {}  # type: dict[Hashable, Write]
+
+    def write(self, target, path, func):
+        # type: (SaveWriter, Hashable, str, Callable[[], None]) -> None
+        """Have `func' (which writes to `path') called in the worker thread,
+ unless another write for `target' is requested before then"""
+        with self._lock:
+            waiting = target in self._pending
+            self._pending[target] = (path, func)
+        if not waiting:
+            self._executor.submit(self._write, target)
+
+    def _write(self, target):
+        # type: (SaveWriter, Hashable) -> None
+        with self._lock:
+            path, func = self._pending.pop(target)
+        try:
+            func()
+        except Exception as e:
+            # Anything else raised would be lost in the future the executor
+            #  returns, which is never looked at
+            logger.error(f'Unable to write {path}\n{e}', exc_info=True)
+            self.failed.emit(target, path, traceback.format_exc())
+
+    def flush(self):
+        # type: (SaveWriter) -> None
+        """Wait until all writes requested have been written"""
+        self._executor.submit(lambda: None).result()
+
+
+if TYPE_CHECKING:
+    from typing import Callable, Hashable, Tuple  # noqa: F401
+    Write = Tuple[str, Callable[[], None]]
@@ -1,2 +1,3 @@
 from .stats_dock import StatsDock
-__all__ = ('StatsDock',)
+from .stats_view import StatsView
+__all__ = ('StatsDock', 'StatsView')
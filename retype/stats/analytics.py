@@ -0,0 +1,348 @@
+import os
+import re
+import logging
+from datetime import date, datetime
+
+from typing import TYPE_CHECKING
+
+from retype.services.keystroke_log import RECORD, CORRECT, DELETE, START
+
+try:
+    import numpy as np
+except ImportError:
+    # Only needed for analytics, which are unavailable without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+LOG_NAME = re.compile(r'^(\d{4}-\d{2}-\d{2})\.keys$')
+# Most pairs of characters counted with a bin for each possible pair
+MAX_BIGRAM_BINS = 2**22
+
+
+def available():
+    # type: () -> bool
+    return np is not None
+
+
+def recordDtype():
+    # type: () -> np.dtype
+    """Structured dtype of the records of a keystroke log (see RECORD), with
+ the book as an integer"""
+    return np.dtype({
+        'names': ['delta', 'chapter', 'flags', 'book', 'offset', 'expected',
+                  'typed'],
+        'formats': ['<u4', '<u2', 'u1', '<u8', '<u4', '<u4', '<u4'],
+        'offsets': [0, 4, 6, 8, 16, 20, 24],
+        'itemsize': RECORD.size})
+
+
+def bookKey(book):
+    # type: (int) -> str
+    """The start of the checksum of the book recorded as `book'"""
+    return int(book).to_bytes(8, 'little').hex()
+
+
+def loadLogs(directory, since=None):
+    # type: (str, date | None) -> list[tuple[date, np.ndarray]]
+    """The keystroke logs in `directory' (from `since' on), each memory-mapped
+ as an array of records, by day"""
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    dtype = recordDtype()
+    logs = []
+    for name in names:
+        match = LOG_NAME.match(name)
+        if not match:
+            continue
+        day = date.fromisoformat(match.group(1))
+        if since is not None and day < since:
+            continue
+        path = os.path.join(directory, name)
+        # A record cut short at the end is left out
+        count = os.path.getsize(path) // RECORD.size
+        if count:
+            logs.append((day, np.memmap(path, dtype, 'r', shape=(count,))))
+    return logs
+
+
+class KeystrokeStats:
+    """Typing statistics over the records of keystroke logs (see
+ `KeystrokeLog'), computed with array operations over all the records at
+ once.
+The time of each record is worked out from the time the log was opened (in
+ the first record after) and the time between records since. Time between
+ records of more than `idle' seconds is a pause, which is left out of the
+ time spent typing, and a pause of more than `session_gap' seconds starts a
+ new session, as does opening the log.
+Characters deleted are not counted as keys, but characters typed after a
+ mistake are, so speeds are gross speeds. Accuracy is the fraction of keys
+ typed while the text typed still matched; error rates of characters are the
+ fraction of times something other than the character was typed where it was
+ to be typed."""
+    def __init__(self,  # type: KeystrokeStats
+                 logs,  # type: list[tuple[date, np.ndarray]]
+                 idle=5.0,  # type: float
+                 session_gap=300.0  # type: float
+                 ):
+        # type: (...) -> None
+        self.idle = idle
+        self.days = [day for day, _ in logs]
+        # Copied as bytes, which is much faster than copying records field
+        #  by field
+        records = np.concatenate(
+            [log.view(np.uint8) for _, log in logs] or
+            [np.zeros(0, np.uint8)]).view(recordDtype())
+        lengths = [len(log) for _, log in logs]
+        midnights = np.array([datetime.combine(
+            day, datetime.min.time()).timestamp() for day in self.days])
+        day = np.repeat(np.arange(len(logs)), lengths)
+
+        start = (records['flags'] & START) != 0
+        # Records before the log was first opened cannot be placed in time
+        first = int(np.argmax(start)) if start.any() else len(records)
+        records, start, day = records[first:], start[first:], day[first:]
+        # Records are kept where they are (rather than copied into arrays
+        #  without the records opening the log), and are left out by
+        #  `is_key' instead
+        self.day = day
+        self.flags = records['flags']
+        self.book = records['book']
+        self.chapter = records['chapter']
+        self.offset = records['offset']
+        self.expected = records['expected']
+        self.typed = records['typed']
+
+        delta = records['delta'].astype(np.int64)
+        # The time the log was last opened at each record, and microseconds
+        #  since
+        elapsed = np.cumsum(np.where(start, 0, delta))
+        starts = np.flatnonzero(start)
+        opened = np.diff(np.append(starts, len(records)))
+        # Records opening the log have the milliseconds since midnight
+        open_times = midnights[day[starts]] + delta[starts] / 1000
+        since_open = elapsed - np.repeat(elapsed[starts], opened)
+        self.time = np.repeat(open_times, opened) + since_open / 1e6
+
+        self.is_key = (self.flags & (DELETE | START)) == 0
+        self.correct = self.is_key & ((self.flags & CORRECT) != 0)
+        self.mistyped = self.is_key & (self.expected != 0) & \
+            (self.typed != self.expected)
+        # Seconds between each record and the next, infinite across opening
+        #  the log
+        self.intervals = np.where(start[1:], np.inf,
+                                  np.diff(since_open) / 1e6)
+        new_session = np.ones(len(self.time), bool)
+        new_session[1:] = self.intervals > session_gap
+        session_starts = np.flatnonzero(new_session)
+        self.session = np.repeat(
+            np.arange(len(session_starts)),
+            np.diff(np.append(session_starts, len(self.time))))
+        self.session_starts = self.time[session_starts]
+        # Time spent typing before each record
+        self.active = np.zeros(len(self.time))
+        self.active[1:] = np.where(self.intervals <= idle, self.intervals, 0)
+
+    def __len__(self):
+        # type: (KeystrokeStats) -> int
+        return int(np.count_nonzero(self.is_key))
+
+    @property
+    def sessions(self):
+        # type: (KeystrokeStats) -> int
+        """Number of sessions in which keys were typed"""
+        return int(np.count_nonzero(np.bincount(
+            self.session, self.is_key, len(self.session_starts))))
+
+    def _groupBy(self, labels):
+        # type: (KeystrokeStats, np.ndarray) -> Columns
+        """Statistics for each value of `labels' (one for each record) that
+ keys were typed with. Labels are expected to change seldom (from one run of
+ records to the next), so only the first label of each run is sorted"""
+        if not len(labels):
+            columns = self._columns(np.zeros(0, np.intp), 0)
+            columns['key'] = labels[:0]
+            return columns
+        starts = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+        starts = np.concatenate(([0], starts))
+        keys, run_groups = np.unique(labels[starts], return_inverse=True)
+        groups = np.repeat(run_groups,
+                           np.diff(np.append(starts, len(labels))))
+        columns = self._columns(groups, len(keys))
+        columns['key'] = keys
+        typed = columns['keys'] > 0
+        return {name: column[typed] for name, column in columns.items()}
+
+    def _columns(self, groups, count):
+        # type: (KeystrokeStats, np.ndarray, int) -> Columns
+        keys = np.bincount(groups, self.is_key, count)
+        correct = np.bincount(groups, self.correct, count)
+        time = np.bincount(groups, self.active, count)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {'keys': keys.astype(np.int64),
+                    'accuracy': np.where(keys > 0, correct / keys, 0.0),
+                    'wpm': np.where(time > 0, keys / 5 / (time / 60), 0.0),
+                    'time': time}
+
+    def total(self):
+        # type: (KeystrokeStats) -> Columns
+        """Keys, accuracy, WPM and time spent typing over all records, each
+ as an array of one"""
+        return self._columns(np.zeros(len(self.time), np.intp), 1)
+
+    def bySession(self):
+        # type: (KeystrokeStats) -> Columns
+        """Statistics for each session; `key' is the session, and `start' the
+ time it started"""
+        columns = self._groupBy(self.session)
+        columns['start'] = self.session_starts[columns['key']]
+        return columns
+
+    def byBook(self):
+        # type: (KeystrokeStats) -> Columns
+        """Statistics for each book; `key' is the book (see `bookKey')"""
+        return self._groupBy(self.book)
+
+    def byDay(self):
+        # type: (KeystrokeStats) -> Columns
+        """Statistics for each day; `key' is the position of the day in
+ `days'"""
+        return self._groupBy(self.day)
+
+    def latencyPercentiles(self, percentiles=(50, 90, 99)):
+        # type: (KeystrokeStats, Sequence[float]) -> np.ndarray
+        """Percentiles of the time in ms between keys, leaving out pauses and
+ the characters of a stroke that come all at once"""
+        intervals = self.intervals[(self.intervals > 0) &
+                                   (self.intervals <= self.idle)]
+        if not len(intervals):
+            return np.full(len(percentiles), np.nan)
+        return np.percentile(intervals, percentiles) * 1000
+
+    def rollingWpm(self, window=30.0, points=None):
+        # type: (KeystrokeStats, float, int | None) -> Series
+        """WPM over the last `window' seconds spent typing at each key (or at
+ `points' keys evenly spread), once that much time has been spent typing, and
+ the times of those keys"""
+        typing_time = np.cumsum(self.active)
+        at = np.flatnonzero(self.is_key & (typing_time >= window))
+        if points is not None and len(at) > points:
+            at = at[np.linspace(0, len(at) - 1, points).astype(np.intp)]
+        keys = np.cumsum(self.is_key)
+        # As typing_time starts at 0, there is a record at or before the
+        #  start of each window
+        first = np.searchsorted(typing_time, typing_time[at] - window, 'right')
+        wpm = (keys[at] - keys[first - 1]) / 5 / (window / 60)
+        return self.time[at], wpm
+
+    def _errorRates(self, codes, mistyped, size, min_count):
+        # type: (KeystrokeStats, np.ndarray, np.ndarray, int, int) -> Columns
+        """Error rates of the values of `codes' (below `size')"""
+        count = np.bincount(codes, minlength=size)
+        errors = np.bincount(codes, mistyped, size)
+        common = np.flatnonzero(count >= min_count)
+        rate = errors[common] / count[common]
+        order = np.argsort(-rate, kind='stable')
+        common = common[order]
+        return {'key': common, 'count': count[common],
+                'errors': errors[common].astype(np.int64), 'rate': rate[order]}
+
+    def charErrors(self, min_count=20):
+        # type: (KeystrokeStats, int) -> Columns
+        """Error rate of each character typed at least `min_count' times,
+ highest first; `key' is the code point"""
+        mask = self.is_key & (self.expected != 0)
+        codes = self.expected[mask]
+        return self._errorRates(codes, self.mistyped[mask],
+                                int(codes.max(initial=0)) + 1, min_count)
+
+    def bigramErrors(self, min_count=20):
+        # type: (KeystrokeStats, int) -> Columns
+        """Error rate of the second character of each pair of characters
+ typed one after the other at least `min_count' times, highest first; `key'
+ is the code points of the pair, the first shifted left by 21 bits"""
+        typed = self.is_key & (self.expected != 0)
+        # Pairs of keys typed in a row, at consecutive places in the text
+        follows = typed[1:] & typed[:-1] & \
+            (self.session[1:] == self.session[:-1]) & \
+            (self.book[1:] == self.book[:-1]) & \
+            (self.chapter[1:] == self.chapter[:-1]) & \
+            (self.offset[1:] == self.offset[:-1] + 1)
+        mask = np.zeros(len(typed), bool)
+        mask[1:] = follows
+        firsts = self.expected[:-1][follows]
+        seconds = self.expected[mask]
+        # Pairs are counted by the positions of their characters among the
+        #  characters typed, of which there are few, rather than by code point
+        chars = np.flatnonzero(np.bincount(self.expected[typed]))
+        positions = np.zeros(int(chars.max(initial=0)) + 1, np.intp)
+        positions[chars] = np.arange(len(chars))
+        size = len(chars)
+        if size ** 2 <= MAX_BIGRAM_BINS:
+            rates = self._errorRates(
+                positions[firsts] * size + positions[seconds],
+                self.mistyped[mask], size ** 2, min_count)
+            pairs = rates['key']
+            rates['key'] = (chars[pairs // size].astype(np.uint64) << 21) | \
+                chars[pairs % size].astype(np.uint64)
+            return rates
+        # Too many different characters to have a bin for each pair
+        codes = (firsts.astype(np.uint64) << 21) | seconds.astype(np.uint64)
+        keys, pairs = np.unique(codes, return_inverse=True)
+        rates = self._errorRates(pairs, self.mistyped[mask], len(keys),
+                                 min_count)
+        rates['key'] = keys[rates['key']]
+        return rates
+
+    def summary(self, top=5):
+        # type: (KeystrokeStats, int) -> str
+        if not len(self):
+            return 'No keys recorded'
+        total = self.total()
+        p50, p90, p99 = self.latencyPercentiles()
+        lines = [
+            f'{len(self)} keys in {self.sessions} sessions over '
+            f'{len(self.days)} days, {total["time"][0] / 60:.0f} min: '
+            f'{total["wpm"][0]:.1f} WPM, {total["accuracy"][0]:.1%} accuracy',
+            f'Time between keys p50/p90/p99: {p50:.0f}/{p90:.0f}/{p99:.0f} ms']
+        chars = self.charErrors()
+        if len(chars['key']):
+            lines.append('Most mistyped characters: ' + ', '.join(
+                f'{showChars(key)} {rate:.0%}' for key, rate
+                in zip(chars['key'][:top], chars['rate'][:top])))
+        bigrams = self.bigramErrors()
+        if len(bigrams['key']):
+            lines.append('Most mistyped pairs: ' + ', '.join(
+                f'{showChars(key)} {rate:.0%}' for key, rate
+                in zip(bigrams['key'][:top], bigrams['rate'][:top])))
+        return '\n'.join(lines)
+
+
+def showChars(code):
+    # type: (int) -> str
+    """The character or pair of characters of `code' (see `charErrors' and
+ `bigramErrors'), quoted"""
+    code = int(code)
+    chars = chr(code & 0x1fffff)
+    if code >> 21:
+        chars = chr(code >> 21) + chars
+    return repr(chars)
+
+
+def analyse(directory, since=None, idle=5.0, session_gap=300.0):
+    # type: (str, date | None, float, float) -> KeystrokeStats | None
+    """Statistics over the keystroke logs in `directory', or None if numpy
+ is not installed"""
+    if np is None:
+        logger.warning('Typing analytics need numpy, which is not installed')
+        return None
+    return KeystrokeStats(loadLogs(directory, since), idle, session_gap)
+
+
+if TYPE_CHECKING:
+    from typing import Sequence  # noqa: F401
+    Columns = dict[str, np.ndarray]
+    # Times and values
+    Series = tuple[np.ndarray, np.ndarray]
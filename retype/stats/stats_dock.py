@@ -1,10 +1,11 @@
 from math import floor, ceil
-from time import time
-from qt import QWidget, QPainter, Qt, QSize, QFontMetricsF
+from qt import (QWidget, QPainter, Qt, QSize, QFontMetricsF, QPixmap, QPen,
+                QRect, QRectF)
 
 from typing import TYPE_CHECKING
 
-from retype.ui.painting import rectPixmap, textPixmap, linePixmap, Font
+from retype.ui.painting import Font, center
+from retype.stats.typing_speed import TypingSpeed
 from retype.services.theme import theme, C, Theme
 
 
@@ -12,24 +13,44 @@ from retype.services.theme import theme, C, Theme
 @theme('BookView.StatsDock.Text', C(fg='black'))
 @theme('BookView.StatsDock.Grid', C(fg='gray'))
 class StatsDock(QWidget):
-    def __init__(self, book_view, parent=None):
-        # type: (StatsDock, BookView, QWidget | None) -> None
+    def __init__(self,  # type: StatsDock
+                 book_view,  # type: BookView
+                 windows=(5, 30),  # type: Sequence[float]
+                 parent=None  # type: QWidget | None
+                 ):
+        # type: (...) -> None
         super().__init__(parent)
         self.book_view = book_view
 
         self.connected = False
 
+        # The speed over the first window is the one shown and graphed
+        self.speed = TypingSpeed(windows)
         self.prev_cursor_pos = 0
-        self.prev_seconds = 0
-        self.prev_ts = 0
-        self.c = 0
+        self.prev_text = ''
         self.cpm = 0
         self.wpm = 0
+        self.wpm_session = 0
         self.wpm_pb = 0
         self.wpms = []  # type: list[int]
+        # Number of bars ever added to `wpms' (which only keeps those shown)
+        self.wpms_added = 0
+        self.rect_w = 15
+
+        # The graph (background, bars and gridlines) as last drawn, what it
+        #  was drawn for (size, device pixel ratio and personal best), and
+        #  the numbers of the first bar in it and the bar after the last
+        self._graph = None  # type: QPixmap | None
+        self._graph_key = None  # type: tuple[int, int, float, int] | None
+        self._graph_start = self._graph_end = 0
+        # Font the text is drawn in, its height, and the device pixel ratio
+        #  they are for
+        self._font = None  # type: tuple[QFont, QFontMetricsF, int] | None
+        self._font_dpr = None  # type: float | None
 
         self.main_c, self.text_c, self.grid_c = self._loadTheme()
-        self.main_c.changed.connect(self.themeUpdate)
+        for c in (self.main_c, self.text_c, self.grid_c):
+            c.changed.connect(self.themeUpdate)
 
     def _loadTheme(self):
         # type: (StatsDock) -> tuple[C, ...]
@@ -39,11 +60,13 @@ class StatsDock(QWidget):
 
     def themeUpdate(self):
         # type: (StatsDock) -> None
+        self._graph = None
+        self._font = None
         self.update()
 
     def connectConsole(self, console):
         # type: (StatsDock, Console) -> None
-        self._hs = console.highlighting_service
+        self._console = console
         console.textEdited.connect(self.onUpdate)
         self.connected = True
 
@@ -53,98 +76,137 @@ class StatsDock(QWidget):
         if not v.isVisible() or v.cursor_pos is None:
             return
 
-        ts = round(time())
-        # Start “timer”
-        if not self.prev_ts:
-            self.prev_ts = ts
-
-        seconds = (ts - self.prev_ts) or 1
-
-        # Reset if been inactive
-        if seconds - self.prev_seconds > 2:
-            self.prev_ts = ts
-            self.c = 0
-
-        graphShouldUpdate = False
-        # FIXME: This is probably not very robust; it’s an attempt to make
-        #  things work for both character-by-character typing and stenography
-        #  where whole words can be inputted at once, while preventing the
-        #  cursor-maniplation commands from affecting the count undesirably.
-        if len(text) >= v.cursor_pos - self.prev_cursor_pos > 0:
-            self.c += v.cursor_pos - self.prev_cursor_pos
-            graphShouldUpdate = True
-
-        # CPM and WPM calculation
-        self.cpm = floor((self.c / seconds) * 60)
-        self.wpm = floor(self.cpm / 5)
-
-        # Personal best
-        if self.wpm > self.wpm_pb:
+        # Characters typed correctly: the text added by the edit, as far as
+        #  the cursor moved with it. The cursor can move further when a line
+        #  is finished (skipping its trailing space) or by commands, and text
+        #  can be added without the cursor moving when it is wrong.
+        typed = max(min(len(text) - len(self.prev_text),
+                        v.cursor_pos - self.prev_cursor_pos), 0)
+        if typed:
+            self.speed.add(typed)
+        graphShouldUpdate = bool(typed)
+
+        window = self.speed.windows[0]
+        self.cpm = floor(self.speed.cpm(window))
+        self.wpm = floor(self.speed.wpm(window))
+        self.wpm_session = floor(self.speed.wpm())
+
+        # Personal best, once the speed is over the whole window
+        if self.wpm > self.wpm_pb and self.speed.covers(window):
             self.wpm_pb = self.wpm
 
-        # Periodic refreshment
-        if seconds > 20:
-            self.prev_ts = ts - 5
-            self.c = int(self.cpm / 12)
-
         # Graph update
         if graphShouldUpdate:
-            self.rect_w = 15
             w = self.size().width()
             amount = floor(w / self.rect_w)
             if len(self.wpms) > amount:
                 length = len(self.wpms)
                 self.wpms = self.wpms[length-amount:length]
             self.wpms.append(self.wpm)
+            self.wpms_added += 1
             self.update()
 
-        self.prev_seconds = seconds
         self.prev_cursor_pos = v.cursor_pos
+        # Cleared if the line was finished
+        self.prev_text = self._console.text()
 
     def paintEvent(self, e):
         # type: (StatsDock, QPaintEvent) -> None
         w = self.size().width()
-        h = self.size().height()
-        factor = 1 if not self.wpm_pb else h/self.wpm_pb
 
         qp = QPainter()
         qp.begin(self)
-        draw = qp.drawPixmap
+        qp.drawPixmap(0, 0, self._updateGraph())
+
+        # Text
+        font, fm, font_h = self._textFont()
+        qp.setFont(font)
+        qp.setPen(self.text_c.fg())
+        pb_txt = "PB: {}  Session: {}".format(self.wpm_pb, self.wpm_session)
+        cur_txt = "Current: {} WPM".format(self.wpm)
+        qp.drawText(QRectF(2, 2, ceil(fm.horizontalAdvance(pb_txt)), font_h),
+                    center, pb_txt)
+        cur_w = ceil(fm.horizontalAdvance(cur_txt))
+        qp.drawText(QRectF(w - cur_w - 2, 2, cur_w, font_h), center, cur_txt)
+
+        qp.end()
+
+    def _textFont(self):
+        # type: (StatsDock) -> tuple[QFont, QFontMetricsF, int]
+        dpr = self.devicePixelRatioF()
+        if self._font is None or self._font_dpr != dpr:
+            font = Font.GENERAL.toQFont()
+            fm = QFontMetricsF(font, self)
+            self._font = (font, fm, ceil(fm.height()))
+            self._font_dpr = dpr
+        return self._font
+
+    def _updateGraph(self):
+        # type: (StatsDock) -> QPixmap
+        """The graph with the bars added since it was last drawn, drawn again
+ entirely if the size, device pixel ratio or personal best (which the bars
+ are scaled to) have changed or the theme has"""
+        w, h = self.size().width(), self.size().height()
+        dpr = self.devicePixelRatioF()
+        key = (w, h, dpr, self.wpm_pb)
+        first = self.wpms_added - len(self.wpms)
+        if self._graph is None or self._graph_key != key:
+            self._graph = QPixmap(max(round(w * dpr), 1),
+                                  max(round(h * dpr), 1))
+            self._graph.setDevicePixelRatio(dpr)
+            self._graph_key = key
+            self._drawGraph(0, w)
+        elif self._graph_end != self.wpms_added:
+            # Bars dropped from the start; move the rest along
+            dropped = first - self._graph_start
+            dx = dropped * self.rect_w * dpr
+            if dropped and dx != int(dx):
+                self._drawGraph(0, w)
+            else:
+                if dropped:
+                    self._graph.scroll(-int(dx), 0, self._graph.rect())
+                # From the last bar already drawn, which may have been cut off
+                #  at the edge or by the bar after it
+                self._drawGraph((self._graph_end - first - 1) * self.rect_w, w)
+        self._graph_start, self._graph_end = first, self.wpms_added
+        return self._graph
+
+    def _drawGraph(self, x1, x2):
+        # type: (StatsDock, int, int) -> None
+        """Draw the part of the graph from `x1' to `x2'"""
+        assert self._graph is not None
+        h = self.size().height()
+        factor = 1 if not self.wpm_pb else h/self.wpm_pb
+        x1 = max(x1, 0)
+
+        qp = QPainter(self._graph)
+        qp.setClipRect(QRect(x1, 0, x2 - x1, h))
 
         # Background
-        qp.fillRect(0, 0, w, h, self.main_c.bg())
+        qp.fillRect(x1, 0, x2 - x1, h, self.main_c.bg())
 
         # WPM rects
-        i = 0
-        for wpm in self.wpms:
-            rect_h = floor(wpm * factor)
-            draw(i, h - rect_h,
-                 rectPixmap(self.rect_w, int(wpm * factor),
-                            self.main_c.bg(), self.main_c.fg()))
-            i += self.rect_w
+        qp.setPen(self.main_c.bg())
+        qp.setBrush(self.main_c.fg())
+        for n in range(max(x1 // self.rect_w - 1, 0), len(self.wpms)):
+            i = n * self.rect_w
+            if i > x2:
+                break
+            rect_h = floor(self.wpms[n] * factor)
+            qp.drawRect(i, h - rect_h, self.rect_w, int(self.wpms[n] * factor))
 
         # Gridlines
+        # The dashes are offset by the bars dropped so that they move along
+        #  with the rest of the graph
+        pen = QPen(self.grid_c.fg(), 1, Qt.PenStyle.DashLine)
+        pen.setDashOffset((self.wpms_added - len(self.wpms)) * self.rect_w)
+        qp.setPen(pen)
         i = 50
         while i < self.wpm_pb:
             y = h - int(i * factor)
-            qp.drawPixmap(0, y,
-                          linePixmap(w, 0, self.grid_c.fg(), 1,
-                                     style=Qt.PenStyle.DashLine))
+            qp.drawLine(0, y, x2, y)
             i += 50
 
-        # Text
-        font = Font.GENERAL.toQFont()
-        fm = QFontMetricsF(font)
-        font_h = ceil(fm.height())
-        pb_txt = "PB: {}".format(self.wpm_pb)
-        cur_txt = "Current: {} WPM".format(self.wpm)
-        draw(2, 2,
-             textPixmap(pb_txt, ceil(fm.horizontalAdvance(pb_txt)), font_h,
-                        font, self.text_c.fg()))
-        cur_w = ceil(fm.horizontalAdvance(cur_txt))
-        draw(w - cur_w - 2, 2,
-             textPixmap(cur_txt, cur_w, font_h, font, self.text_c.fg()))
-
         qp.end()
 
     def sizeHint(self):
@@ -153,6 +215,7 @@ class StatsDock(QWidget):
 
 
 if TYPE_CHECKING:
+    from typing import Sequence  # noqa: F401
     from retype.ui import BookView  # noqa: F401
     from retype.console import Console  # noqa: F401
-    from qt import QPaintEvent  # noqa: F401
+    from qt import QPaintEvent, QFont  # noqa: F401
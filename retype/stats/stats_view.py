@@ -0,0 +1,215 @@
+import logging
+from html import escape
+from datetime import datetime
+from qt import QWidget, QVBoxLayout, QTextBrowser, QPainter, QPen, Qt, QPointF
+
+from typing import TYPE_CHECKING
+
+from retype.services.theme import Theme
+
+logger = logging.getLogger(__name__)
+
+# Seconds of typing the speed graphed is measured over
+GRAPH_WINDOW = 30.0
+
+
+class StatsView(QWidget):
+    """Typing statistics over the keys recorded in the keystroke logs in
+ `directory' (see `KeystrokeStats'), worked out again each time the view is
+ shown"""
+    def __init__(self,  # type: StatsView
+                 main_win,  # type: MainWin
+                 main_controller,  # type: MainController
+                 directory,  # type: str
+                 parent=None  # type: QWidget | None
+                 ):
+        # type: (...) -> None
+        super().__init__(parent)
+        self._controller = main_controller
+        self.directory = directory
+        self.stats = None  # type: KeystrokeStats | None
+        self._initUI()
+
+    def _initUI(self):
+        # type: (StatsView) -> None
+        self.graph = WpmGraph(self)
+        self.report = QTextBrowser(self)
+        self.report.setOpenLinks(False)
+
+        self.layout_ = QVBoxLayout(self)
+        self.layout_.setContentsMargins(0, 0, 0, 0)
+        self.layout_.setSpacing(0)
+        self.layout_.addWidget(self.graph)
+        self.layout_.addWidget(self.report)
+
+    def showEvent(self, e):
+        # type: (StatsView, QShowEvent) -> None
+        super().showEvent(e)
+        self.refresh()
+
+    def analyse(self):
+        # type: (StatsView) -> KeystrokeStats | None
+        # numpy (which analytics needs) takes a while to import, so it is
+        #  only imported once statistics are asked for
+        from retype.stats.analytics import analyse
+        keystroke_log = self._controller.keystroke_log
+        if keystroke_log is not None:
+            keystroke_log.flush()
+        self.stats = analyse(self.directory)
+        return self.stats
+
+    def summary(self):
+        # type: (StatsView) -> str
+        stats = self.analyse()
+        if stats is None:
+            return 'Typing statistics need numpy, which is not installed'
+        return stats.summary()
+
+    def refresh(self):
+        # type: (StatsView) -> None
+        stats = self.analyse()
+        if stats is None:
+            self.graph.setWpms([])
+            self.report.setHtml(
+                '<p>Typing statistics need numpy, which is not installed.</p>')
+            return
+        if not len(stats):
+            self.graph.setWpms([])
+            self.report.setHtml(
+                '<p>No keys recorded yet. Keys typed in books are recorded '
+                f'in {escape(self.directory)}.</p>')
+            return
+        _, wpms = stats.rollingWpm(GRAPH_WINDOW, max(self.graph.width(), 2))
+        self.graph.setWpms(wpms.tolist())
+        self.report.setHtml(self._report(stats))
+
+    def _titles(self):
+        # type: (StatsView) -> dict[str, str]
+        """Titles of the books in the library by the start of their checksum
+ (see `bookKey')"""
+        books = self._controller.library.books or {}
+        return {book.checksum[:16]: book.title for book in books.values()}
+
+    def _report(self, stats, top=10):
+        # type: (StatsView, KeystrokeStats, int) -> str
+        from retype.stats.analytics import bookKey, showChars
+        total = stats.total()
+        latencies = stats.latencyPercentiles()
+        html = [
+            '<h3>Overall</h3>',
+            f'<p>{len(stats)} keys in {stats.sessions} sessions over '
+            f'{len(stats.days)} days, {minutes(total["time"][0])}: '
+            f'{total["wpm"][0]:.1f} WPM, {total["accuracy"][0]:.1%} '
+            'accuracy.<br/>Time between keys: '
+            f'{latencies[0]:.0f} ms (median), {latencies[1]:.0f} ms (90th '
+            f'percentile), {latencies[2]:.0f} ms (99th percentile). Graphed: '
+            f'WPM over {GRAPH_WINDOW:.0f}s of typing.</p>']
+
+        sessions = stats.bySession()
+        html += ['<h3>Recent sessions</h3>', table(
+            ('Started', 'Time', 'Keys', 'WPM', 'Accuracy'),
+            [(datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M'),
+              minutes(time), keys, f'{wpm:.1f}', f'{accuracy:.1%}')
+             for start, time, keys, wpm, accuracy in list(zip(
+                 sessions['start'], sessions['time'], sessions['keys'],
+                 sessions['wpm'], sessions['accuracy']))[:-top - 1:-1]])]
+
+        days = stats.byDay()
+        html += ['<h3>Days</h3>', table(
+            ('Day', 'Time', 'Keys', 'WPM', 'Accuracy'),
+            [(stats.days[day].isoformat(), minutes(time), keys, f'{wpm:.1f}',
+              f'{accuracy:.1%}')
+             for day, time, keys, wpm, accuracy in list(zip(
+                 days['key'], days['time'], days['keys'], days['wpm'],
+                 days['accuracy']))[:-top - 1:-1]])]
+
+        books = stats.byBook()
+        titles = self._titles()
+        html += ['<h3>Books</h3>', table(
+            ('Book', 'Time', 'Keys', 'WPM', 'Accuracy'),
+            [(escape(titles.get(bookKey(book), bookKey(book))), minutes(time),
+              keys, f'{wpm:.1f}', f'{accuracy:.1%}')
+             for book, time, keys, wpm, accuracy in sorted(zip(
+                 books['key'], books['time'], books['keys'], books['wpm'],
+                 books['accuracy']), key=lambda row: -row[1])])]
+
+        for title, errors in (('Most mistyped characters',
+                               stats.charErrors()),
+                              ('Most mistyped pairs of characters',
+                               stats.bigramErrors())):
+            html += [f'<h3>{title}</h3>', table(
+                ('Typed', 'Times', 'Mistyped'),
+                [(escape(showChars(key)), count, f'{rate:.1%}')
+                 for key, count, rate in list(zip(
+                     errors['key'], errors['count'], errors['rate']))[:top]])]
+        return '\n'.join(html)
+
+
+def minutes(seconds):
+    # type: (float) -> str
+    return f'{seconds / 60:.0f} min'
+
+
+def table(headers, rows):
+    # type: (Sequence[str], Sequence[Sequence[object]]) -> str
+    if not rows:
+        return '<p>None yet</p>'
+    return ('<table cellspacing="0" cellpadding="3"><tr>'
+            + ''.join(f'<th align="left">{header}</th>' for header in headers)
+            + '</tr>'
+            + ''.join('<tr>' + ''.join(f'<td>{cell}</td>' for cell in row)
+                      + '</tr>' for row in rows)
+            + '</table>')
+
+
+class WpmGraph(QWidget):
+    """Line graph of typing speeds, in the colours of the stats dock"""
+    def __init__(self, parent=None):
+        # type: (WpmGraph, QWidget | None) -> None
+        super().__init__(parent)
+        self.wpms = []  # type: list[float]
+        self.setMinimumHeight(100)
+        self.main_c = Theme.get('BookView.StatsDock.Main')
+        self.grid_c = Theme.get('BookView.StatsDock.Grid')
+        self.text_c = Theme.get('BookView.StatsDock.Text')
+        for c in (self.main_c, self.grid_c, self.text_c):
+            c.changed.connect(self.update)
+
+    def setWpms(self, wpms):
+        # type: (WpmGraph, list[float]) -> None
+        self.wpms = wpms
+        self.update()
+
+    def paintEvent(self, e):
+        # type: (WpmGraph, QPaintEvent) -> None
+        w, h = self.width(), self.height()
+        qp = QPainter(self)
+        qp.fillRect(0, 0, w, h, self.main_c.bg())
+        top = max(self.wpms, default=0)
+        if top <= 0:
+            qp.end()
+            return
+        factor = (h - 2) / top
+
+        # Gridlines
+        qp.setPen(QPen(self.grid_c.fg(), 1, Qt.PenStyle.DashLine))
+        i = 50
+        while i < top:
+            y = h - 1 - int(i * factor)
+            qp.drawLine(0, y, w, y)
+            i += 50
+
+        qp.setRenderHint(QPainter.RenderHint.Antialiasing)
+        qp.setPen(QPen(self.text_c.fg(), 1.5))
+        step = w / max(len(self.wpms) - 1, 1)
+        qp.drawPolyline(*[QPointF(n * step, h - 1 - wpm * factor)
+                          for n, wpm in enumerate(self.wpms)])
+        qp.end()
+
+
+if TYPE_CHECKING:
+    from typing import Sequence  # noqa: F401
+    from qt import QShowEvent, QPaintEvent  # noqa: F401
+    from retype.ui import MainWin  # noqa: F401
+    from retype.controllers import MainController  # noqa: F401
+    from retype.stats.analytics import KeystrokeStats  # noqa: F401
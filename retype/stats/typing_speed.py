@@ -0,0 +1,134 @@
+from array import array
+from time import monotonic
+
+from typing import TYPE_CHECKING
+
+
+class TypingSpeed:
+    """Typing speed over sliding windows of the last `windows' seconds and over
+ the session, from events of a number of characters typed at a time (one for
+ a key press, several for a steno stroke).
+Events are kept as (offset in seconds from the first event, characters) in a
+ ring buffer of `capacity' events held in fixed-size arrays. Each window keeps
+ the oldest event in it and a running total of its characters, moved on as
+ events fall out of it, so adding an event and getting a speed cost the same
+ however many events are kept. The oldest events are dropped from the windows
+ still counting them once the buffer is full, so `capacity' should be more
+ than can be typed in the longest window.
+A gap of more than `idle' seconds between events starts a new burst of typing:
+ the windows are emptied, and the gap is not counted as session time. Speeds
+ are measured over the time since the start of the burst while it is shorter
+ than the window (but at least `min_span' seconds), so the first few seconds
+ of typing are not averaged with time that was not spent typing."""
+    def __init__(self,  # type: TypingSpeed
+                 windows=(5, 30),  # type: Sequence[float]
+                 capacity=4096,  # type: int
+                 idle=5.0,  # type: float
+                 min_span=1.0,  # type: float
+                 clock=monotonic  # type: Callable[[], float]
+                 ):
+        # type: (...) -> None
+        self.windows = tuple(windows)
+        self.capacity = capacity
+        self.idle = idle
+        self.min_span = min_span
+        self._clock = clock
+
+        self.times = array('d', [0.0]) * capacity
+        self.chars = array('l', [0]) * capacity
+        # Number of events ever added; event n is at index n % capacity
+        self.count = 0
+        # Clock time of the first event
+        self._origin = None  # type: float | None
+        # Offsets of the latest event and of the start of the current burst
+        self._last = 0.0
+        self._burst_start = 0.0
+        # For each window, the number of its oldest event and its characters
+        self._tails = [0] * len(self.windows)
+        self._sums = [0] * len(self.windows)
+
+        self.session_chars = 0
+        self.session_time = 0.0
+
+    def _now(self, now=None):
+        # type: (TypingSpeed, float | None) -> float
+        """Offset of clock time `now' (the current time if None)"""
+        if now is None:
+            now = self._clock()
+        if self._origin is None:
+            self._origin = now
+        return now - self._origin
+
+    def add(self, chars, now=None):
+        # type: (TypingSpeed, int, float | None) -> None
+        """Record `chars' characters typed at clock time `now'"""
+        t = self._now(now)
+        if not self.count or t - self._last > self.idle:
+            self._burst_start = t
+            self._tails = [self.count] * len(self.windows)
+            self._sums = [0] * len(self.windows)
+        else:
+            self.session_time += t - self._last
+
+        i = self.count % self.capacity
+        if self.count >= self.capacity:
+            dropped = self.count - self.capacity
+            for w, tail in enumerate(self._tails):
+                if tail == dropped:
+                    self._sums[w] -= self.chars[i]
+                    self._tails[w] += 1
+        self.times[i] = t
+        self.chars[i] = chars
+        self.count += 1
+        self._last = t
+
+        for w in range(len(self.windows)):
+            self._sums[w] += chars
+        self.session_chars += chars
+        self._expire(t)
+
+    def _expire(self, t):
+        # type: (TypingSpeed, float) -> None
+        for w, window in enumerate(self.windows):
+            tail = self._tails[w]
+            while tail < self.count and \
+                    self.times[tail % self.capacity] <= t - window:
+                self._sums[w] -= self.chars[tail % self.capacity]
+                tail += 1
+            self._tails[w] = tail
+
+    def cpm(self, window=None, now=None):
+        # type: (TypingSpeed, float | None, float | None) -> float
+        """Characters per minute over the last `window' seconds (one of
+ `windows'), or over the session if None"""
+        if not self.count:
+            return 0
+        if window is None:
+            span = self.session_time
+            chars = self.session_chars
+        else:
+            t = self._now(now)
+            if t - self._last > self.idle:
+                return 0
+            self._expire(t)
+            span = min(window, t - self._burst_start)
+            chars = self._sums[self.windows.index(window)]
+        return chars / max(span, self.min_span) * 60
+
+    def wpm(self, window=None, now=None):
+        # type: (TypingSpeed, float | None, float | None) -> float
+        """Words (of five characters) per minute; see `cpm'"""
+        return self.cpm(window, now) / 5
+
+    def covers(self, window, now=None):
+        # type: (TypingSpeed, float, float | None) -> bool
+        """Whether the current burst of typing has lasted the whole of
+ `window' seconds, so that its speed over it is not from a shorter time"""
+        if not self.count:
+            return False
+        t = self._now(now)
+        return t - self._last <= self.idle and t - self._burst_start >= window
+
+
+if TYPE_CHECKING:
+    from typing import Callable, Sequence  # noqa: F401
@@ -2,13 +2,18 @@ import logging
 from qt import (QWidget, QVBoxLayout, QTextBrowser, QTextDocument, QUrl,
                 QTextCursor, QTextCharFormat, QPainter, QPixmap,
                 QToolBar, QFont, QKeySequence, Qt, QApplication, pyqtSignal,
-                QSplitter, QSize, QGuiApplication)
+                QSplitter, QSize, QGuiApplication, QFontMetrics, QRect)
 
 from typing import TYPE_CHECKING
 
-from retype.extras import splittext, isspaceorempty, ManifoldStr
+from retype.extras import isspaceorempty, Equivalences, Splitter
+from retype.extras.line_table import LineTable
+from retype.extras.space import lineinfo
 from retype.ui.modeline import Modeline
 from retype.services import Autosave
+from retype.services.autosave import IdleSignal
+from retype.services.document_cache import DocumentCache
+from retype.services.latency import tracer
 from retype.stats import StatsDock
 from retype.services.theme import theme, C, Theme
 from retype.services.keymap import keymap, K, Keymap, genActions, keymapUpdate
@@ -41,17 +46,31 @@ class BookDisplay(QTextBrowser):
         self._font_family = font_family
         self.updateFont()
 
-        self.c_display, self.c_cursor = self._loadTheme()
+        self.c_display, self.c_cursor, self.c_mistake = self._loadTheme()
         self.c_highlight = c_highlight
         self.c_display.changed.connect(self.themeUpdate)
         self.themeUpdate()
 
         self.full_highlight = False
+        # The cursor rect, and what it was worked out for, so that it is only
+        #  asked of the layout again when the cursor, document or scrolling
+        #  have changed
+        self._cursor_rect = QRect()
+        self._cursor_rect_key = None  # type: tuple[object, ...] | None
+        # The cursor rect when last painted; between it and the current one
+        #  is what needs to be painted again when the cursor moves
+        self._painted_rect = None  # type: QRect | None
+        # Wrong text drawn over the document, and the position in the
+        #  document it is drawn at
+        self.mistake_text = ''
+        self.mistake_pos = 0
+        self._mistake_document = None  # type: QTextDocument | None
 
     def _loadTheme(self):
         # type: (BookDisplay) -> tuple[C, ...]
         return (Theme.get('BookView.BookDisplay'),
-                Theme.get('BookView.BookDisplay.Cursor'))
+                Theme.get('BookView.BookDisplay.Cursor'),
+                Theme.get('BookView.Highlighting.Mistake'))
 
     def themeUpdate(self):
         # type: (BookDisplay) -> None
@@ -63,6 +82,46 @@ class BookDisplay(QTextBrowser):
         # type: (BookDisplay, QTextCursor) -> None
         self._cursor = cursor
 
+    def setMistake(self, pos, text):
+        # type: (BookDisplay, int, str) -> None
+        """Draw `text' as wrong text at position `pos' of the document, over
+ the text that is there; an empty `text' stops drawing it"""
+        if (pos, text) == (self.mistake_pos, self.mistake_text):
+            return
+        old_rect = self._mistakeRect()
+        self.mistake_pos, self.mistake_text = pos, text
+        self._mistake_document = self.document()
+        self.viewport().update(old_rect.united(self._mistakeRect()))
+
+    def cursorRectCached(self):
+        # type: (BookDisplay) -> QRect
+        """`cursorRect' of the cursor, kept until the cursor, document,
+ layout or scrolling change"""
+        document = self.document()
+        key = (self._cursor.position(), self._cursor.document(), document,
+               document.revision(), document.size(), self._font_size,
+               self._font_family, self.horizontalScrollBar().value(),
+               self.verticalScrollBar().value())
+        if key != self._cursor_rect_key:
+            self._cursor_rect = self.cursorRect(self._cursor)
+            self._cursor_rect_key = key
+        return QRect(self._cursor_rect)
+
+    def updateHighlight(self, full=False):
+        # type: (BookDisplay, bool) -> None
+        """Repaint the cursor and highlight, only where they have changed
+ since they were last painted when possible"""
+        if full != self.full_highlight or self._painted_rect is None:
+            self.full_highlight = full
+            self.viewport().update()
+            return
+        # The lines from where the cursor was to where it is now
+        old, new = self._painted_rect, self.cursorRectCached()
+        top = min(old.top(), new.top()) - 1
+        bottom = max(old.bottom(), new.bottom()) + 1
+        self.viewport().update(
+            QRect(0, top, self.viewport().width(), bottom - top + 1))
+
     def updateFont(self):
         # type: (BookDisplay) -> None
         self._font.setPixelSize(self.font_size)
@@ -99,7 +158,8 @@ class BookDisplay(QTextBrowser):
 
         # Draw cursor
         qp.setPen(self.c_cursor.fg())
-        crect = self.cursorRect(self._cursor)
+        crect = self.cursorRectCached()
+        self._painted_rect = QRect(crect)
         qp.drawRect(crect)
 
         # Draw highlight
@@ -115,7 +175,61 @@ class BookDisplay(QTextBrowser):
             qp.drawRect(crect)
         qp.drawRect(vrect)
 
+        # Not drawn over other chapters being viewed
+        if self.mistake_text and self.document() is self._mistake_document:
+            self._drawMistake(qp)
+
         qp.end()
+        tracer.mark('paint')
+
+    def _mistakeLines(self):
+        # type: (BookDisplay) -> tuple[QFont, int, list[MistakeLine]]
+        """Font, line height and lines (x, y, width, text) the wrong text is
+ drawn as"""
+        cursor = QTextCursor(self.document())
+        cursor.setPosition(min(self.mistake_pos,
+                               self.document().characterCount() - 1))
+        font = cursor.charFormat().font()
+        metrics = QFontMetrics(font)
+        rect = self.cursorRect(cursor)
+        x, y, height = rect.x(), rect.y(), rect.height()
+        margin = int(self.document().documentMargin())
+        right = self.viewport().width() - margin
+
+        # Wrapped at the edge of the display as the text it is drawn over is
+        line, width = '', 0
+        lines = []  # type: list[MistakeLine]
+        for char in self.mistake_text:
+            advance = metrics.horizontalAdvance(char)
+            if line and x + width + advance > right:
+                lines.append((x, y, width, line))
+                x, y, line, width = margin, y + height, '', 0
+            line += char
+            width += advance
+        lines.append((x, y, width, line))
+        return (font, height, lines)
+
+    def _mistakeRect(self):
+        # type: (BookDisplay) -> QRect
+        rect = QRect()
+        if not self.mistake_text or \
+           self.document() is not self._mistake_document:
+            return rect
+        _, height, lines = self._mistakeLines()
+        for x, y, width, _ in lines:
+            rect = rect.united(QRect(x, y, width, height))
+        return rect.adjusted(-1, -1, 1, 1)
+
+    def _drawMistake(self, qp):
+        # type: (BookDisplay, QPainter) -> None
+        font, height, lines = self._mistakeLines()
+        qp.setFont(font)
+        for x, y, width, line in lines:
+            qp.fillRect(QRect(x, y, width, height), self.c_mistake.bg())
+            qp.setPen(self.c_mistake.fg())
+            qp.drawText(QRect(x, y, width, height),
+                        Qt.AlignmentFlag.AlignLeft |
+                        Qt.AlignmentFlag.AlignVCenter, line)
 
     def keyPressEvent(self, e):
         # type: (BookDisplay, QKeyEvent) -> None
@@ -125,8 +239,9 @@ class BookDisplay(QTextBrowser):
     def centreAroundCursor(self):
         # type: (BookDisplay) -> None
         viewport_height = self.viewport().rect().height()
-        cursor_height = self.cursorRect(self._cursor).height()
-        cursor_relative_y = self.cursorRect(self._cursor).y()
+        rect = self.cursorRectCached()
+        cursor_height = rect.height()
+        cursor_relative_y = rect.y()
         scrollbar = self.verticalScrollBar()
         scrollbar.setValue(int(
             scrollbar.value() + cursor_relative_y -
@@ -184,10 +299,31 @@ class BookView(QWidget):
         self._library = self._controller.library
         self._console = self._controller.console
         self.autosave = None  # type: Autosave | None
+        self.prefetch = None  # type: IdleSignal | None
+        # Position, text, sdict, lines and line info of the prefetched chapter
+        self._prefetched = None  # type: Prefetched | None
 
         self.c_highlight, self.c_mistake = self._loadTheme()
 
         bookview_settings = bookview_settings or {}
+        self.document_cache = DocumentCache(
+            bookview_settings.get('document_cache_size', 64) * 2**20)
+        # Font the cached documents were built for
+        self._document_font = None  # type: tuple[str, int] | None
+        # Size in characters of the window of long chapters displayed, and
+        #  where the window is in the chapter (window_end is None when the
+        #  whole chapter is displayed)
+        self.window_size = bookview_settings.get('window_size', 50000)
+        self.window_start = 0
+        self.window_end = None  # type: int | None
+        # The chapter displayed in a window, and its full document
+        self._window_source = None  # type: WindowSource | None
+        # Whether wrong text is drawn over the display rather than inserted
+        #  into its document
+        self.overlay_mistakes = bookview_settings.get(
+            'overlay_mistakes', False)
+        # Seconds typing speed is measured over (see `StatsDock')
+        self.wpm_windows = bookview_settings.get('wpm_windows', [5, 30])
         self.display = BookDisplay(
             self.c_highlight,
             bookview_settings.get('font', default_font_family),
@@ -196,7 +332,9 @@ class BookView(QWidget):
         self._initUI()
 
         self.sdict = sdict or {}
+        self.text_splitter = Splitter(self.sdict)
         self.rdict = rdict or {}
+        self.equivalences = Equivalences(self.rdict)
 
         self.book = None  # type: Book | None
         self._cursor = QTextCursor(self.display.document())
@@ -209,12 +347,19 @@ class BookView(QWidget):
         self.persistent_pos = None  # type: int | None
         self.progress = None  # type: float | None
         self.chapter_lens = None  # type: list[int] | None
+        # Offsets of the chapters in the book
+        self.chapter_table = LineTable([])
         self.total_len = None  # type: int | None
         self.tobetyped_list = []  # type: list[str]
+        # For each line of `tobetyped_list', whether it is skipped, the length
+        #  it can be typed to and whether it ends in a newline (see `lineinfo')
+        self.line_info = []  # type: list[LineInfo]
+        self._line_table = None  # type: tuple[list[str], LineTable] | None
 
         self.mistake_format = QTextCharFormat()  # type: QTextCharFormat
 
         self.c_mistake.changed.connect(self.themeUpdate)
+        self.display.c_display.changed.connect(self.document_cache.clear)
         self.themeUpdate()
 
         Keymap.notifier.changed.connect(
@@ -250,7 +395,7 @@ class BookView(QWidget):
 
         self._main_win.denoteSplitter('bookview', self.splitter)
 
-        self.stats_dock = StatsDock(self)
+        self.stats_dock = StatsDock(self, self.wpm_windows)
         self.splitter.addWidget(self.stats_dock)
         self._main_win.maybeRestoreSplitterState('bookview')
 
@@ -379,6 +524,7 @@ class BookView(QWidget):
             chap_total=len(self.book.chapters) - 1,
             progress=int(self.progress) if self.progress is not None else 0,
         )
+        tracer.mark('modeline')
 
     def _initChapter(self, reset=True):
         # type: (BookView, bool) -> None
@@ -414,8 +560,53 @@ class BookView(QWidget):
 
     def _prepTobetypedList(self):
         # type: (BookView) -> None
-        self.tobetyped_list = splittext(self.tobetyped, self.sdict,
-                                        True, True, '\r')
+        prefetched = self._prefetched
+        if prefetched is not None and prefetched[0] == self.chapter_pos and \
+           prefetched[1] == self.tobetyped and prefetched[2] is self.sdict:
+            self.tobetyped_list, self.line_info = prefetched[3:]
+        else:
+            self.tobetyped_list, self.line_info = self._prepLines(
+                self.tobetyped)
+
+    def _splitText(self, text):
+        # type: (BookView, str) -> list[str]
+        return self.text_splitter.split(text, True, True, '\r')
+
+    def _prepLines(self, text):
+        # type: (BookView, str) -> tuple[list[str], list[LineInfo]]
+        """Lines `text' is typed in and their line info"""
+        lines = self._splitText(text)
+        return (lines, self._lineInfo(lines))
+
+    def _lineInfo(self, lines):
+        # type: (BookView, list[str]) -> list[LineInfo]
+        """Line info of `lines' as typed with the rdict, so that for instance
+ a line of only images is skipped where the rdict lets them be typed as
+ spaces"""
+        line = self.equivalences.line
+        return [lineinfo(line(s)) for s in lines]
+
+    def prefetchNextChapter(self):
+        # type: (BookView) -> None
+        """Prepare the chapter after the one being typed (build its document
+ and split its text) while the user is idle, so that getting to it does not
+ stall typing. Chapters are parsed by the book loader; one it has not got to
+ yet is left for a later idle rather than parsed here, which would also wait
+ on the loader holding the book"""
+        if self.book is None or self.chapter_pos is None:
+            return
+        pos = self.chapter_pos + 1
+        chapters = self.book.chapters
+        if pos >= len(chapters) or \
+           self._prefetched is not None and self._prefetched[0] == pos:
+            return
+        isParsed = getattr(chapters, 'isParsed', None)
+        if isParsed is not None and not isParsed(pos):
+            return
+        chapter = chapters[pos]
+        self._document(chapter, pos)
+        self._prefetched = (pos, chapter['plain'], self.sdict,
+                            *self._prepLines(chapter['plain']))
 
     def setCursor(self):  # type: ignore[override]
         # type: (BookView) -> None
@@ -430,33 +621,134 @@ class BookView(QWidget):
         if self.cursor_pos is None:
             return
         self.mistake_cursor = QTextCursor(self.display.document())
-        self.mistake_cursor.setPosition(self.cursor_pos)
+        self.mistake_cursor.setPosition(self.documentPosition(self.cursor_pos))
 
     def updateCursorPosition(self, to_pos=None):
         # type: (BookView, int | None) -> None
         if self.cursor_pos is None:
             return
         pos = to_pos or self.cursor_pos
-        self._cursor.setPosition(pos)
+        self._cursor.setPosition(self.documentPosition(pos))
         self.highlight(full=False)
 
+    def showMistake(self, pos, text):
+        # type: (BookView, int, str) -> None
+        """Draw `text' over the display as wrong text typed at position `pos'
+ of the chapter; an empty `text' clears it"""
+        self.display.setMistake(self.documentPosition(pos), text)
+
+    def documentPosition(self, pos):
+        # type: (BookView, int) -> int
+        """Position in the displayed document of position `pos' in the
+ chapter, which differ when only a window of the chapter is displayed"""
+        last = self.display.document().characterCount() - 1
+        return min(max(pos - self.window_start, 0), max(last, 0))
+
     def highlight(self, full=False):
         # type: (BookView, bool) -> None
-        self.display.full_highlight = full
-        self.display.update()
+        self.display.updateHighlight(full)
+
+    def setSource(self, chapter, pos=None):
+        # type: (BookView, Chapter, int | None) -> None
+        """Display `chapter', which is at `pos' in the book. Documents of
+ chapters of books with a checksum are cached for the current font.
+Chapters over twice `window_size' characters long only get a window of the
+ chapter around the cursor displayed, so that the display does not have to lay
+ out all of it. The window slides along as lines are typed."""
+        document = self._document(chapter, pos)
+        if self.window_size and len(chapter['plain']) > 2 * self.window_size:
+            self._window_source = (chapter, document)
+            anchor = self.persistent_pos or 0 if pos == self.chapter_pos \
+                else 0
+            self._setWindow(anchor)
+        else:
+            self._window_source = None
+            self.window_start, self.window_end = 0, None
+            self.display.setDocument(document)
+
+    def _setWindow(self, anchor):
+        # type: (BookView, int) -> None
+        """Display the window of the chapter starting a little before
+ `anchor'"""
+        assert self._window_source is not None
+        chapter, source = self._window_source
+        start = source.findBlock(
+            max(anchor - self.window_size // 4, 0)).position()
+        last = source.findBlock(
+            min(start + self.window_size, source.characterCount() - 1))
+        end = last.position() + last.length() - 1
+        cursor = QTextCursor(source)
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
 
-    def setSource(self, chapter):
-        # type: (BookView, Chapter) -> None
+        document = QTextDocument()
+        QTextCursor(document).insertFragment(cursor.selection())
+        # Positions in the window have to map directly to the chapter, which
+        #  is not the case if the window cuts through a table, say
+        if document.characterCount() - 1 != end - start:
+            logger.debug('Unable to display a window of the chapter, '
+                         'displaying all of it')
+            self._window_source = None
+            self.window_start, self.window_end = 0, None
+            self.display.setDocument(source)
+            return
+        for image in chapter['images']:
+            url = QUrl(image['link'])
+            document.addResource(
+                QTextDocument.ImageResource, url,
+                source.resource(QTextDocument.ImageResource, url))
+        self.window_start, self.window_end = start, end
+        self.display.setDocument(document)
+
+    def _maybeSlideWindow(self):
+        # type: (BookView) -> None
+        """Move the window along when the cursor nears its end (or is out of
+ it)"""
+        if self._window_source is None or self.window_end is None or \
+           self.persistent_pos is None or \
+           self.viewed_chapter_pos != self.chapter_pos:
+            return
+        at_end = self.window_end >= len(self._window_source[0]['plain'])
+        if self.window_start <= self.persistent_pos and (
+                at_end or
+                self.persistent_pos < self.window_end - self.window_size // 4):
+            return
+        self._setWindow(self.persistent_pos)
+        self.setCursor()
+
+    def _document(self, chapter, pos=None):
+        # type: (BookView, Chapter, int | None) -> QTextDocument
+        font = (self.display.font_family, self.display.font_size)
+        if font != self._document_font:
+            self.document_cache.clear()
+            self._document_font = font
+        checksum = getattr(self.book, 'checksum', None)
+        key = (checksum, pos) + font if checksum and pos is not None \
+            else None
+
+        document = self.document_cache.get(key) if key else None
+        if document is None:
+            document, size = self._buildDocument(chapter)
+            if key:
+                self.document_cache.put(key, document, size)
+        return document
+
+    def _buildDocument(self, chapter):
+        # type: (BookView, Chapter) -> tuple[QTextDocument, int]
+        """The document of `chapter', and a rough estimate of its size in
+ memory"""
         document = QTextDocument()
         document.setHtml(chapter['html'])
+        size = len(chapter['html']) * 4
 
         for image in chapter['images']:
             pixmap = QPixmap()
             pixmap.loadFromData(image['raw'])
             document.addResource(QTextDocument.ImageResource,
                                  QUrl(image['link']), pixmap)
+            size += pixmap.width() * pixmap.height() * pixmap.depth() // 8
 
-        self.display.setDocument(document)
+        return document, size
 
     def anchorClicked(self, link):
         # type: (BookView, QUrl) -> None
@@ -483,8 +775,7 @@ class BookView(QWidget):
             self.chapter_pos = 0
             reset = True
 
-        self.chapter_lens = [chapter['len'] for chapter in self.book.chapters]
-        self.total_len = sum(self.chapter_lens)
+        self.updateChapterLens()
 
         if not self.stats_dock.connected:
             self.stats_dock.connectConsole(self._controller.console)
@@ -493,6 +784,11 @@ class BookView(QWidget):
             self.autosave = Autosave(self._console)
             self.autosave.save.connect(self.maybeSave)
 
+        if self.prefetch is None:
+            self.prefetch = IdleSignal(self._console, 1000)
+            self.prefetch.idle.connect(self.prefetchNextChapter)
+        self._prefetched = None
+
         complete = book.progress == 100
 
         if self.chapter_pos is None:
@@ -503,6 +799,30 @@ class BookView(QWidget):
         if complete:
             self.markComplete()
 
+    def showLoading(self, book):
+        # type: (BookView, Book) -> None
+        """Placeholder shown while `book' is being opened, during which
+ typing does nothing"""
+        self.book = None
+        self.persistent_pos = None
+        self.chapter_lens = self.total_len = None
+        self._setPlaceholder(f'Loading {book.title}…')
+        self.modeline.update_(title=book.title, path=book.path)
+        self.updateToolbarActions()
+
+    def clearLoading(self):
+        # type: (BookView) -> None
+        self._setPlaceholder('')
+        self.modeline.update_(title="No book loaded")
+
+    def _setPlaceholder(self, text):
+        # type: (BookView, str) -> None
+        document = QTextDocument()
+        document.setPlainText(text)
+        self.display.setDocument(document)
+        self._cursor = QTextCursor(document)
+        self.display.setCursor(self._cursor)
+
     def setChapter(self, pos, move_cursor=False, reset=True):
         # type: (BookView, int, bool, bool) -> None
         if self.book is None or self.chapter_pos is None:
@@ -515,7 +835,9 @@ class BookView(QWidget):
 
         # Check pos is in range
         if 0 <= pos < len(self.book.chapters):
-            self.setSource(self.book.chapters[pos])
+            self.setSource(self.book.chapters[pos], pos)
+            # Which may have just been parsed, correcting its estimated length
+            self.updateChapterLens()
         else:
             logger.error(f'setChapter: pos {pos} is out of range '
                          f'(num chapters: {len(self.book.chapters)})')
@@ -615,18 +937,26 @@ class BookView(QWidget):
                 return
             h.fillChars(n)
 
+    @property
+    def line_table(self):
+        # type: (BookView) -> LineTable
+        """Offsets of the lines of `tobetyped_list' in the chapter"""
+        if self._line_table is None or \
+           self._line_table[0] is not self.tobetyped_list:
+            self._line_table = (self.tobetyped_list, LineTable(
+                len(line) for line in self.tobetyped_list))
+        return self._line_table[1]
+
     def calcLinePos(self, cursor_pos):
         # type: (BookView, int) -> int
-        tally = line_pos = 0
+        """Line `cursor_pos' is in, setting `persistent_pos' to its start"""
         if (not self.tobetyped_list or
                 not isinstance(self.tobetyped_list, list)):
             logger.error("Bad tobetyped_list; {}".format(self.tobetyped_list))
-        for line in self.tobetyped_list:
-            tally += len(line)
-            if tally > cursor_pos:
-                break
-            line_pos += 1
-            self.persistent_pos = tally
+            return 0
+        line_table = self.line_table
+        line_pos = line_table.line(cursor_pos)
+        self.persistent_pos = line_table.start(line_pos)
         return line_pos
 
     def _setLine(self, pos):
@@ -635,14 +965,12 @@ class BookView(QWidget):
             if self.line_pos is not None and \
                self.line_pos > len(self.tobetyped_list):
                 return logger.warning("line_pos out of range")
-            if self.rdict:
-                self.current_line = ManifoldStr(
-                    self.tobetyped_list[pos],
-                    self.rdict)  # type: str | ManifoldStr
-            else:
-                self.current_line = self.tobetyped_list[pos]
+            self.current_line = self.equivalences.line(
+                self.tobetyped_list[pos])  # type: str | EquivalentStr
+
+            self._maybeSlideWindow()
 
-            if isspaceorempty(self.current_line):
+            if self.line_info[pos][0]:
                 logger.debug("Skipping empty line")
                 self.advanceLine()
         else:
@@ -657,6 +985,7 @@ class BookView(QWidget):
     def setSdict(self, sdict):
         # type: (BookView, SDict) -> None
         self.sdict = sdict
+        self.text_splitter = Splitter(sdict)
         if not self.book or self.cursor_pos is None:
             return
         self._prepTobetypedList()
@@ -666,8 +995,12 @@ class BookView(QWidget):
     def setRdict(self, rdict):
         # type: (BookView, RDict) -> None
         self.rdict = rdict
+        self.equivalences = Equivalences(rdict)
+        # Line info depends on the rdict
+        self._prefetched = None
         if not self.book or self.line_pos is None:
             return
+        self.line_info = self._lineInfo(self.tobetyped_list)
         self._setLine(self.line_pos)
 
     def maybeSave(self):
@@ -688,8 +1021,15 @@ class BookView(QWidget):
             if self._library.save(self.book, data):  # type: ignore[arg-type]
                 self.book.dirty = False
             else:               # Saving failed
-                logger.info("Can't save. Deactivating autosave.")
-                self.autosave.on = False
+                self.saveFailed()
+
+    def saveFailed(self):
+        # type: (BookView) -> None
+        logger.info("Can't save. Deactivating autosave.")
+        if self.book:
+            self.book.dirty = True
+        if self.autosave:
+            self.autosave.on = False
 
     def switchToShelves(self):
         # type: (BookView) -> None
@@ -729,15 +1069,22 @@ class BookView(QWidget):
         if self.viewed_chapter_pos == 0:
             self.pchap_action.setDisabled(True)
 
+    def updateChapterLens(self):
+        # type: (BookView) -> None
+        if self.book is None:
+            return
+        self.chapter_lens = self.book.chapter_lens
+        self.chapter_table = LineTable(self.chapter_lens)
+        self.total_len = self.chapter_table.total
+
     def updateProgress(self):
         # type: (BookView) -> None
         if not self.chapter_lens or not self.total_len or \
            self.persistent_pos is None or self.book is None:
             return
 
-        typed = self.persistent_pos
-        for chapter_len in self.chapter_lens[0:self.chapter_pos]:
-            typed += chapter_len
+        typed = self.persistent_pos + self.chapter_table.start(
+            min(self.chapter_pos or 0, len(self.chapter_table)))
 
         self.progress = (typed / self.total_len) * 100
         self.book.updateProgress(self.progress)
@@ -786,7 +1133,13 @@ if TYPE_CHECKING:
         QPaintEvent, QKeyEvent, QWheelEvent, QIcon, QAction)
     from retype.ui import MainWin  # noqa: F401
     from retype.controllers import MainController  # noqa: F401
-    from typing import Union, Callable, Dict, TypedDict, Never  # noqa: F401
+    from retype.extras.str_subclasses import EquivalentStr  # noqa: F401
+    from typing import (  # noqa: F401
+        Union, Callable, Dict, TypedDict, Never, Tuple)
     from retype.extras.metatypes import (  # noqa: F401
         SaveData, BookViewSettings, Chapter, SDict, RDict, Book, ActionsInfo)
     Shortcut = Union[QKeySequence, QKeySequence.StandardKey, str, int]
+    from retype.extras.space import LineInfo  # noqa: F401
+    Prefetched = Tuple[int, str, 'SDict', list[str], list['LineInfo']]
+    WindowSource = Tuple['Chapter', QTextDocument]
+    MistakeLine = Tuple[int, int, int, str]
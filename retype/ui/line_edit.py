@@ -74,6 +74,10 @@ class LineEdit(QWidget):
         # type: (LineEdit, str) -> None
         self.edit.setPlainText(text)
 
+    def setPlaceholderText(self, text):
+        # type: (LineEdit, str) -> None
+        self.edit.setPlaceholderText(text)
+
     def _emitTextChanged(self):
         # type: (LineEdit) -> None
         text = self.edit.toPlainText()
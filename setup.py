@@ -16,6 +16,10 @@ setup(name='retype',
           'PyQt5',
           'ebooklib',
       ],
+      extras_require={
+          # Typing statistics (retype.stats.analytics)
+          'stats': ['numpy'],
+      },
       cmdclass={
           'b': b,  # custom build command for building retype with pyinstaller
       },)
@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pytest
+
+from retype.ui import BookView  # noqa: F401 (imported before the stats dock)
+from retype.services.keystroke_log import KeystrokeLog, CORRECT, DELETE
+
+np = pytest.importorskip('numpy')
+
+from retype.stats.analytics import (  # noqa: E402
+    analyse, bookKey, showChars)
+
+
+CHECKSUM = '0123456789abcdef0123456789abcdef'
+
+
+class FakeClock:
+    def __init__(self, wall):
+        self.wall = wall
+        self.ns = 0
+
+    def advance(self, seconds):
+        self.wall += seconds
+        self.ns += int(seconds * 1e9)
+
+
+def _type(log, clock, text, typed=None, offset=0, interval=0.25):
+    for i, (expected, char) in enumerate(zip(text, typed or text)):
+        clock.advance(interval)
+        log.record(CHECKSUM, 0, offset + i, ord(expected), ord(char),
+                   CORRECT if char == expected else 0)
+
+
+@pytest.fixture
+def logged(tmp_path):
+    noon = datetime(2024, 3, 1, 12).timestamp()
+    clock = FakeClock(noon)
+    log = KeystrokeLog(str(tmp_path), lambda: clock.ns, lambda: clock.wall)
+    # 100 keys, 0.25 seconds apart
+    _type(log, clock, 'ab' * 50)
+    # A pause long enough to start another session
+    clock.advance(600)
+    # 'b' after 'a' mistyped 5 times out of 25
+    _type(log, clock, 'ab' * 25, 'ab' * 20 + 'ax' * 5, offset=100)
+    clock.advance(0.25)
+    log.record(CHECKSUM, 0, 149, 0, 1, DELETE)
+    log.close()
+    return str(tmp_path), noon
+
+
+class TestAnalytics:
+    def test_sessions(self, logged):
+        directory, noon = logged
+        stats = analyse(directory)
+        assert stats is not None
+        assert len(stats) == 150
+        assert stats.sessions == 2
+
+        sessions = stats.bySession()
+        assert sessions['keys'].tolist() == [100, 50]
+        # Time is measured from the first key, and up to the last record
+        assert sessions['time'] == pytest.approx([24.75, 12.5])
+        assert sessions['wpm'] == pytest.approx([100 / 5 / (24.75 / 60), 48])
+        assert sessions['accuracy'] == pytest.approx([1, 0.9])
+        assert sessions['start'] == pytest.approx([noon, noon + 625.25])
+
+        total = stats.total()
+        assert total['keys'][0] == 150
+        assert total['time'][0] == pytest.approx(37.25)
+        assert total['wpm'][0] == pytest.approx(150 / 5 / (37.25 / 60))
+        assert stats.latencyPercentiles() == pytest.approx([250, 250, 250])
+
+        books = stats.byBook()
+        assert [bookKey(book) for book in books['key']] == [CHECKSUM[:16]]
+        assert stats.byDay()['keys'].tolist() == [150]
+
+    def test_rolling_wpm(self, logged):
+        stats = analyse(logged[0])
+        times, wpms = stats.rollingWpm(10, 5)
+        assert len(times) == len(wpms) == 5
+        assert (np.diff(times) > 0).all()
+        assert wpms[0] == pytest.approx(48)
+
+    def test_errors(self, logged):
+        stats = analyse(logged[0])
+        chars = stats.charErrors()
+        assert [showChars(key) for key in chars['key']] == ["'b'", "'a'"]
+        assert chars['count'].tolist() == [75, 75]
+        assert chars['rate'] == pytest.approx([5 / 75, 0])
+
+        pairs = stats.bigramErrors()
+        assert [showChars(key) for key in pairs['key']] == ["'ab'", "'ba'"]
+        # Pairs are not counted across sessions
+        assert pairs['count'].tolist() == [75, 73]
+        assert pairs['errors'].tolist() == [5, 0]
+        assert 'Most mistyped pairs' in stats.summary()
+
+    def test_empty(self, tmp_path):
+        stats = analyse(str(tmp_path / 'missing'))
+        assert stats is not None
+        assert len(stats) == 0
+        assert stats.sessions == 0
+        assert stats.bySession()['keys'].tolist() == []
+        assert len(stats.rollingWpm()[0]) == 0
+        assert stats.summary() == 'No keys recorded'
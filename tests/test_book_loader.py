@@ -0,0 +1,100 @@
+import time
+import threading
+
+from qt import QApplication
+
+from retype.controllers.library import Chapters
+from retype.services.book_loader import BookLoader
+
+
+class FakeBook:
+    def __init__(self, title, n, gate=None, error=None, valid=True):
+        self.title = title
+        self.path = title + '.epub'
+        self.valid = valid
+        self.order = []
+        self.gate = gate
+        self.error = error
+        self.chapters = Chapters([None] * n, [100] * n, self.parse)
+        self.stored = []
+
+    def parse(self, pos):
+        if self.gate:
+            self.gate.wait(5)
+        self.order.append(pos)
+        return {'plain': str(pos), 'len': 1}
+
+    def storeCachedChapters(self):
+        self.stored.append(len(self.order))
+
+    def load(self, warn=True):
+        if self.error:
+            raise self.error
+        return True
+
+
+def waitFor(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        QApplication.processEvents()
+        time.sleep(0.001)
+    return condition()
+
+
+class TestBookLoader:
+    def test_saved_chapter_first(self):
+        loader = BookLoader()
+        loaded = []
+        loader.loaded.connect(
+            lambda book: loaded.append(list(book.chapters.parsed)))
+        book = FakeBook('a', 5)
+        loader.load(book, 3)
+
+        assert waitFor(lambda: loaded)
+        assert loaded[0][3] is not None
+        assert waitFor(lambda: len(book.order) == 5)
+        assert book.order == [3, 4, 0, 1, 2]
+        # Chapters are stored in the cache once, after all are parsed
+        assert waitFor(lambda: book.stored)
+        assert book.stored == [5]
+        loader.shutdown()
+
+    def test_cancelled_by_next_book(self):
+        loader = BookLoader()
+        loaded = []
+        loader.loaded.connect(lambda book: loaded.append(book.title))
+        gate = threading.Event()
+        first = FakeBook('first', 3, gate)
+        second = FakeBook('second', 3)
+        loader.load(first)
+        loader.load(second)
+        gate.set()
+
+        assert waitFor(lambda: loaded)
+        assert waitFor(lambda: len(second.order) == 3)
+        QApplication.processEvents()
+        assert loaded == ['second']
+        # Only the chapter being parsed when cancelled was finished, and
+        #  was stored
+        assert first.order == [0]
+        assert first.stored == [1]
+        loader.shutdown()
+
+    def test_failed(self):
+        loader = BookLoader()
+        failed = []
+        loader.failed.connect(lambda book, e: failed.append(e))
+        error = OSError('unreadable')
+        loader.load(FakeBook('a', 2, error=error))
+
+        assert waitFor(lambda: failed)
+        assert failed == [error]
+
+        # A book whose metadata could not be read is read before its
+        #  chapters are made
+        book = FakeBook('b', 2, error=error, valid=False)
+        book.chapters = None
+        loader.load(book)
+        assert waitFor(lambda: len(failed) == 2)
+        assert failed[1] is error
+        loader.shutdown()
@@ -1,13 +1,56 @@
-from qt import pyqtSignal, QObject
+from qt import pyqtSignal, QObject, QTextCursor
 from unittest.mock import patch, MagicMock
 
 from retype.ui import BookView
+from retype.ui.book_view import BookDisplay
+from retype.extras.space import lineinfo
+from retype.services.theme import C
 
 
 class FakeBook:
     chapters = [{'html': 'waeofiaw', 'plain': 'waeofiaw', 'images': []}]*5
+    chapter_lens = [8]*5
     title = 'wefoiw'
     path = 'awoeifjawei'
+    dirty = False
+
+    def updateProgress(self, progress):
+        pass
+
+
+class LongChapterBook(FakeBook):
+    html = ''.join(f'<p>Paragraph {i} with <b>bold</b> text</p>'
+                   for i in range(3000))
+    plain = '\n'.join(f'Paragraph {i} with bold text' for i in range(3000))
+    chapters = [{'html': html, 'plain': plain, 'images': []}]
+    chapter_lens = [len(plain)]
+    checksum = 'abc'
+
+
+class ImageBook(FakeBook):
+    plain = 'hello\n\ufffc\nhello \ufffc'
+    chapters = [{'html': plain, 'plain': plain, 'images': []}]
+    chapter_lens = [len(plain)]
+
+
+class UnparsedChapters(list):
+    """Chapters of which only the first has been parsed"""
+    def __init__(self, chapters):
+        super().__init__(chapters)
+        self.parsed = {0}
+        self.read = []  # type: list[int]
+
+    def isParsed(self, pos):
+        return pos in self.parsed
+
+    def __getitem__(self, pos):
+        self.read.append(pos)
+        return super().__getitem__(pos)
+
+
+class UnparsedBook(FakeBook):
+    def __init__(self):
+        self.chapters = UnparsedChapters(FakeBook.chapters)
 
 
 class PartiallyFakeBookView(BookView):
@@ -107,3 +150,127 @@ class TestBookView:
         # 0
         book_view.setChapter(0, move_cursor=True)
         assert book_view.chapter_pos == 0
+
+    def test_prefetchNextChapter(self):
+        book_view = _setup()
+        book_view.setChapter(0, move_cursor=True)
+        book_view.prefetchNextChapter()
+        assert book_view._prefetched[0] == 1
+        lines, line_info = book_view._prefetched[3:]
+
+        # The prefetched lines are used rather than splitting the text again
+        with patch.object(book_view.text_splitter, 'split') as m_split:
+            book_view.setChapter(1, move_cursor=True)
+            m_split.assert_not_called()
+        assert book_view.tobetyped_list is lines
+        assert book_view.line_info is line_info
+
+    def test_prefetchNextChapter_unparsed(self):
+        book_view = _setup()
+        book_view.setChapter(0, move_cursor=True)
+        book_view.book = UnparsedBook()
+        book_view.prefetchNextChapter()
+        # The next chapter is left to the book loader to parse
+        assert book_view._prefetched is None
+        assert book_view.book.chapters.read == []
+
+        book_view.book.chapters.parsed.add(1)
+        book_view.prefetchNextChapter()
+        assert book_view._prefetched[0] == 1
+
+    def test_lineInfoWithRdict(self):
+        book_view = _setup()
+        book_view.book = ImageBook()
+        book_view.setSdict({'\n': {'keep': False}})
+        book_view.setRdict({'\ufffc': [' ']})
+        book_view.setChapter(0, move_cursor=True)
+        # Images typed as spaces are not part of the length typed to
+        assert book_view.line_info == [
+            (False, 5, True), (True, 0, True), (False, 5, True)]
+
+        # A line of only an image is skipped
+        with patch.object(book_view, 'advanceLine') as m_advanceLine:
+            book_view._setLine(1)
+            m_advanceLine.assert_called_once()
+
+        # Without the rdict the image has to be typed
+        book_view.setRdict({})
+        assert book_view.line_info == [
+            (False, 5, True), (False, 1, True), (False, 7, True)]
+
+    def test_windowedChapter(self):
+        book_view = _setup()
+        book_view.display = BookDisplay(C(), 'Arial')
+        book_view.window_size = 2000
+        book_view.book = LongChapterBook()
+        plain = book_view.book.plain
+        book_view.setChapter(0, move_cursor=True)
+
+        def displayed():
+            return book_view.display.document().toPlainText()
+
+        assert book_view.window_start == 0
+        assert displayed() == plain[:book_view.window_end]
+        assert len(displayed()) < 2 * book_view.window_size
+
+        # Typing through lines slides the window along with the cursor
+        book_view.tobetyped_list = plain.splitlines(True)
+        book_view.line_info = [lineinfo(line)
+                               for line in book_view.tobetyped_list]
+        for pos in range(200):
+            book_view.persistent_pos += len(book_view.tobetyped_list[pos])
+            book_view._setLine(pos + 1)
+        start, end = book_view.window_start, book_view.window_end
+        assert start <= book_view.persistent_pos < end
+        assert start > 0 and displayed() == plain[start:end]
+        assert book_view.documentPosition(book_view.persistent_pos) == \
+            book_view.persistent_pos - start
+
+    def test_calcLinePos(self):
+        book_view = _setup()
+        book_view.tobetyped_list = ['abc\n', 'de\n', 'fgh']
+        assert book_view.calcLinePos(0) == 0
+        assert book_view.persistent_pos == 0
+        assert book_view.calcLinePos(5) == 1
+        assert book_view.persistent_pos == 4
+        assert book_view.calcLinePos(7) == 2
+        assert book_view.persistent_pos == 7
+        assert book_view.calcLinePos(10) == 3
+        assert book_view.persistent_pos == 10
+
+        # Progress through the book counts the chapters before
+        book_view.setChapter(2, move_cursor=True)
+        book_view.persistent_pos = 4
+        book_view.updateProgress()
+        assert book_view.progress == (8 * 2 + 4) / (8 * 5) * 100
+
+    def test_highlightRepaintsChangedLines(self):
+        display = BookDisplay(C(), 'Arial')
+        display.resize(300, 300)
+        display.setHtml('<p>' + 'some words to type ' * 40 + '</p>')
+        cursor = QTextCursor(display.document())
+        display.setCursor(cursor)
+        display.grab()  # Paint once
+
+        cursor.setPosition(100)
+        new = display.cursorRectCached()
+        with patch.object(display.viewport(), 'update') as m_update:
+            display.updateHighlight()
+            rect = m_update.call_args[0][0]
+        assert rect.top() < 1 + display.document().documentMargin()
+        assert rect.bottom() > new.bottom()
+        assert rect.height() < display.viewport().height()
+
+        # Asked of the layout again only once something has changed
+        with patch.object(display, 'cursorRect',
+                          wraps=display.cursorRect) as m_cursorRect:
+            assert display.cursorRectCached() == new
+            m_cursorRect.assert_not_called()
+            cursor.setPosition(101)
+            display.cursorRectCached()
+            m_cursorRect.assert_called_once()
+
+        # Switching to highlighting everything repaints everything
+        with patch.object(display.viewport(), 'update') as m_update:
+            display.updateHighlight(full=True)
+            m_update.assert_called_once_with()
@@ -0,0 +1,80 @@
+import os
+import json
+import glob
+
+from retype.resource_handler import getLibraryPath
+from retype.controllers.library import BookWrapper
+from retype.extras.epub_metadata import readEpubMetadata
+from retype.services.chapter_cache import ChapterCache, CACHE_VERSION
+
+library_books = sorted(glob.glob(os.path.join(getLibraryPath(), '*.epub')))
+
+
+class FakeLibraryItem:
+    def __init__(self, path):
+        self.path = path
+        self.idn = 0
+        self.checksum = 'abc'
+
+
+def fakeBook(n):
+    return {'chapters': [{'html': 'x' * n, 'plain': 'x' * n, 'len': n,
+                          'links': [], 'images': []}, None]}
+
+
+class TestChapterCache:
+    def test_round_trip(self, tmp_path):
+        cache = ChapterCache(str(tmp_path))
+        assert cache.load('abc') is None
+        assert cache.store('abc', fakeBook(10))
+        assert cache.load('abc') == fakeBook(10)
+
+    def test_stale_version_discarded(self, tmp_path):
+        cache = ChapterCache(str(tmp_path))
+        cache.store('abc', fakeBook(10))
+        path = os.path.join(cache.dir, 'abc.json')
+        with open(path, 'w') as f:
+            json.dump({'version': CACHE_VERSION - 1, 'checksum': 'abc',
+                       'book': fakeBook(10)}, f)
+        assert cache.load('abc') is None
+        assert not os.path.exists(path)
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = ChapterCache(str(tmp_path), max_size=2500)
+        for i, checksum in enumerate(['a', 'b', 'c']):
+            cache.store(checksum, fakeBook(500))
+            path = os.path.join(cache.dir, f'{checksum}.json')
+            os.utime(path, (i, i))
+        cache.store('d', fakeBook(500))
+        assert cache.load('a') is None
+        assert cache.load('d') is not None
+
+    def test_disabled(self, tmp_path):
+        cache = ChapterCache(str(tmp_path), max_size=0)
+        assert not cache.store('abc', fakeBook(10))
+        assert cache.load('abc') is None
+
+    def test_book_chapters_from_cache(self, tmp_path):
+        cache = ChapterCache(str(tmp_path))
+        path = library_books[0]
+        item = FakeLibraryItem(path)
+        parsed = BookWrapper(item, None, readEpubMetadata(path), cache)
+        assert len(parsed.chapters) > 2
+        assert cache.load(item.checksum) is None  # Nothing parsed yet
+        parsed.chapters[1]
+        # Stored once the book loader is done with the book, not as each
+        #  chapter is parsed
+        assert cache.load(item.checksum) is None
+        parsed.storeCachedChapters()
+        assert cache.load(item.checksum)['chapters'][1] is not None
+
+        cached = BookWrapper(item, None, readEpubMetadata(path), cache)
+        assert cached.chapters is not parsed.chapters
+        assert cached.chapters[1]['plain'] == parsed.chapters[1]['plain']
+        assert cached._epub is None  # Not read with ebooklib
+        assert cached.chapter_lookup == parsed.chapter_lookup
+        # Chapters missing from the cache are still parsed
+        for a, b in zip(cached.chapters, parsed.chapters):
+            assert a['plain'] == b['plain'] and a['len'] == b['len']
+            assert [i['raw'] for i in a['images']] == \
+                [i['raw'] for i in b['images']]
@@ -26,6 +26,7 @@ class FakeSignal:
 class FakeConsole(QObject):
     submitted = pyqtSignal(str)
     switchView = FakeSignal(int)
+    stats = FakeSignal(str)
 
     def __init__(self):
         QObject.__init__(self)
@@ -72,7 +73,7 @@ def _setup():
     console = FakeConsole()
     book_view = FakeBookView()
     service = CommandService(console, book_view, console.switchView, None, '>',
-                             None, None)
+                             None, None, console.stats)
     return (console, book_view, service)
 
 
@@ -98,6 +99,18 @@ class TestCommandService:
         console.submitText(">switch blah book")
         assert switchView.emitted is None
 
+    def test_stats(self):
+        (console, _, _) = _setup()
+
+        console.submitText(">stats")
+        assert console.stats.emitted == ('',)
+
+        console.submitText(">statistics log")
+        assert console.stats.emitted == ('log',)
+
+        console.submitText(">stats nothing")
+        assert console.stats.emitted is None
+
     def test_command_history(self):
         (console, _, service) = _setup()
 
@@ -0,0 +1,37 @@
+from qt import QTextDocument
+
+from retype.services.document_cache import DocumentCache
+
+
+class TestDocumentCache:
+    def test_lru_eviction(self):
+        cache = DocumentCache(100)
+        documents = [QTextDocument() for _ in range(3)]
+        cache.put('a', documents[0], 40)
+        cache.put('b', documents[1], 40)
+        assert cache.get('a') is documents[0]  # Now most recently used
+
+        cache.put('c', documents[2], 40)
+        assert 'b' not in cache
+        assert cache.get('a') is documents[0]
+        assert cache.get('c') is documents[2]
+        assert cache.size == 80
+
+    def test_replace_and_oversized(self):
+        cache = DocumentCache(100)
+        cache.put('a', QTextDocument(), 40)
+        cache.put('a', QTextDocument(), 60)
+        assert len(cache) == 1 and cache.size == 60
+
+        cache.put('b', QTextDocument(), 101)
+        assert 'b' not in cache and cache.size == 60
+
+    def test_disabled_and_clear(self):
+        cache = DocumentCache(0)
+        cache.put('a', QTextDocument(), 1)
+        assert cache.get('a') is None
+
+        cache = DocumentCache(100)
+        cache.put('a', QTextDocument(), 1)
+        cache.clear()
+        assert cache.get('a') is None and cache.size == 0
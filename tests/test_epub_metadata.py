@@ -0,0 +1,32 @@
+import os
+import glob
+import pytest
+from ebooklib import epub
+
+from retype.resource_handler import getLibraryPath
+from retype.extras.epub_metadata import readEpubMetadata, EpubMetadataError
+
+library_books = sorted(glob.glob(os.path.join(getLibraryPath(), '*.epub')))
+
+
+class TestReadEpubMetadata:
+    @pytest.mark.parametrize('path', library_books)
+    def test_matches_ebooklib(self, path):
+        metadata = readEpubMetadata(path)
+        book = epub.read_epub(path, options={'ignore_ncx': True})
+
+        assert metadata['title'] == book.title
+        assert metadata['author'] == book.get_metadata('DC', 'creator')[0][0]
+        documents = {item.id: item.file_name for item in book.get_items()
+                     if isinstance(item, epub.EpubHtml)}
+        assert metadata['spine'] == [documents[uid] for uid, _ in book.spine
+                                     if uid in documents]
+        cover = book.get_item_with_href(metadata['cover'])
+        assert metadata['cover_content'] == cover.content
+
+    def test_not_an_epub(self, tmp_path):
+        path = os.path.join(tmp_path, 'bad.epub')
+        with open(path, 'w') as f:
+            f.write('not a zip')
+        with pytest.raises(EpubMetadataError):
+            readEpubMetadata(path)
@@ -1,7 +1,14 @@
+import random
+from unittest.mock import patch
+
 from qt import QObject, pyqtSignal, QTextCursor, QTextCharFormat, QTextBrowser
 
-from retype.extras import splittext
+from retype.extras import splittext, ManifoldStr
+from retype.extras.space import lineinfo
 from retype.console import HighlightingService
+from retype.console.highlighting_service import (
+    IncrementalComparator, compareStrings)
+from retype.services.keystroke_log import CORRECT, DELETE
 
 
 SAMPLE_CONTENT = '''<html><body>some test text<br/>
@@ -43,10 +50,12 @@ class FakeBookDisplay(QTextBrowser):
 
 
 class FakeBookView(QObject):
-    def __init__(self, html):
+    def __init__(self, html, overlay_mistakes=False):
         QObject.__init__(self)
         self.display = FakeBookDisplay()
         self.display.setHtml(html)
+        self.overlay_mistakes = overlay_mistakes
+        self.mistake = None
 
         self.chapter_pos = 0
         self.cursor_pos = 0
@@ -55,6 +64,7 @@ class FakeBookView(QObject):
         self.tobetyped_list = splittext(
             self.display.toPlainText(),
             {'\n': {'keep': False}}, True, True, '\r')
+        self.line_info = [lineinfo(line) for line in self.tobetyped_list]
         self._setLine(self.line_pos)
         self.progress = 0
 
@@ -88,6 +98,12 @@ class FakeBookView(QObject):
     def onLastChapter(self):
         return False
 
+    def documentPosition(self, pos):
+        return pos
+
+    def showMistake(self, pos, text):
+        self.mistake = (pos, text)
+
     def updateCursorPosition(self):
         self.cursor.setPosition(self.cursor_pos)
 
@@ -95,9 +111,9 @@ class FakeBookView(QObject):
         pass
 
 
-def _setup(book_view_content=SAMPLE_CONTENT):
+def _setup(book_view_content=SAMPLE_CONTENT, overlay_mistakes=False):
     console = FakeConsole()
-    book_view = FakeBookView(book_view_content)
+    book_view = FakeBookView(book_view_content, overlay_mistakes)
     service = HighlightingService(console, book_view)
     cursor = book_view.cursor
     return (console, book_view, service, cursor)
@@ -245,6 +261,31 @@ class TestHighlightingService:
         assert cursor.position() == 0
         assert getFirstLine() == "ome testsome test text"
 
+    def test_overlayMistakes(self):
+        (console, v, service, cursor) = _setup(overlay_mistakes=True)
+        document = v.display.document()
+        text = document.toPlainText()
+
+        console.setText("some tx")
+        assert service.wrong is True
+        assert service.wrong_start == 6 and service.wrong_end == 7
+        assert v.mistake == (6, "x")
+        assert cursor.position() == 6
+
+        console.setText("some txyz")
+        assert v.mistake == (6, "xyz")
+        assert service.wrong_end == 9
+
+        console.setText("some te")
+        assert service.wrong is False
+        assert service.wrong_start is None
+        assert v.mistake == (0, "")
+        assert cursor.position() == 7
+
+        # The document is never edited
+        assert document.toPlainText() == text
+        assert not document.isUndoAvailable()
+
     def test_fillChars(self):
         (console, v, service, cursor) = _setup("some test text<br/>hi")
 
@@ -267,3 +308,87 @@ class TestHighlightingService:
         console.setText("")
         service.fillChars(-2390423)
         assert cursor.position() == 15
+
+    def test_keystroke_log(self):
+        (console, v, service, _) = _setup()
+        v.book = FakeBook()
+        log = service.keystroke_log = FakeKeystrokeLog()
+
+        console.setText("s")
+        console.setText("sx")
+        console.setText("s")
+        # Several characters at a time, as from a steno stroke
+        console.setText("some")
+        assert log.records == [
+            ('checksum', 0, 0, ord('s'), ord('s'), CORRECT),
+            ('checksum', 0, 1, ord('o'), ord('x'), 0),
+            ('checksum', 0, 1, 0, 1, DELETE),
+            ('checksum', 0, 1, ord('o'), ord('o'), CORRECT),
+            ('checksum', 0, 2, ord('m'), ord('m'), CORRECT),
+            ('checksum', 0, 3, ord('e'), ord('e'), CORRECT)]
+
+        # Nothing is recorded for clearing the console on the next line
+        log.records.clear()
+        console.setText("some test text")
+        console.setText("")
+        console.setText("n")
+        assert log.records[-1] == ('checksum', 0, 15, ord('n'), ord('n'),
+                                   CORRECT)
+        assert not [r for r in log.records if r[5] & DELETE]
+
+
+class FakeBook:
+    checksum = 'checksum'
+
+
+class FakeKeystrokeLog:
+    def __init__(self):
+        self.records = []
+
+    def record(self, *args):
+        self.records.append(args)
+
+
+class TestIncrementalComparator:
+    def test_matches_compareStrings(self):
+        rng = random.Random(0)
+        lines = ['some test text', ManifoldStr("it's a 'test'", {
+            "'": ['‘', '’'], '-': ['—']})]
+        comparator = IncrementalComparator()
+        for line in lines:
+            text = ''
+            for _ in range(2000):
+                edit = rng.random()
+                pos = rng.randint(0, len(text))
+                if edit < 0.4:  # Type a character, usually the right one
+                    i = len(text)
+                    char = str(line[i])[0] if i < len(line) and \
+                        rng.random() < 0.8 else rng.choice("st ’'x")
+                    text += char
+                elif edit < 0.6:  # Backspace
+                    text = text[:-1]
+                elif edit < 0.7:  # Paste / whole word inserted anywhere
+                    text = text[:pos] + rng.choice(['test ', "‘a’"]) + \
+                        text[pos:]
+                elif edit < 0.8:  # Delete a word
+                    text = text[:pos] + text[pos + 4:]
+                elif edit < 0.9:  # Replace a character
+                    text = text[:pos] + 'e' + text[pos + 1:]
+                else:
+                    text = ''
+                assert comparator.compare(text, line) == \
+                    compareStrings(text, line), text
+
+    def test_appending_compares_one_character(self):
+        line = ManifoldStr('a' * 500, {'a': ['b']})
+        comparator = IncrementalComparator()
+        comparator.compare('a' * 400, line)
+        with patch.object(ManifoldStr, '__getitem__',
+                          side_effect=ManifoldStr.__getitem__,
+                          autospec=True) as m_getitem:
+            assert comparator.compare('a' * 400 + 'b', line) == 401
+            assert m_getitem.call_count == 1
+            # A mistake, then more typing after it, compare nothing more
+            assert comparator.compare('a' * 400 + 'bx', line) == 401
+            assert comparator.compare('a' * 400 + 'bxa', line) == 401
+            assert m_getitem.call_count == 2
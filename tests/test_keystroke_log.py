@@ -0,0 +1,77 @@
+import os
+from datetime import datetime
+
+from retype.services.keystroke_log import (
+    KeystrokeLog, RECORD, CORRECT, DELETE, START, bookId, logPath,
+    readRecords)
+
+
+class FakeClock:
+    def __init__(self, wall):
+        self.wall = wall
+        self.ns = 0
+
+    def advance(self, seconds):
+        self.wall += seconds
+        self.ns += int(seconds * 1e9)
+
+
+def _log(tmp_path, wall):
+    clock = FakeClock(wall)
+    log = KeystrokeLog(str(tmp_path), lambda: clock.ns, lambda: clock.wall)
+    return log, clock
+
+
+class TestKeystrokeLog:
+    def test_records(self, tmp_path):
+        noon = datetime(2024, 3, 1, 12).timestamp()
+        log, clock = _log(tmp_path, noon)
+        checksum = '0123456789abcdef0123456789abcdef'
+        clock.advance(0.25)
+        log.record(checksum, 3, 100, ord('a'), ord('a'), CORRECT)
+        clock.advance(0.125)
+        log.record(checksum, 3, 101, ord('b'), ord('x'), 0)
+        log.record(checksum, 3, 101, 0, 1, DELETE)
+        log.close()
+
+        path = logPath(str(tmp_path), datetime(2024, 3, 1).date())
+        assert os.path.getsize(path) == 4 * RECORD.size == 4 * 32
+        book = bookId(checksum)
+        assert book == bytes.fromhex('0123456789abcdef')
+        assert readRecords(path) == [
+            (12 * 3600 * 1000 + 250, 0, START, bytes(8), 0, 0, 0),
+            (0, 3, CORRECT, book, 100, ord('a'), ord('a')),
+            (125000, 3, 0, book, 101, ord('b'), ord('x')),
+            (0, 3, DELETE, book, 101, 0, 1)]
+
+    def test_file_per_day(self, tmp_path):
+        log, clock = _log(tmp_path, datetime(2024, 3, 1, 23, 59).timestamp())
+        log.record('checksum', 0, 0, 1, 1, CORRECT)
+        clock.advance(120)
+        log.record('checksum', 0, 1, 2, 2, CORRECT)
+        log.close()
+
+        first = readRecords(
+            logPath(str(tmp_path), datetime(2024, 3, 1).date()))
+        second = readRecords(
+            logPath(str(tmp_path), datetime(2024, 3, 2).date()))
+        assert [r[2] for r in first] == [START, CORRECT]
+        assert [r[2] for r in second] == [START, CORRECT]
+        # Time since midnight
+        assert second[0][0] == 60 * 1000
+        assert bookId('checksum') != bytes(8)
+
+    def test_unfinished_record_dropped(self, tmp_path):
+        wall = datetime(2024, 3, 1, 12).timestamp()
+        log, _ = _log(tmp_path, wall)
+        log.record('checksum', 0, 0, 1, 1, CORRECT)
+        log.close()
+        path = logPath(str(tmp_path), datetime(2024, 3, 1).date())
+        with open(path, 'ab') as f:
+            f.write(b'\x01\x02\x03')
+
+        log, _ = _log(tmp_path, wall)
+        log.record('checksum', 0, 1, 2, 2, CORRECT)
+        log.close()
+        assert os.path.getsize(path) == 4 * RECORD.size
+        assert [r[4] for r in readRecords(path)] == [0, 0, 0, 1]
@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+from retype.services import latency
+from retype.services.latency import Histogram, LatencyTracer, stages
+
+
+class TestHistogram:
+    def test_percentiles(self):
+        histogram = Histogram()
+        assert histogram.percentile(50) is None
+        for us in range(1, 1001):
+            histogram.add(us)
+        for p in (50, 95, 99):
+            assert p * 10 <= histogram.percentile(p) <= p * 10 * 1.05
+        histogram.add(10**12)  # Past the last bucket
+        assert histogram.total == 1001
+        histogram.clear()
+        assert histogram.total == 0 and not any(histogram.counts)
+
+
+class TestLatencyTracer:
+    def test_disabled(self):
+        tracer = LatencyTracer()
+        tracer.start()
+        tracer.mark('key')
+        assert all(h.total == 0 for h in tracer.histograms.values())
+
+    def test_trace(self, tmp_path):
+        path = tmp_path / 'samples.csv'
+        tracer = LatencyTracer()
+        tracer.enable(str(path))
+        clock = iter([0, 1000, 3000, 20000, 30000, 40000])
+        with patch.object(latency.time, 'perf_counter_ns',
+                          lambda: next(clock)):
+            tracer.start()
+            tracer.mark('textChanged')
+            tracer.mark('textChanged')  # Only the first counts
+            tracer.mark('key')
+            tracer.mark('paint')
+            tracer.mark('modeline')  # After the trace ended
+            tracer.start()  # Ended by the next key event, not a paint
+            tracer.mark('key')
+        tracer.disable()
+
+        assert tracer.histograms['textChanged'].total == 1
+        assert tracer.histograms['key'].total == 2
+        assert tracer.histograms['modeline'].total == 0
+        assert 20 <= tracer.histograms['paint'].percentile(50) <= 21
+        rows = path.read_text().splitlines()
+        assert rows[0] == ','.join(stages)
+        assert rows[1:] == ['3,1,,,,20', '10,,,,,']
+        assert 'modeline' in tracer.summary()
@@ -1,8 +1,14 @@
+import os
 import sys
-from unittest.mock import patch, ANY
+import json
+import time
+import threading
+from unittest.mock import patch
 from PyQt5.Qt import QApplication
 
-from retype.controllers.library import LibraryController, BookWrapper
+from retype.controllers.library import (LibraryController, BookWrapper,
+                                        ESTIMATED_TEXT_RATIO)
+from retype.services.save_writer import SaveWriter
 
 
 class FakeLibraryItem:
@@ -20,61 +26,99 @@ class FakeBookWrapper:
         self.save_data = None
 
 
-def _setup():
-    library = LibraryController('', [''])
+def _setup(user_dir=''):
+    library = LibraryController(user_dir, [''])
     book = FakeBookWrapper(FakeLibraryItem())
     data = {"test": "data"}
     save = {"dummykey": {"test": "data"}}
     return library, book, data, save
 
 
-@patch('builtins.open')
-@patch('json.dump')
+def _reload(user_dir):
+    return LibraryController(str(user_dir), ['']).loadSaveFile()
+
+
 class TestLibraryControllerSaveFunction:
-    def test_save_file_exists_and_has_book_save_data_already(
-            self, m_jsondump, m_open):
-        (library, book, data, save) = _setup()
+    def test_save_file_exists_and_has_book_save_data_already(self, tmp_path):
+        (library, book, data, _) = _setup(str(tmp_path))
 
         library.save_file_contents = {book.checksum: 'other-data'}
 
-        library.save(book, data)
+        assert library.save(book, data)
 
-        m_jsondump.assert_called_once_with(
-            {book.checksum: data}, ANY, indent=2)
+        assert library.save_file_contents == {book.checksum: data}
+        assert _reload(tmp_path) == {book.checksum: data}
         assert book.save_data == data
 
     def test_save_file_exists_and_does_not_have_book_save_data_yet(
-            self, m_jsondump, m_open):
-        (library, book, data, _) = _setup()
+            self, tmp_path):
+        (library, book, data, save) = _setup(str(tmp_path))
+        with open(tmp_path / 'save.json', 'w') as f:
+            json.dump(save, f)
 
-        library.save(book, data)
+        assert library.save(book, data)
 
-        m_jsondump.assert_called_once_with(
-            {book.checksum: data}, ANY, indent=2)
+        assert _reload(tmp_path) == {**save, book.checksum: data}
         assert book.save_data == data
 
-    def test_save_file_two_books_in_save(
-            self, m_jsondump, m_open):
-        (library, book, data, _) = _setup()
+    def test_save_file_two_books_in_save(self, tmp_path):
+        (library, book, data, _) = _setup(str(tmp_path))
         save = {'other': data, book.checksum: data}
 
         library.save_file_contents = save
 
-        library.save(book, data)
+        assert library.save(book, data)
 
-        m_jsondump.assert_called_once_with(save, ANY, indent=2)
+        assert library.save_file_contents == save
         assert book.save_data == data
 
-    def test_save_file_does_not_exist(
-            self, m_jsondump, m_open):
-        (library, book, data, save) = _setup()
+    def test_save_file_does_not_exist(self, tmp_path):
+        (library, book, data, save) = _setup(str(tmp_path))
 
-        library.save(book, data)
+        assert library.save(book, data)
 
-        m_jsondump.assert_called_once_with(
-            {book.checksum: data}, ANY, indent=2)
+        assert _reload(tmp_path) == {book.checksum: data}
         assert book.save_data == data
 
+    def test_journal_appended_then_compacted(self, tmp_path):
+        (library, book, data, save) = _setup(str(tmp_path))
+        journal = library.save_journal
+        journal.max_records = 3
+
+        for pos in range(2):
+            assert library.save(book, {'persistent_pos': pos})
+        # Only the book saved is written
+        assert not os.path.exists(library.save_abs_path)
+        with open(journal.path) as f:
+            assert len(f.readlines()) == 2
+
+        assert library.save(book, data)
+        with open(library.save_abs_path) as f:
+            assert json.load(f) == {book.checksum: data}
+        assert os.path.getsize(journal.path) == 0
+        assert _reload(tmp_path) == {book.checksum: data}
+
+    def test_save_through_writer(self, tmp_path):
+        (library, book, data, _) = _setup(str(tmp_path))
+        library.writer = SaveWriter()
+
+        for pos in range(3):
+            assert library.save(book, {'persistent_pos': pos})
+        assert library.save(book, data)
+        library.writer.flush()
+
+        assert _reload(tmp_path) == {book.checksum: data}
+
+    def test_unfinished_record_ignored(self, tmp_path):
+        (library, book, data, _) = _setup(str(tmp_path))
+        with open(library.save_journal.path, 'w') as f:
+            f.write('["other", {"persistent_pos": 1}]\n["other", {"pers')
+
+        assert library.loadSaveFile() == {'other': {'persistent_pos': 1}}
+        assert library.save(book, data)
+        assert _reload(tmp_path) == {'other': {'persistent_pos': 1},
+                                     book.checksum: data}
+
 
 @patch('retype.controllers.library.generate_file_md5')
 @patch('os.path.exists')
@@ -189,6 +233,12 @@ class FakeChapter:
         self.file_name = name
 
 
+def fakeMetadata(spine):
+    return {'title': 'title', 'author': 'author', 'opf_dir': '',
+            'spine': spine, 'cover': None, 'cover_media_type': None,
+            'cover_content': None}
+
+
 class FakeImage:
     def __init__(self, name):
         self.file_name = name
@@ -200,17 +250,19 @@ class FakeImage:
 app = QApplication(sys.argv)
 
 
+@patch('retype.controllers.library.readEpubMetadata')
 class TestBookWrapper:
     @patch('ebooklib.epub.read_epub')
-    def test_parseChaptersContent(self, _):
+    def test_parseChapter(self, _, m_readEpubMetadata):
+        m_readEpubMetadata.return_value = fakeMetadata(['text/one', 'two'])
         book = BookWrapper(FakeLibraryItem())
-        chapters = [FakeChapter(SAMPLE_CONTENT, "one"),
-                    FakeChapter(SAMPLE_CONTENT2, "two")]
+        book._unparsed_chapters = [FakeChapter(SAMPLE_CONTENT, "text/one"),
+                                   FakeChapter(SAMPLE_CONTENT2, "two")]
 
         book._images = [FakeImage('dummy'), FakeImage('inline-image'),
                         FakeImage('cover.jpg')]
 
-        parsed_chapters = book._parseChaptersContent(chapters)
+        parsed_chapters = book.chapters
         assert parsed_chapters[0]['html'] == str(SAMPLE_CONTENT, 'utf-8')
         plain = 'Hello. Here is a link to another chapter.'
         assert parsed_chapters[0]['plain'] == plain
@@ -232,36 +284,70 @@ class TestBookWrapper:
         assert book.chapter_lookup["one"] == 0
         assert book.chapter_lookup["two"] == 1
 
-    @patch('retype.controllers.library.BookWrapper._parseChaptersContent')
-    @patch('retype.controllers.library.BookWrapper._getItems')
+    @patch('retype.controllers.library.BookWrapper._chapterSizes')
+    @patch('retype.controllers.library.BookWrapper._parseChapter')
     @patch('ebooklib.epub.read_epub')
-    def test_chapters(self, _, m_getItems, m_parseChaptersContent):
+    def test_chapters(self, _, m_parseChapter, m_chapterSizes,
+                      m_readEpubMetadata):
+        m_readEpubMetadata.return_value = fakeMetadata(
+            ['one', 'two', 'three'])
+        sizes = m_chapterSizes.return_value = [10000, 20000, 30000]
+        m_parseChapter.return_value = {'plain': 'x' * 10000, 'len': 10000}
         book = BookWrapper(FakeLibraryItem())
 
-        def side_effect(*args):
-            setattr(book, "_unparsed_chapters", "mock_unparsed_chapters")
+        # Nothing is parsed until a chapter is accessed
+        assert len(book.chapters) == 3
+        m_parseChapter.assert_not_called()
+        estimates = book.chapter_lens
+        assert estimates == [round(size * ESTIMATED_TEXT_RATIO)
+                             for size in sizes]
 
-        m_getItems.side_effect = side_effect
-        m_parseChaptersContent.return_value = "mock_chapters"
+        assert book.chapters[1]['len'] == 10000
+        m_parseChapter.assert_called_once_with(1)
 
-        book.chapters
-        m_getItems.assert_called_once()
-        m_parseChaptersContent.assert_called_once_with(
-            "mock_unparsed_chapters")
+        # Ensure repeated calls don’t parse the chapter again
+        book.chapters[1]
+        book.chapters[-2]
+        m_parseChapter.assert_called_once()
 
-        m_getItems.reset_mock()
-        m_parseChaptersContent.reset_mock()
+        # Estimates are corrected by the chapters parsed
+        lens = book.chapter_lens
+        assert lens[1] == 10000
+        assert 5000 < lens[0] < estimates[0]
+        assert 15000 < lens[2] < estimates[2]
 
-        # Ensure repeated calls don’t try to get items or parse chapters again
-        book.chapters
+    @patch('retype.controllers.library.BookWrapper._chapterSizes')
+    @patch('ebooklib.epub.read_epub')
+    def test_chapters_while_parsing(self, _, m_chapterSizes,
+                                    m_readEpubMetadata):
+        m_readEpubMetadata.return_value = fakeMetadata(['one', 'two'])
+        m_chapterSizes.return_value = [100, 200]
+        book = BookWrapper(FakeLibraryItem())
         book.chapters
-        return_value = book.chapters
-        m_getItems.assert_not_called()
-        m_parseChaptersContent.assert_not_called()
-        assert return_value == "mock_chapters"
+        held, release = threading.Event(), threading.Event()
+
+        def parse():
+            # As the book loader does while parsing a chapter
+            with book._lock:
+                held.set()
+                release.wait(5)
+
+        worker = threading.Thread(target=parse)
+        worker.start()
+        held.wait(5)
+        try:
+            # The chapters are not held up by the chapter being parsed
+            start = time.monotonic()
+            assert len(book.chapters) == 2
+            assert book.chapter_lookup == {'one': 0, 'two': 1}
+            assert len(book.chapter_lens) == 2
+            assert time.monotonic() - start < 1
+        finally:
+            release.set()
+            worker.join()
 
     @patch('ebooklib.epub.read_epub')
-    def test_updateProgress(self, _):
+    def test_updateProgress(self, _, __):
         book = BookWrapper(FakeLibraryItem())
 
         def dummySubscriber(progress):
@@ -275,3 +361,20 @@ class TestBookWrapper:
         book.updateProgress(34)
         book.updateProgress(3248)
         assert getattr(dummySubscriber, 'calls') == [10, 34, 3248]
+
+    @patch('ebooklib.epub.read_epub')
+    def test_epub_read_lazily(self, m_read_epub, m_readEpubMetadata):
+        m_readEpubMetadata.return_value = {
+            'title': 'title', 'author': 'author', 'cover': 'cover.jpg',
+            'cover_media_type': 'image/jpeg', 'cover_content': b'cover'}
+        book = BookWrapper(FakeLibraryItem())
+        assert book.valid
+        assert book.title == 'title'
+        assert book.author == 'author'
+        assert book.cover.content == b'cover'
+        m_read_epub.assert_not_called()
+
+        assert book.load()
+        m_read_epub.assert_called_once()
+        book.load()
+        m_read_epub.assert_called_once()
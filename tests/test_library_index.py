@@ -0,0 +1,75 @@
+import os
+import json
+
+from retype.services.library_index import LibraryIndex, INDEX_VERSION
+
+
+def _book(tmp_path, name='book.epub', content=b'content'):
+    path = os.path.join(tmp_path, name)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+
+class TestLibraryIndex:
+    def test_lookup_unchanged_file(self, tmp_path):
+        path = _book(tmp_path)
+        index = LibraryIndex(str(tmp_path))
+        assert index.lookup(path, os.stat(path)) is None
+
+        index.record(path, os.stat(path), 'checksum')
+        assert index.save()
+
+        index = LibraryIndex(str(tmp_path))
+        assert index.lookup(path, os.stat(path)) == 'checksum'
+
+    def test_lookup_modified_file(self, tmp_path):
+        path = _book(tmp_path)
+        index = LibraryIndex(str(tmp_path))
+        index.record(path, os.stat(path), 'checksum')
+
+        _book(tmp_path, content=b'different content')
+        assert index.lookup(path, os.stat(path)) is None
+
+    def test_corrupt_index_is_rebuilt(self, tmp_path):
+        path = _book(tmp_path)
+        index = LibraryIndex(str(tmp_path))
+        with open(index.path, 'w') as f:
+            f.write('{"version": ')
+
+        assert index.lookup(path, os.stat(path)) is None
+        assert index.dirty
+        index.record(path, os.stat(path), 'checksum')
+        assert index.save()
+
+        with open(index.path) as f:
+            data = json.load(f)
+        assert data['version'] == INDEX_VERSION
+        assert len(data['entries']) == 1
+
+    def test_stale_version_is_rebuilt(self, tmp_path):
+        path = _book(tmp_path)
+        index = LibraryIndex(str(tmp_path))
+        st = os.stat(path)
+        with open(index.path, 'w') as f:
+            json.dump({'version': INDEX_VERSION + 1, 'entries': {
+                LibraryIndex.key(path): {'size': st.st_size,
+                                         'mtime_ns': st.st_mtime_ns,
+                                         'checksum': 'checksum'}}}, f)
+
+        assert index.lookup(path, st) is None
+        assert index.dirty
+
+    def test_prune(self, tmp_path):
+        path = _book(tmp_path)
+        other = _book(tmp_path, 'other.epub')
+        offline = os.path.join(tmp_path, 'offline', 'book.epub')
+        index = LibraryIndex(str(tmp_path))
+        for p in [path, other]:
+            index.record(p, os.stat(p), p)
+        index.record(offline, os.stat(path), offline)
+
+        index.prune([path], [os.path.join(tmp_path, 'offline')])
+        assert LibraryIndex.key(path) in index.entries
+        assert LibraryIndex.key(other) not in index.entries
+        assert LibraryIndex.key(offline) in index.entries
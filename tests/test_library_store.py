@@ -0,0 +1,150 @@
+import os
+import json
+from unittest.mock import patch
+
+from retype.controllers.library import LibraryController
+from retype.services.library_index import LibraryIndex
+from retype.services.library_store import LibraryStore
+
+
+def _book(tmp_path, name='book.epub', content=b'content'):
+    path = os.path.join(tmp_path, name)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+
+def _metadata(title):
+    return {'title': title, 'author': 'author', 'opf_dir': 'OEBPS',
+            'spine': ['one.xhtml', 'two.xhtml'], 'cover': 'cover.jpg',
+            'cover_media_type': 'image/jpeg', 'cover_content': b'\xff\xd8'}
+
+
+class FakeBookView:
+    cleared = False
+
+    def clearLoading(self):
+        self.cleared = True
+
+
+class FakeSignal:
+    def __init__(self, emitted):
+        self.emitted = emitted
+
+    def emit(self, *args):
+        self.emitted.extend(args)
+
+
+def _library(user_dir, library_path):
+    return LibraryController(str(user_dir), [str(library_path)],
+                             {'workers': 1, 'store': 'sqlite'})
+
+
+class TestLibraryStore:
+    def test_lookup_and_prune(self, tmp_path):
+        path = _book(tmp_path)
+        store = LibraryStore(str(tmp_path))
+        assert store.lookup(path, os.stat(path)) is None
+
+        store.record(path, os.stat(path), 'checksum')
+        store.close()
+        store = LibraryStore(str(tmp_path))
+        assert store.lookup(path, os.stat(path)) == 'checksum'
+
+        _book(tmp_path, content=b'different content')
+        assert store.lookup(path, os.stat(path)) is None
+
+        store.prune([])
+        assert store.rows == {}
+
+    def test_progress(self, tmp_path):
+        store = LibraryStore(str(tmp_path))
+        data = {'persistent_pos': 10, 'chapter_pos': 1, 'progress': 0.5,
+                'friendly_name': 'book.epub'}
+        store.append('checksum', data)
+        store.append('checksum', {**data, 'persistent_pos': 20})
+        store.close()
+
+        store = LibraryStore(str(tmp_path))
+        assert store.replay({}) == {
+            'checksum': {**data, 'persistent_pos': 20}}
+
+    def test_import(self, tmp_path):
+        os.mkdir(tmp_path / 'library')
+        path = _book(tmp_path / 'library')
+        index = LibraryIndex(str(tmp_path))
+        index.record(path, os.stat(path), 'checksum')
+        index.save()
+        data = {'persistent_pos': 10, 'chapter_pos': 1, 'progress': 0.5}
+        with open(tmp_path / 'save.json', 'w') as f:
+            json.dump({'checksum': data, 'other': data}, f)
+        with open(tmp_path / 'save.journal', 'w') as f:
+            f.write(json.dumps(['other', {**data, 'progress': 0.75}]) + '\n')
+
+        with patch('retype.controllers.library.generate_file_md5') as m_md5:
+            library = _library(tmp_path, tmp_path / 'library')
+        # The checksum came from the imported index
+        m_md5.assert_not_called()
+        assert library.store is not None
+        assert library.store.imported
+        assert library.loadSaveFile() == {
+            'checksum': data, 'other': {**data, 'progress': 0.75}}
+
+        # Progress saved since is not replaced by importing again
+        library.save(library._library_items[0],
+                     {**data, 'persistent_pos': 99})
+        library.store.importLibrary({}, {'checksum': data})
+        assert library.store.replay({})['checksum']['persistent_pos'] == 99
+
+    @patch('retype.controllers.library.readBookInfo')
+    def test_metadata_read_once(self, m_readBookInfo, tmp_path):
+        os.mkdir(tmp_path / 'library')
+        _book(tmp_path / 'library', 'a.epub', b'a')
+        _book(tmp_path / 'library', 'b.epub', b'b')
+        m_readBookInfo.side_effect = lambda path: (
+            _metadata(os.path.basename(path)), [100, 200])
+
+        library = _library(tmp_path, tmp_path / 'library')
+        library.instantiateBooks()
+        assert m_readBookInfo.call_count == 2
+
+        library = _library(tmp_path, tmp_path / 'library')
+        library.instantiateBooks()
+        assert m_readBookInfo.call_count == 2
+        assert library.books is not None
+        assert sorted(book.title for book in library.books.values()) == \
+            ['a.epub', 'b.epub']
+        book = library.books[0]
+        assert book._metadata == _metadata(book.title)
+        assert book._chapterSizes(book._metadata['spine']) == [100, 200]
+
+        # Only the new book is read
+        _book(tmp_path / 'library', 'c.epub', b'c')
+        library = _library(tmp_path, tmp_path / 'library')
+        library.instantiateBooks()
+        assert m_readBookInfo.call_count == 3
+
+    def test_reset(self, tmp_path):
+        for name in ('one', 'two'):
+            os.makedirs(tmp_path / name / 'library')
+        _book(tmp_path / 'one' / 'library')
+        _book(tmp_path / 'two' / 'library', 'a.epub', b'a')
+        _book(tmp_path / 'two' / 'library', 'b.epub', b'b')
+        library = _library(tmp_path / 'one', tmp_path / 'one' / 'library')
+        store = library.store
+        book_loader = library.book_loader
+        view = FakeBookView()
+        switches = []
+        library._opening = (object(), view, FakeSignal(switches))
+
+        library.reset(str(tmp_path / 'two'),
+                      [str(tmp_path / 'two' / 'library')])
+        # The book being opened is given up on, and the old store closed
+        assert library._opening is None
+        assert view.cleared and switches == [1]
+        assert store._db is None
+        assert library.book_loader is book_loader
+        assert library.store is not store
+        assert library.user_dir == str(tmp_path / 'two')
+        assert len(library._library_items) == 2
+        assert library.books is None
@@ -0,0 +1,23 @@
+from retype.extras.line_table import LineTable
+
+
+class TestLineTable:
+    def test_lookup(self):
+        lines = ['one\n', '', 'three\n', 'four']
+        table = LineTable(len(line) for line in lines)
+        assert len(table) == 4
+        assert table.total == len(''.join(lines))
+        assert [table.start(n) for n in range(5)] == [0, 4, 4, 10, 14]
+
+        # An empty line is never the line an offset is in
+        assert [table.line(offset) for offset in range(15)] == \
+            [0] * 4 + [2] * 6 + [3] * 4 + [4]
+        assert table.locate(0) == (0, 0)
+        assert table.locate(7) == (2, 3)
+        assert table.locate(13) == (3, 3)
+        assert table.locate(100) == (4, 86)
+
+    def test_empty(self):
+        table = LineTable([])
+        assert len(table) == 0 and table.total == 0
+        assert table.line(0) == 0
@@ -0,0 +1,49 @@
+import os
+import glob
+import pytest
+from lxml.html import fromstring
+from qt import QTextDocument
+
+from retype.resource_handler import getLibraryPath
+from retype.controllers.library import BookWrapper
+from retype.extras.plain_text import toPlainText
+
+library_books = sorted(glob.glob(os.path.join(getLibraryPath(), '*.epub')))
+
+
+class FakeLibraryItem:
+    def __init__(self, path):
+        self.path = path
+        self.idn = 0
+        self.checksum = 'abc'
+
+
+def qtPlainText(html):
+    document = QTextDocument()
+    document.setHtml(html)
+    return document.toPlainText()
+
+
+class TestToPlainText:
+    @pytest.mark.parametrize('html', [
+        '<p>one</p>\n  <p>  two   three </p>',
+        '<div>a<div>b</div>c</div><div>  </div>d',
+        '<p>line<br/>break <br/> </p><p>x<img src="a.png"/>y</p>',
+        '<ul>\n<li>one</li> <li>two<ol><li>nested</li></ol></li></ul>after',
+        '<pre>\n  keep\n\n  this\n</pre>text',
+        '<p style="white-space: pre-wrap">  a  b </p><p>c<!-- x -->  d</p>',
+        '<style>.n { white-space: pre }</style><p class="n"> a  b</p>',
+        '<table><tr><td>a</td><td rowspan="2">b</td></tr>'
+        '<tr><td>c</td></tr></table>after',
+        '<table></table><p><span>a<p>b</p> </span> c</p>',
+    ])
+    def test_matches_qt(self, html):
+        html = f'<html><body>{html}</body></html>'
+        assert toPlainText(fromstring(html)) == qtPlainText(html)
+
+    @pytest.mark.parametrize('path', library_books)
+    def test_library_chapters_match_qt(self, path):
+        book = BookWrapper(FakeLibraryItem(path), None)
+        assert book.chapters
+        for chapter in book.chapters:
+            assert chapter['plain'] == qtPlainText(chapter['html'])
@@ -0,0 +1,27 @@
+import time
+
+from retype.extras.pool import poolMap
+
+
+def _slowIdentity(n):
+    # Later items finish first
+    time.sleep((10 - n) / 1000)
+    if n == 3:
+        raise OSError('bad item')
+    return n
+
+
+class TestPoolMap:
+    def test_results_in_item_order(self):
+        items = list(range(10))
+        for workers in [1, 4]:
+            results = poolMap(_slowIdentity, items, workers)
+            assert results[:3] == [0, 1, 2]
+            assert isinstance(results[3], OSError)
+            assert results[4:] == items[4:]
+
+    def test_progress(self):
+        calls = []
+        poolMap(_slowIdentity, list(range(5)), 2,
+                progress=lambda done, total: calls.append((done, total)))
+        assert calls == [(i, 5) for i in range(1, 6)]
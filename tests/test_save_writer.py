@@ -0,0 +1,54 @@
+import threading
+
+from qt import QApplication
+
+from retype.services.save_writer import SaveWriter, writeFile
+
+
+class TestSaveWriter:
+    def test_writes_coalesced(self):
+        writer = SaveWriter()
+        gate = threading.Event()
+        written = []
+        writer.write('busy', 'busy', lambda: gate.wait(5))
+        for n in range(3):
+            writer.write('a', 'a', lambda n=n: written.append(('a', n)))
+        writer.write('b', 'b', lambda: written.append(('b', 0)))
+        gate.set()
+        writer.flush()
+
+        # Only the latest write for each target, in the order requested
+        assert written == [('a', 2), ('b', 0)]
+
+    def test_failed(self, tmp_path):
+        writer = SaveWriter()
+        failed = []
+        writer.failed.connect(
+            lambda target, path, details: failed.append((target, path)))
+        path = str(tmp_path / 'missing' / 'config.json')
+        writer.write(('config', path), path, lambda: writeFile(path, '{}'))
+        writer.flush()
+        QApplication.processEvents()
+
+        assert failed == [(('config', path), path)]
+
+    def test_failed_unexpectedly(self):
+        writer = SaveWriter()
+        failed = []
+        writer.failed.connect(
+            lambda target, path, details: failed.append((target, details)))
+        writer.write(('save', 'abc'), 'save.journal', lambda: 1 + '')
+        writer.flush()
+        QApplication.processEvents()
+
+        assert len(failed) == 1
+        assert failed[0][0] == ('save', 'abc')
+        assert 'TypeError' in failed[0][1]
+
+
+def test_writeFile(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text('old')
+    writeFile(str(path), 'new')
+    assert path.read_text() == 'new'
+    assert [p.name for p in tmp_path.iterdir()] == ['config.json']
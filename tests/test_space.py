@@ -0,0 +1,15 @@
+from retype.extras.space import nrspacerstrip, lineinfo
+
+
+def test_nrspacerstrip():
+    assert nrspacerstrip('next line \n') == 'next line'
+    assert nrspacerstrip('a​ \n') == 'a'
+    # Filled in for a splitter that is not kept
+    assert nrspacerstrip('end.\r\r') == 'end.'
+
+
+def test_lineinfo():
+    assert lineinfo('\n') == (True, 0, True)
+    assert lineinfo('  ﻿\n') == (True, 0, True)
+    assert lineinfo('next line \n') == (False, 9, True)
+    assert lineinfo('last') == (False, 4, False)
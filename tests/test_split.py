@@ -1,4 +1,6 @@
-from retype.extras.split import splittext
+import pytest
+
+from retype.extras.split import splittext, Splitter
 
 
 sdict = {
@@ -30,3 +32,29 @@ class TestSplitText:
         res = splittext("Flat..land..Edwin", {'..': {'keep': False}},
                         fill=" ")
         assert res == ["Flat  ", "land  ", "Edwin"]
+
+    @pytest.mark.parametrize('text, sdict_, args, expected', [
+        # Splitters equally near: the first in the sdict is used
+        ("one. \ntwo", sdict, (), ["one. ", "two"]),
+        ("one. \ntwo", {'. ': {'keep': True}, '\n': {'keep': False}}, (),
+         ["one. ", "", "two"]),
+        # Overlapping occurrences
+        ("a...b", {'..': {'keep': False}, '.': {'keep': True}}, (),
+         ["a", ".", "b"]),
+        ("a...b", {'..': {'keep': False}, '.': {'keep': True}},
+         (False, False, '_'), ["a__", ".", "b"]),
+        ("x\r\ny\rz", {'\r': {'keep': False}, '\r\n': {'keep': False}},
+         (True,), ["x\n", "\ny\n", "z"]),
+        ("end. ", sdict, (True, True, '\r'), ["end. ", "\n"]),
+        ("", sdict, (False, True), ["\n"]),
+    ])
+    def test_matches_previous_output(self, text, sdict_, args, expected):
+        assert splittext(text, sdict_, *args) == expected
+
+    def test_offsets(self):
+        text = "hello\r\nthere. world"
+        splitter = Splitter(sdict)
+        offsets = splitter.offsets(text)
+        assert offsets == [(0, 5, 0), (7, 14, 2), (14, 19, -1)]
+        assert [text[start:end] for start, end, _ in offsets] == \
+            splittext(text, sdict)
@@ -0,0 +1,40 @@
+import random
+
+from retype.ui import BookView  # noqa: F401 (imported before the stats dock)
+from retype.stats import StatsDock
+
+
+class FakeBookView:
+    cursor_pos = 0
+
+    def isVisible(self):
+        return True
+
+
+def _addBar(dock, wpm):
+    amount = dock.size().width() // dock.rect_w
+    if len(dock.wpms) > amount:
+        dock.wpms = dock.wpms[len(dock.wpms) - amount:]
+    dock.wpms.append(wpm)
+    dock.wpms_added += 1
+
+
+def test_graphDrawnIncrementally():
+    dock = StatsDock(FakeBookView())
+    dock.resize(100, 60)
+    dock.wpm_pb = 100
+    rng = random.Random(0)
+    graph = dock._updateGraph()
+    for n in range(30):
+        _addBar(dock, rng.randint(0, 120))
+        incremental = dock._updateGraph()
+        # Bars are added to (and scrolled along) the same pixmap
+        assert incremental is graph
+        image = incremental.toImage()
+        dock.themeUpdate()
+        assert dock._updateGraph().toImage() == image
+        graph = dock._graph
+
+    # Rescaled to a new personal best
+    dock.wpm_pb = 150
+    assert dock._updateGraph() is not graph
@@ -0,0 +1,68 @@
+from qt import QWidget, pyqtSignal
+
+from retype.ui import BookView  # noqa: F401 (imported before the steno view)
+from retype.games.steno import StenoView
+from retype.console import Console
+from retype.constants import default_config
+
+
+class FakeWin(QWidget):
+    closing = pyqtSignal()
+
+    def denoteSplitter(*_):
+        pass
+
+    def maybeRestoreSplitterState(*_):
+        pass
+
+
+class FakeController:
+    library = None
+
+    def __init__(self):
+        self.console = Console('>')
+
+
+def _setup(overlay_mistakes=False):
+    settings = dict(default_config['bookview'],
+                    overlay_mistakes=overlay_mistakes)
+    view = StenoView(FakeWin(), FakeController(), settings,
+                     default_config['steno']['kdict'])
+    # Every stroke to type is K, which is typed with S
+    view._setStage({'name': 'K', 'desc': 'K', 'letters': ['K']})
+    view._stop()
+    return view
+
+
+class TestStenoView:
+    def test_overlayMistakes(self):
+        view = _setup(overlay_mistakes=True)
+        document = view.display.document()
+        text = document.toPlainText()
+
+        # D is W, not K
+        view._handleHighlighting('d')
+        assert view.wrong is True
+        assert view.wrong_start == 0 and view.wrong_end == 2
+        assert (view.display.mistake_pos, view.display.mistake_text) == \
+            (0, 'W ')
+        assert not view.display._mistakeRect().isEmpty()
+
+        view._handleHighlighting('s')
+        assert view.cursor_pos == 2
+        assert view.wrong is False
+        assert view.wrong_start is None
+        assert view.display.mistake_text == ''
+
+        # The document is never edited
+        assert document.toPlainText() == text
+        assert not document.isUndoAvailable()
+
+    def test_insertMistakes(self):
+        view = _setup()
+        text = view.display.document().toPlainText()
+
+        view._handleHighlighting('d')
+        assert view.wrong is True
+        assert view.display.document().toPlainText() == 'W ' + text
+        assert view.display.mistake_text == ''
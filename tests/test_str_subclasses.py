@@ -1,5 +1,7 @@
 import logging
-from retype.extras import AnyStr, ManifoldStr
+import random
+from retype.extras import AnyStr, ManifoldStr, Equivalences
+from retype.extras.str_subclasses import EquivalentStr
 from retype.console.highlighting_service import compareStrings
 
 
@@ -273,3 +275,80 @@ class TestManifoldStr:
     def test_strip_space_rep_a(self):
         ms = ManifoldStr('  a', {' ': ['.']})
         assert ms.strip() == 'a'
+
+
+def getES(string, rdict):
+    return Equivalences(rdict).line(string)
+
+
+class TestEquivalentStr:
+    def test_no_replacements_is_str(self):
+        line = "some text"
+        assert getES(line, {'q': ['y']}) is line
+        assert getES(line, {}) is line
+
+    def test_eq(self):
+        string = "thou art an eternal babbler; and, though void of wit,\
+ your bluntness often occasions smarting"
+        es = getES(string, {'babbler': ['cackler', 'rattler'],
+                            'wit': ['cat'],
+                            'blunt': ['smart', 'stump']})
+        assert type(es) is EquivalentStr
+        assert es == string
+        assert es == "thou art an eternal babbler; and, though void of cat,\
+ your smartness often occasions smarting"
+        assert es != "thou art an ofiejwofjiweopfawiehfaowiehfao"
+        assert es != "thou art an eternal babbler; and, though void of cat,\
+ your smartness often accasions smarting"
+
+        input_ = "thou art an eternal cackler; and, though void of cat"
+        assert compareStrings(input_, es) == len(input_)
+
+    def test_getitem(self):
+        es = getES("some text", {'t': ['a', 'b'], 's': ['d']})
+        assert type(es[0]) is AnyStr
+        assert es[0] == 's'
+        assert es[0] == 'd'
+        assert es[1] == 'o'
+        assert es[1] != 'a'
+        assert es[-1] == 'b'
+        assert es[:4] == "dome"
+        assert es[-4:-1] == "bex"
+
+    def test_strip(self):
+        assert getES("hey  ", {'hey': ['bye']}).rstrip() == "bye"
+        assert getES("a", {'a': ['b']}).rstrip() == "b"
+        assert getES("\ufffc", {'\ufffc': [' ']}).rstrip() == ""
+        assert getES('  \n', {' ': ['.']}).strip(' ') == '\n'
+        es = getES("some text with multiple replacements  ",
+                   {'tex': ['yoo', 'nop'], 'rep': ['ded', 'led', 'red']})
+        assert es.rstrip() == "some yoot with multiple replacements"
+
+    def test_isspace(self):
+        assert getES("a", {'a': [' ']}).isspace() is True
+        assert getES("hey  ", {'hey': ['bye']}).isspace() is False
+        assert getES("\ufffc\n", {'\ufffc': [' ']}).isspace() is True
+
+    def test_discworld(self):
+        es = getES("A Discworld® Novel", {"®": {'r', 'R'}})
+        assert es == "A Discworldr Novel"
+        assert es == "A DiscworldR Novel"
+
+    def test_overlapping_keys_in_order(self):
+        # Earlier keys take precedence, as in ManifoldStr
+        rdict = {'bc': ['xy'], 'ab': ['pq']}
+        es = getES("abcab", rdict)
+        assert es.found == [(1, 'bc'), (3, 'ab')]
+        assert es == "axyab" and es == "axypq" and es != "pqcab"
+
+    def test_matches_manifoldstr(self):
+        rng = random.Random(0)
+        rdict = {"\u2019": ["'"], "\u00ae": ["r", "R"], "--": ["~~"]}
+        for _ in range(50):
+            line = ''.join(rng.choice("ab \u2019\u00ae-'r")
+                           for _ in range(rng.randint(1, 20)))
+            es, ms = getES(line, rdict), ManifoldStr(line, rdict)
+            assert len(es) == len(ms)
+            for i in range(len(line)):
+                for c in "ab \u2019\u00ae-'rR~":
+                    assert (c == es[i]) == (c == ms[i])
@@ -0,0 +1,44 @@
+from retype.stats.typing_speed import TypingSpeed
+
+
+class TestTypingSpeed:
+    def test_windows(self):
+        speed = TypingSpeed((5, 30))
+        assert speed.wpm(5, now=0) == 0
+        # 10 characters a second for 60 seconds
+        for i in range(600):
+            speed.add(1, now=i / 10)
+        assert speed.covers(30, now=59.9)
+        assert round(speed.wpm(5, now=59.9)) == 120
+        assert round(speed.wpm(30, now=59.9)) == 120
+        assert round(speed.wpm(now=59.9)) == 120
+
+        # Slowing down shows in the short window first
+        for i in range(10):
+            speed.add(1, now=60 + i / 2)
+        # 14 characters in the last 5 seconds
+        assert round(speed.wpm(5, now=64.5)) == 34
+        assert 34 < speed.wpm(30, now=64.5) < 120
+
+    def test_bursts(self):
+        speed = TypingSpeed((5,), idle=5)
+        # A steno stroke of several characters
+        speed.add(6, now=0)
+        speed.add(6, now=1)
+        assert speed.cpm(5, now=2) == 12 / 2 * 60
+        assert not speed.covers(5, now=2)
+
+        # Idle time is neither counted in the windows nor the session
+        assert speed.wpm(5, now=20) == 0
+        speed.add(4, now=100)
+        assert speed.cpm(5, now=100) == 4 * 60
+        assert speed.session_time == 1
+
+    def test_ring_buffer(self):
+        speed = TypingSpeed((1000,), capacity=8)
+        for i in range(20):
+            speed.add(1, now=i)
+        # Only the events still in the buffer are counted
+        assert speed.count == 20
+        assert speed.cpm(1000, now=19) == 8 / 19 * 60
+        assert speed.session_chars == 20